@@ -0,0 +1,118 @@
+import time
+import numpy as np
+from kivy.utils import platform
+
+try:
+    import sounddevice
+except ImportError:
+    sounddevice = None
+
+def float_to_pcm16(block):
+    return (np.clip(block, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+# -----------------------------------------------------------------------------
+# PCM Sinks – Blocking writers for float32 (frames, 2) blocks. write() blocks
+# until the device accepts the data, which is what paces the playback thread,
+# and returns True when the device ran dry since the previous write.
+# -----------------------------------------------------------------------------
+class AudioTrackSink:
+    def __init__(self, sample_rate, channels=2, block_frames=1024):
+        from jnius import autoclass
+        AudioTrack = autoclass("android.media.AudioTrack")
+        AudioFormat = autoclass("android.media.AudioFormat")
+        AudioManager = autoclass("android.media.AudioManager")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_frames = block_frames
+        channel_mask = AudioFormat.CHANNEL_OUT_STEREO if channels == 2 else AudioFormat.CHANNEL_OUT_MONO
+        min_bytes = AudioTrack.getMinBufferSize(sample_rate, channel_mask, AudioFormat.ENCODING_PCM_16BIT)
+        buffer_bytes = max(min_bytes, block_frames * channels * 2 * 2)
+        self.track = AudioTrack(AudioManager.STREAM_MUSIC, sample_rate, channel_mask,
+                                AudioFormat.ENCODING_PCM_16BIT, buffer_bytes, AudioTrack.MODE_STREAM)
+        self.track.play()
+        self._underruns = 0
+
+    def write(self, block):
+        data = float_to_pcm16(block)
+        self.track.write(data, 0, len(data))
+        underruns = self.track.getUnderrunCount()
+        if underruns != self._underruns:
+            self._underruns = underruns
+            return True
+        return False
+
+    def pause(self):
+        self.track.pause()
+
+    def resume(self):
+        self.track.play()
+
+    def close(self):
+        try:
+            self.track.stop()
+            self.track.release()
+        except Exception as e:
+            print(f"Error releasing AudioTrack: {e}")
+
+class SoundDeviceSink:
+    def __init__(self, sample_rate, channels=2, block_frames=1024):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_frames = block_frames
+        self.stream = sounddevice.OutputStream(samplerate=sample_rate, channels=channels,
+                                               dtype="float32", blocksize=block_frames)
+        self.stream.start()
+
+    def write(self, block):
+        return bool(self.stream.write(np.ascontiguousarray(block, dtype=np.float32)))
+
+    def pause(self):
+        self.stream.stop()
+
+    def resume(self):
+        self.stream.start()
+
+    def close(self):
+        try:
+            self.stream.stop()
+            self.stream.close()
+        except Exception as e:
+            print(f"Error closing output stream: {e}")
+
+class NullSink:
+    # Discards audio at real-time pace; used by the headless desktop engine.
+    def __init__(self, sample_rate, channels=2, block_frames=1024):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_frames = block_frames
+        self._deadline = None
+
+    def write(self, block):
+        now = time.perf_counter()
+        if self._deadline is None or self._deadline < now:
+            late = self._deadline is not None
+            self._deadline = now
+        else:
+            late = False
+            time.sleep(self._deadline - now)
+        self._deadline += len(block) / self.sample_rate
+        return late
+
+    def pause(self):
+        self._deadline = None
+
+    def resume(self):
+        pass
+
+    def close(self):
+        pass
+
+def sink_available():
+    return platform == "android" or sounddevice is not None
+
+def open_sink(sample_rate, channels=2, block_frames=1024):
+    if platform == "android":
+        return AudioTrackSink(sample_rate, channels, block_frames)
+    if sounddevice is not None:
+        return SoundDeviceSink(sample_rate, channels, block_frames)
+    raise RuntimeError("No PCM output available on this platform")
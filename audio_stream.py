@@ -0,0 +1,549 @@
+import mmap, threading, wave
+import numpy as np
+from kivy.utils import platform
+
+# Default streaming parameters (seconds of audio at the source sample rate).
+DEFAULT_BUFFER_SECONDS = 2.0
+DEFAULT_READ_AHEAD_SECONDS = 1.0
+DEFAULT_CHUNK_FRAMES = 4096
+
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+# -----------------------------------------------------------------------------
+# PCM helpers
+# -----------------------------------------------------------------------------
+def pcm_to_float(data, sample_width, channels):
+    if sample_width == 1:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        ints = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8)
+                | (raw[:, 2].astype(np.int32) << 16))
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608.0
+    elif sample_width == 4:
+        samples = np.frombuffer(data, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+    return samples.reshape(-1, channels)
+
+def to_stereo(block):
+    if block.shape[1] == 2:
+        return block
+    if block.shape[1] == 1:
+        return np.repeat(block, 2, axis=1)
+    return block[:, :2]
+
+# -----------------------------------------------------------------------------
+# Decoders – Chunked readers returning float32 (frames, channels) blocks.
+# -----------------------------------------------------------------------------
+class WaveDecoder:
+    def __init__(self, path):
+        self.path = path
+        self._wav = wave.open(path, "rb")
+        self.sample_rate = self._wav.getframerate()
+        self.channels = self._wav.getnchannels()
+        self.sample_width = self._wav.getsampwidth()
+        self.frames = self._wav.getnframes()
+
+    def read(self, frames):
+        data = self._wav.readframes(frames)
+        return pcm_to_float(data, self.sample_width, self.channels)
+
+    def seek(self, frame):
+        self._wav.setpos(frame)
+
+    def close(self):
+        self._wav.close()
+
+class SoundFileDecoder:
+    def __init__(self, path):
+        self.path = path
+        self._file = soundfile.SoundFile(path)
+        self.sample_rate = self._file.samplerate
+        self.channels = self._file.channels
+        self.frames = len(self._file)
+
+    def read(self, frames):
+        return self._file.read(frames, dtype="float32", always_2d=True)
+
+    def seek(self, frame):
+        self._file.seek(frame)
+
+    def close(self):
+        self._file.close()
+
+class AndroidDecoder:
+    # MediaExtractor/MediaCodec pipeline; decodes on demand so only the
+    # requested chunk (plus one codec output buffer) is ever held in memory.
+    timeout_us = 10000
+
+    def __init__(self, path):
+        from jnius import autoclass
+        MediaExtractor = autoclass("android.media.MediaExtractor")
+        MediaCodec = autoclass("android.media.MediaCodec")
+        self.MediaFormat = autoclass("android.media.MediaFormat")
+        self.MediaCodec = MediaCodec
+        self.MediaExtractor = MediaExtractor
+        self.path = path
+        self.extractor = MediaExtractor()
+        self.extractor.setDataSource(path)
+        track_format = self.extractor.getTrackFormat(0)
+        self.extractor.selectTrack(0)
+        mime = track_format.getString(self.MediaFormat.KEY_MIME)
+        self.sample_rate = track_format.getInteger(self.MediaFormat.KEY_SAMPLE_RATE)
+        self.channels = track_format.getInteger(self.MediaFormat.KEY_CHANNEL_COUNT)
+        duration_us = track_format.getLong(self.MediaFormat.KEY_DURATION)
+        self.frames = int(duration_us * self.sample_rate / 1000000)
+        self.codec = MediaCodec.createDecoderByType(mime)
+        self.codec.configure(track_format, None, None, 0)
+        self.codec.start()
+        self.info = autoclass("android.media.MediaCodec$BufferInfo")()
+        self._pending = np.zeros((0, self.channels), dtype=np.float32)
+        self._input_done = False
+        self._output_done = False
+
+    def _feed_input(self):
+        if self._input_done:
+            return
+        index = self.codec.dequeueInputBuffer(self.timeout_us)
+        if index < 0:
+            return
+        buf = self.codec.getInputBuffer(index)
+        size = self.extractor.readSampleData(buf, 0)
+        if size < 0:
+            self.codec.queueInputBuffer(index, 0, 0, 0, self.MediaCodec.BUFFER_FLAG_END_OF_STREAM)
+            self._input_done = True
+        else:
+            self.codec.queueInputBuffer(index, 0, size, self.extractor.getSampleTime(), 0)
+            self.extractor.advance()
+
+    def _drain_output(self):
+        index = self.codec.dequeueOutputBuffer(self.info, self.timeout_us)
+        if index < 0:
+            return None
+        block = None
+        if self.info.size > 0:
+            buf = self.codec.getOutputBuffer(index)
+            chunk = bytearray(self.info.size)
+            buf.get(chunk)
+            block = pcm_to_float(bytes(chunk), 2, self.channels)
+        self.codec.releaseOutputBuffer(index, False)
+        if self.info.flags & self.MediaCodec.BUFFER_FLAG_END_OF_STREAM:
+            self._output_done = True
+        return block
+
+    def read(self, frames):
+        parts = [self._pending]
+        have = len(self._pending)
+        while have < frames and not self._output_done:
+            self._feed_input()
+            block = self._drain_output()
+            if block is not None:
+                parts.append(block)
+                have += len(block)
+        data = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        self._pending = data[frames:]
+        return data[:frames]
+
+    def seek(self, frame):
+        self.extractor.seekTo(int(frame * 1000000 / self.sample_rate),
+                              self.MediaExtractor.SEEK_TO_CLOSEST_SYNC)
+        self.codec.flush()
+        self._pending = np.zeros((0, self.channels), dtype=np.float32)
+        self._input_done = False
+        self._output_done = False
+
+    def close(self):
+        try:
+            self.codec.stop()
+            self.codec.release()
+            self.extractor.release()
+        except Exception as e:
+            print(f"Error releasing Android decoder: {e}")
+
+def decoder_available(path):
+    return path.lower().endswith(".wav") or platform == "android" or soundfile is not None
+
+def open_decoder(path):
+    if path.lower().endswith(".wav"):
+        return WaveDecoder(path)
+    if platform == "android":
+        return AndroidDecoder(path)
+    if soundfile is not None:
+        return SoundFileDecoder(path)
+    raise RuntimeError(f"No streaming decoder available for {path}")
+
+# -----------------------------------------------------------------------------
+# RingBuffer – Fixed-size single-producer/single-consumer frame buffer.
+# -----------------------------------------------------------------------------
+class RingBuffer:
+    def __init__(self, capacity, channels=2):
+        self.capacity = capacity
+        self.data = np.zeros((capacity, channels), dtype=np.float32)
+        self.read_pos = 0
+        self.write_pos = 0
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def available(self):
+        return self.write_pos - self.read_pos
+
+    def free(self):
+        return self.capacity - self.available()
+
+    def write(self, block):
+        n = min(len(block), self.free())
+        start = self.write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = block[:first]
+        self.data[:n - first] = block[first:n]
+        self.write_pos += n
+        return n
+
+    def read_into(self, out):
+        n = min(len(out), self.available())
+        start = self.read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self.data[start:start + first]
+        out[first:n] = self.data[:n - first]
+        self.read_pos += n
+        return n
+
+    def skip(self, frames):
+        n = min(frames, self.available())
+        self.read_pos += n
+        return n
+
+    def clear(self):
+        self.read_pos = self.write_pos
+
+# -----------------------------------------------------------------------------
+# StreamingSource – One decoder feeding one ring buffer. The audio side only
+# ever calls read_into(); decoding happens on the StreamWorker thread.
+#
+# position is the playhead in frames and keeps counting while the source is
+# suspended (skip()), with the decoder left idle. ring_frame is the frame at
+# the ring's read pointer; read_into() lines the two up again after a resume,
+# so the sound comes back exactly where it would have been.
+# -----------------------------------------------------------------------------
+class StreamingSource:
+    def __init__(self, path, buffer_seconds=DEFAULT_BUFFER_SECONDS,
+                 read_ahead_seconds=DEFAULT_READ_AHEAD_SECONDS,
+                 chunk_frames=DEFAULT_CHUNK_FRAMES, loop=True):
+        self.path = path
+        self.decoder = open_decoder(path)
+        self.sample_rate = self.decoder.sample_rate
+        self.ring = RingBuffer(max(int(buffer_seconds * self.sample_rate), chunk_frames))
+        self.read_ahead = min(int(read_ahead_seconds * self.sample_rate), self.ring.capacity)
+        self.chunk_frames = chunk_frames
+        self.loop = loop
+        self.eof = False
+        self.underruns = 0
+        self.underrun_frames = 0
+        self.worker = None
+        self.position = 0
+        self.ring_frame = 0
+        self.suspended = False
+        self._seek_frame = None
+
+    @property
+    def memory_bytes(self):
+        return self.ring.nbytes
+
+    def needs_refill(self):
+        if self.suspended:
+            return False
+        if self._seek_frame is not None:
+            return True
+        return not self.eof and self.ring.available() < self.read_ahead
+
+    def refill(self):
+        # Worker thread only.
+        if self._seek_frame is not None:
+            frame = self._seek_frame
+            self.decoder.seek(frame % self.decoder.frames if self.decoder.frames else frame)
+            self.ring.clear()
+            self.ring_frame = frame
+            self.eof = False
+            if self._seek_frame == frame:
+                self._seek_frame = None
+        n = min(self.chunk_frames, self.ring.free())
+        if n <= 0:
+            return 0
+        block = self.decoder.read(n)
+        if len(block) == 0:
+            if not self.loop:
+                self.eof = True
+                return 0
+            self.decoder.seek(0)
+            block = self.decoder.read(n)
+            if len(block) == 0:
+                self.eof = True
+                return 0
+        return self.ring.write(to_stereo(block))
+
+    def read_into(self, out):
+        frames = len(out)
+        if self._seek_frame is not None:
+            out[:] = 0
+            self.position += frames
+            return 0
+        gap = self.ring_frame - self.position
+        if gap < 0:
+            # Resumed later than the decoded data: drop what the playhead
+            # has already passed.
+            self.ring_frame += self.ring.skip(-gap)
+            gap = self.ring_frame - self.position
+        # Resumed early: silence until the playhead reaches the data.
+        lead = min(max(gap, 0), frames)
+        out[:lead] = 0
+        n = self.ring.read_into(out[lead:])
+        self.ring_frame += n
+        self.position += frames
+        if lead + n < frames:
+            out[lead + n:] = 0
+            if not self.eof and gap <= 0:
+                self.underruns += 1
+                self.underrun_frames += frames - lead - n
+        if self.worker is not None and self.ring.available() < self.read_ahead:
+            self.worker.wake()
+        return n
+
+    def seek(self, frame):
+        self.position = frame
+        self.suspended = False
+        self._seek_frame = frame
+        if self.worker is not None:
+            self.worker.wake()
+
+    def suspend(self):
+        self.suspended = True
+
+    def skip(self, frames):
+        self.position += frames
+
+    def resume(self):
+        # Returns True once decoded audio is waiting at the playhead.
+        if self.suspended:
+            self.suspended = False
+            if self._seek_frame is not None or self.position - self.ring_frame > self.ring.available():
+                # Past what is buffered: restart decoding a chunk ahead of the
+                # playhead to cover the time the worker needs to get there.
+                self._seek_frame = self.position + self.chunk_frames
+            if self.worker is not None:
+                self.worker.wake()
+        return (self._seek_frame is None and self.ring_frame <= self.position
+                and self.position - self.ring_frame < self.ring.available())
+
+    def close(self):
+        if self.worker is not None:
+            self.worker.remove(self)
+        self.decoder.close()
+
+# -----------------------------------------------------------------------------
+# Shared buffers – A decoded sound from the warm-up cache (int16 .npy) is
+# mapped once per process and handed out to every source playing it; the
+# mapping goes away with the last one.
+# -----------------------------------------------------------------------------
+_shared = {}
+_shared_lock = threading.Lock()
+
+def open_shared(pcm_path):
+    with _shared_lock:
+        entry = _shared.get(pcm_path)
+        if entry is None:
+            entry = _shared[pcm_path] = [np.load(pcm_path, mmap_mode="r"), 0]
+        entry[1] += 1
+        return entry[0]
+
+def release_shared(pcm_path):
+    with _shared_lock:
+        entry = _shared.get(pcm_path)
+        if entry is not None:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del _shared[pcm_path]
+
+def shared_bytes():
+    with _shared_lock:
+        return sum(entry[0].nbytes for entry in _shared.values())
+
+def prefetch(array, start, stop):
+    # Reads one value per page of rows start..stop of a memory-mapped array,
+    # so the page faults (disk reads) happen on the calling thread - the
+    # StreamWorker - and the render thread finds the pages resident.
+    if stop <= start:
+        return
+    step = max(1, mmap.PAGESIZE // array.strides[0])
+    int(array[start:stop:step, 0].sum(dtype=np.int64)) + int(array[stop - 1, 0])
+
+# -----------------------------------------------------------------------------
+# BufferSource – Plays a shared buffer through its own read cursor, so layers
+# of one sound differ only in position: no decoder and no ring. The buffer is
+# memory-mapped, so the StreamWorker's only job is to page in the next
+# read_ahead frames before the render thread gets there. Same interface as
+# StreamingSource; it is always ready.
+# -----------------------------------------------------------------------------
+class BufferSource:
+    SCALE = np.float32(1.0 / 32767.0)
+
+    def __init__(self, pcm_path, sample_rate, offset=0, loop=True,
+                 read_ahead_seconds=DEFAULT_READ_AHEAD_SECONDS, chunk_frames=DEFAULT_CHUNK_FRAMES):
+        self.path = pcm_path
+        self.data = open_shared(pcm_path)
+        self.frames = len(self.data)
+        self.sample_rate = sample_rate
+        self.loop = loop
+        self.position = offset % self.frames if self.frames else 0
+        self.read_ahead = int(read_ahead_seconds * sample_rate)
+        self.chunk_frames = chunk_frames
+        self.eof = False
+        self.worker = None
+        self.suspended = False
+        self.underruns = 0
+        self._paged = self.position      # frames up to here are paged in
+        self._page_in(self.position + min(self.read_ahead, self.frames))
+
+    @property
+    def memory_bytes(self):
+        # Mapped and shared with the other layers; counted by shared_bytes().
+        return 0
+
+    def read_into(self, out):
+        frames = len(out)
+        done = 0
+        while done < frames and self.frames:
+            start = self.position % self.frames if self.loop else self.position
+            n = min(frames - done, self.frames - start)
+            if n <= 0:
+                break
+            np.multiply(self.data[start:start + n], self.SCALE, out=out[done:done + n])
+            self.position += n
+            done += n
+        out[done:] = 0
+        if self.worker is not None and self._paged - self.position < self.read_ahead // 2:
+            self.worker.wake()
+        return done
+
+    def needs_refill(self):
+        return (not self.suspended and not self.eof and self.data is not None
+                and self._paged - self.position < self.read_ahead)
+
+    def refill(self):
+        # Worker thread only.
+        start = max(self._paged, self.position)
+        return self._page_in(min(start + self.chunk_frames, self.position + self.read_ahead), start)
+
+    def _page_in(self, stop, start=None):
+        data = self.data
+        start = self._paged if start is None else start
+        if data is None or not self.frames or stop <= start:
+            return 0
+        if not self.loop:
+            stop = min(stop, self.frames)
+        for frame in range(start, stop, self.frames):
+            first = frame % self.frames
+            prefetch(data, first, min(self.frames, first + stop - frame))
+        self._paged = stop
+        return stop - start
+
+    def seek(self, frame):
+        self.position = frame
+        self._paged = frame
+        self.suspended = False
+        if self.worker is not None:
+            self.worker.wake()
+
+    def suspend(self):
+        self.suspended = True
+
+    def skip(self, frames):
+        self.position += frames
+
+    def resume(self):
+        self.suspended = False
+        if self.worker is not None:
+            self.worker.wake()
+        return True
+
+    def close(self):
+        if self.worker is not None:
+            self.worker.remove(self)
+        if self.data is not None:
+            self.data = None
+            release_shared(self.path)
+
+# -----------------------------------------------------------------------------
+# StreamWorker – Single background thread that keeps every registered source
+# topped up to its read-ahead level. The thread ends once the last source is
+# removed (after a sleep fade nothing is left) and starts again with the next.
+# -----------------------------------------------------------------------------
+class StreamWorker:
+    def __init__(self, poll_interval=0.05):
+        self.poll_interval = poll_interval
+        self.sources = []
+        self.running = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, source):
+        with self._lock:
+            if source not in self.sources:
+                self.sources.append(source)
+            source.worker = self
+            if not self.running:
+                self.running = True
+                self._thread = threading.Thread(target=self._run, name="stream-worker", daemon=True)
+                self._thread.start()
+        self.wake()
+
+    def remove(self, source):
+        with self._lock:
+            if source in self.sources:
+                self.sources.remove(source)
+            source.worker = None
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self.running = False
+        self.wake()
+
+    def _run(self):
+        while self.running:
+            with self._lock:
+                if not self.sources:
+                    self.running = False
+                    return
+                sources = list(self.sources)
+            busy = False
+            for source in sources:
+                if not source.needs_refill():
+                    continue
+                try:
+                    if source.refill() > 0:
+                        busy = True
+                except Exception as e:
+                    print(f"Error decoding {source.path}: {e}")
+                    source.eof = True
+            if not busy:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+_worker = None
+
+def get_worker():
+    global _worker
+    if _worker is None:
+        _worker = StreamWorker()
+    return _worker
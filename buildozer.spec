@@ -6,7 +6,7 @@ source.dir = .
 source.include_exts = py,ogg,png
 include_dirs = sounds
 version = 1.0
-requirements = python3,kivy,pyjnius,plyer,kivymd
+requirements = python3,kivy,pyjnius,plyer,kivymd,numpy
 
 
 orientation = portrait
@@ -15,8 +15,11 @@ fullscreen = 0
 presplash.filename = splash.png
 icon.filename = icon.png
 
+# The audio engine runs in its own service process (see service.py).
+services = Audioengine:service.py:foreground
 
-android.permissions = INTERNET
+
+android.permissions = INTERNET,FOREGROUND_SERVICE
 android.archs = arm64-v8a
 android.ndk = 25b
 android.api = 33
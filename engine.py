@@ -0,0 +1,865 @@
+import threading, time
+from collections import deque
+import numpy as np
+from kivy.utils import platform
+
+from audio_stream import StreamingSource, BufferSource, get_worker, decoder_available
+from audio_output import open_sink, sink_available
+from resampler import Resampler, polyphase_kernel, rate_ratio, DEFAULT_QUALITY
+from scheduler import DeadlineQueue, boot_time
+from filters import FilterBank, NEUTRAL
+from modulation import ModulationBank, MOD_TARGETS, MOD_SHAPES
+from events import EventBank, EventLayer, DEFAULT_DENSITY, DEFAULT_JITTER_DB
+from quality import QualityGovernor, HintsMonitor, TIERS, LITE_FILTER_GAIN, AUTO
+from warmup import CACHE_RATE
+from pitch import PitchShifter, quantize, pitch_ratio, GRAIN_SECONDS
+
+ENGINE_RATE = 44100
+BLOCK_FRAMES = 512
+MAX_VOICES = 64
+QUEUE_SIZE = 256
+SNAPSHOT_INTERVAL = 0.05
+SLEEP_CANCEL_SECONDS = 1.0  # ramp back up when a sleep fade is cancelled
+METER_RMS_SECONDS = 0.3     # averaging time of the published RMS levels
+METER_PEAK_FALL_DB = 20.0   # dB per second a published peak falls back
+
+# Command opcodes.
+OP_ADD = 1
+OP_REMOVE = 2
+OP_PLAY = 3
+OP_STOP = 4
+OP_GAIN = 5
+OP_LOAD_MIX = 6
+OP_SLEEP = 7
+OP_AT = 8
+OP_CLEAR_TIMED = 9
+OP_EVENTS = 10
+OP_FILTER = 11
+OP_PAN = 12
+OP_MOD = 13
+OP_QUALITY = 14
+OP_VARY = 15
+
+FADE_CURVES = ("linear", "cosine", "equal_power", "exponential")
+
+# Voices whose gain stays below this (-60 dB) are suspended rather than mixed.
+AUDIBLE_GAIN = 0.001
+
+# Filter cutoff modulation is re-targeted every this many blocks per voice.
+MOD_FILTER_BLOCKS = 4
+
+# Resampler preset for voices playing at another speed; several of them can
+# run at once, so they get the cheaper kernels.
+VARISPEED_QUALITY = "fast"
+
+def fade_curve(curve, progress):
+    # Gain multiplier for fade progress in [0, 1]; reaches exactly 0 at 1.
+    progress = np.clip(progress, 0.0, 1.0)
+    if curve == "cosine":
+        return 0.5 * (1.0 + np.cos(np.pi * progress))
+    if curve == "equal_power":
+        return np.cos(0.5 * np.pi * progress)
+    if curve == "exponential":
+        return np.power(10.0, -3.0 * progress) * (1.0 - progress)
+    return 1.0 - progress
+
+def pan_gains(pan):
+    # Equal-power pan law, unity at the centre.
+    angle = (np.clip(pan, -1.0, 1.0) + 1.0) * np.pi / 4.0
+    return np.cos(angle) * np.sqrt(2.0), np.sin(angle) * np.sqrt(2.0)
+
+def pan_matrix(pan, width):
+    # (V, 2, 2) output-from-input matrices: width blends each channel with
+    # the other (1 = as recorded, 0 = mono), then the pan gains scale rows.
+    left, right = pan_gains(pan)
+    direct = (1.0 + np.asarray(width)) / 2.0
+    cross = 1.0 - direct
+    return np.stack((np.stack((left * direct, left * cross), axis=-1),
+                     np.stack((right * cross, right * direct), axis=-1)), axis=-2).astype(np.float32)
+
+# -----------------------------------------------------------------------------
+# CommandQueue – Bounded single-producer/single-consumer queue over
+# preallocated slots. Neither side takes a lock; the producer fills a slot
+# before publishing it by advancing head, and a full queue rejects the push.
+# -----------------------------------------------------------------------------
+class CommandQueue:
+    def __init__(self, size=QUEUE_SIZE):
+        self.size = size
+        self._ops = [0] * size
+        self._sids = [0] * size
+        self._values = [None] * size
+        self._times = [0.0] * size
+        self._head = 0
+        self._tail = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self._head - self._tail
+
+    def push(self, op, sid=0, value=None):
+        if self._head - self._tail >= self.size:
+            self.dropped += 1
+            return False
+        i = self._head % self.size
+        self._ops[i] = op
+        self._sids[i] = sid
+        self._values[i] = value
+        self._times[i] = time.perf_counter()
+        self._head += 1
+        return True
+
+    def pop(self):
+        if self._tail == self._head:
+            return None
+        i = self._tail % self.size
+        command = (self._ops[i], self._sids[i], self._values[i], self._times[i])
+        self._values[i] = None
+        self._tail += 1
+        return command
+
+# -----------------------------------------------------------------------------
+# Voice – One sound inside the engine: its source plus rate conversion to the
+# engine rate when the file was recorded at something else or plays at another
+# speed, and a pitch shift when the pitch should not follow the speed.
+# -----------------------------------------------------------------------------
+class Voice:
+    def __init__(self, source, rate=ENGINE_RATE):
+        self.source = source
+        self.rate = None
+        self.speed = 1.0
+        self.semitones = 0.0
+        self.shifter = None
+        self._skip = 0.0
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        if rate == self.rate:
+            return
+        self.rate = rate
+        self._convert()
+
+    def set_variation(self, speed, semitones):
+        # Speed is varispeed: the source is read as if recorded at
+        # sample_rate * speed. The shifter then moves the pitch from where
+        # varispeed left it to where it was asked to be.
+        speed, semitones = quantize(speed, semitones)
+        if (speed, semitones) == (self.speed, self.semitones):
+            return
+        self.speed, self.semitones = speed, semitones
+        self._convert()
+
+    def _convert(self):
+        self.step = self.source.sample_rate * self.speed / self.rate
+        self.resampler = None
+        if self.step != 1.0:
+            quality = VARISPEED_QUALITY if self.speed != 1.0 else DEFAULT_QUALITY
+            self.resampler = Resampler(int(round(self.source.sample_rate * self.speed)), self.rate, quality)
+        self._pending = np.zeros((0, 2), dtype=np.float32)
+        ratio = pitch_ratio(self.semitones) / self.speed
+        if abs(ratio - 1.0) < 1e-3:
+            self.shifter = None
+        elif self.shifter is None or self.shifter.grain != int(GRAIN_SECONDS * self.rate):
+            self.shifter = PitchShifter(ratio, self.rate)
+        else:
+            self.shifter.set_ratio(ratio)
+
+    def fill(self, out):
+        self._fill(out)
+        if self.shifter is not None:
+            self.shifter.process_into(out)
+
+    def _fill(self, out):
+        if self.resampler is None:
+            self.source.read_into(out)
+            return
+        frames = len(out)
+        while len(self._pending) < frames:
+            need = (frames - len(self._pending)) * self.resampler.down // self.resampler.up + 1
+            chunk = np.empty((need, 2), dtype=np.float32)
+            self.source.read_into(chunk)
+            self._pending = np.concatenate((self._pending, self.resampler.process(chunk)))
+        out[:] = self._pending[:frames]
+        self._pending = self._pending[frames:]
+
+    @property
+    def memory_bytes(self):
+        return self.source.memory_bytes + self._pending.nbytes
+
+    def suspend(self):
+        # Frames already converted count as played.
+        if len(self._pending):
+            self._skip -= len(self._pending) * self.step
+            self._pending = self._pending[:0]
+        self.source.suspend()
+
+    def skip(self, frames):
+        self._skip += frames * self.step
+        whole = int(self._skip)
+        self._skip -= whole
+        self.source.skip(whole)
+
+    def resume(self):
+        # True once the source can play from its playhead again.
+        if self.source.suspended:
+            if self.resampler is not None:
+                self.resampler.reset()
+            if self.shifter is not None:
+                self.shifter.reset()
+        return self.source.resume()
+
+    def restart(self):
+        self.source.seek(0)
+        self._skip = 0.0
+        if self.resampler is not None:
+            self.resampler.reset()
+            self._pending = self._pending[:0]
+        if self.shifter is not None:
+            self.shifter.reset()
+
+# -----------------------------------------------------------------------------
+# AudioEngine – Software mixer on a dedicated high-priority render thread.
+#
+# Control threads only ever call post() (or the add/remove helpers that wrap
+# it); the render thread drains the queue once per block, mixes all active
+# voices in one vectorized pass and republishes a state snapshot. Voices are
+# rendered at render_rate, which a lower quality tier may set below the output
+# rate; the finished mix is then upsampled once.
+# -----------------------------------------------------------------------------
+class AudioEngine:
+    def __init__(self, sample_rate=ENGINE_RATE, block_frames=BLOCK_FRAMES, max_voices=MAX_VOICES,
+                 sink_factory=open_sink):
+        self.sample_rate = sample_rate
+        self.sink_factory = sink_factory
+        self.base_block_frames = block_frames
+        self.max_voices = max_voices
+        self.queue = CommandQueue()
+        self.voices = [None] * max_voices
+        self.paths = {}
+        self.gain = np.zeros(max_voices, dtype=np.float32)
+        self.target = np.zeros(max_voices, dtype=np.float32)
+        self.active = np.zeros(max_voices, dtype=bool)
+        self.stopping = np.zeros(max_voices, dtype=bool)
+        self.suspended = np.zeros(max_voices, dtype=bool)
+        # Time each voice last went out in its first block after a start.
+        self.first_block = np.zeros(max_voices)
+        self._unheard = np.zeros(max_voices, dtype=bool)
+        self.glide = np.zeros(max_voices, dtype=np.float32)
+        self.timed = DeadlineQueue()
+        self.filters = None
+        self.pan = np.zeros(max_voices, dtype=np.float32)
+        self.width = np.ones(max_voices, dtype=np.float32)
+        self.speed = np.ones(max_voices)
+        self.semitones = np.zeros(max_voices)
+        self.pan_now = np.zeros(max_voices, dtype=np.float32)
+        self.modulation = ModulationBank(max_voices, block_frames / sample_rate)
+        self._matrix = np.tile(np.eye(2, dtype=np.float32), (max_voices, 1, 1))
+        self.quality = QualityGovernor()
+        self.hints = HintsMonitor(self.quality)
+        self.render_rate = None
+        self._configure(self.quality.tier)
+        self._retired = deque()
+        self._wake = threading.Event()
+        self._thread = None
+        self.sink = None
+        self.running = False
+
+        self._sleep_at = None
+        self._fade_pos = -1
+        self._fade_frames = 0
+        self._fade_curve = "linear"
+        self._unfade_pos = -1
+        self._unfade_from = 1.0
+        self.finished = False
+
+        self.blocks = 0
+        self.stream_time = 0.0
+        self.culled = 0
+        self.late_commands = 0
+        self.output_underruns = 0
+        self.render_load = 0.0
+        self._snapshot_blocks = 0
+        self._snapshot_filter_time = 0.0
+        # Meters: peak and mean-square levels per voice and for the master
+        # with meter ballistics applied every block, so readers see the same
+        # levels however often snapshots are taken or polled.
+        self.peak = np.zeros(max_voices, dtype=np.float32)
+        self.power = np.zeros(max_voices, dtype=np.float32)
+        self.master_peak = 0.0
+        self.master_power = 0.0
+        self.snapshot = self._make_snapshot()
+        self._last_snapshot = 0.0
+
+    # -- control side --------------------------------------------------------
+    def start(self):
+        if self.running:
+            return
+        self.sink = self.sink_factory(self.sample_rate, block_frames=self.block_frames)
+        self.running = True
+        self.hints.start()
+        self._thread = threading.Thread(target=self._run, name="audio-render", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        self.hints.stop()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self.sink:
+            self.sink.close()
+            self.sink = None
+        for sid, voice in enumerate(self.voices):
+            if voice is not None:
+                self._retired.append(voice)
+                self.voices[sid] = None
+        self.paths.clear()
+        self._reap()
+
+    def post(self, op, sid=0, value=None):
+        ok = self.queue.push(op, sid, value)
+        self._wake.set()
+        return ok
+
+    def add_sound(self, sid, path):
+        # Opening the decoder is blocking I/O, so it happens here on the
+        # caller's thread and the render thread only receives the voice.
+        self._reap()
+        if self.paths.get(sid) == path:
+            return True
+        self.paths[sid] = path
+        source = StreamingSource(path, loop=True)
+        get_worker().add(source)
+        return self.post(OP_ADD, sid, Voice(source, self.sample_rate))
+
+    def add_layer(self, sid, pcm_path, offset=0.0):
+        # Plays sid from a warm-up cache file starting offset seconds in.
+        # Every sid on the same file shares one mapping of it, so another
+        # layer of a sound costs a read cursor rather than a decoder.
+        self._reap()
+        if self.paths.get(sid) == (pcm_path, offset):
+            return True
+        self.paths[sid] = (pcm_path, offset)
+        source = BufferSource(pcm_path, CACHE_RATE, int(offset * CACHE_RATE))
+        get_worker().add(source)
+        return self.post(OP_ADD, sid, Voice(source, self.sample_rate))
+
+    def add_events(self, sid, bank_path, density=DEFAULT_DENSITY, jitter_db=DEFAULT_JITTER_DB):
+        # Generative playback: sid plays random events from its sliced pool
+        # instead of the looped file. add_sound() switches it back.
+        self._reap()
+        if self.paths.get(sid) == bank_path:
+            return self.set_events(sid, density, jitter_db)
+        self.paths[sid] = bank_path
+        layer = EventLayer(EventBank(bank_path, self.sample_rate), self.sample_rate, density, jitter_db)
+        get_worker().add(layer.source)
+        return self.post(OP_ADD, sid, layer)
+
+    def set_events(self, sid, density, jitter_db=DEFAULT_JITTER_DB):
+        return self.post(OP_EVENTS, sid, (density, jitter_db))
+
+    def set_filter(self, sid, params):
+        # params: (high-pass Hz, low-pass Hz, low shelf dB, high shelf dB).
+        return self.post(OP_FILTER, sid, tuple(params))
+
+    def set_pan(self, sid, pan, width=1.0):
+        return self.post(OP_PAN, sid, (pan, width))
+
+    def set_modulation(self, sid, target, shape, rate=0.0, depth=0.0):
+        # target in MOD_TARGETS, shape in MOD_SHAPES; rate in Hz.
+        return self.post(OP_MOD, sid, (MOD_TARGETS.index(target), MOD_SHAPES.index(shape), rate, depth))
+
+    def set_variation(self, sid, speed=1.0, semitones=0.0):
+        # Playback speed (varispeed) and pitch in semitones for sid. The
+        # resampler kernel is built here, off the render thread; the voice
+        # then finds it in the kernel cache.
+        speed, semitones = quantize(speed, semitones)
+        voice = self.voices[sid]
+        if isinstance(voice, Voice) and self.render_rate:
+            polyphase_kernel(*rate_ratio(int(round(voice.source.sample_rate * speed)), self.render_rate), VARISPEED_QUALITY)
+        return self.post(OP_VARY, sid, (speed, semitones))
+
+    def set_quality(self, tier=AUTO):
+        # A tier index pins the quality; AUTO lets the governor choose.
+        return self.post(OP_QUALITY, 0, tier)
+
+    def remove_sound(self, sid):
+        self._reap()
+        self.paths.pop(sid, None)
+        return self.post(OP_REMOVE, sid)
+
+    def load_mix(self, entries, transition=0.0):
+        # entries: iterable of (sid, gain, playing); sounds not listed stop.
+        # Gains glide to their new values over transition seconds.
+        return self.post(OP_LOAD_MIX, 0, (tuple(entries), transition))
+
+    def schedule(self, delay, op, sid=0, value=None):
+        # Apply a command delay seconds from now, timed by the render thread,
+        # so it lands on schedule even while the UI is paused.
+        return self.schedule_all(((delay, op, sid, value),))
+
+    def schedule_all(self, commands):
+        # Many (delay, op, sid, value) commands as one post: they go straight
+        # into the render thread's deadline queue, not one queue slot each.
+        return self.post(OP_AT, 0, tuple(commands))
+
+    def clear_scheduled(self):
+        return self.post(OP_CLEAR_TIMED)
+
+    def sleep(self, delay, fade, curve="cosine"):
+        # After delay seconds fade the whole mix out over fade seconds, then
+        # release every voice, decoder and the sink and end the render thread.
+        # A negative delay cancels a pending sleep.
+        return self.post(OP_SLEEP, 0, (delay, fade, FADE_CURVES.index(curve)))
+
+    def _reap(self):
+        while self._retired:
+            voice = self._retired.popleft()
+            try:
+                voice.source.close()
+            except Exception as e:
+                print(f"Error closing source: {e}")
+
+    # -- render side ---------------------------------------------------------
+    def _raise_priority(self):
+        if platform == "android":
+            try:
+                from jnius import autoclass
+                Process = autoclass("android.os.Process")
+                Process.setThreadPriority(Process.THREAD_PRIORITY_URGENT_AUDIO)
+            except Exception as e:
+                print(f"Error raising render thread priority: {e}")
+        else:
+            try:
+                import os
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), -10)
+            except Exception:
+                # Needs CAP_SYS_NICE on Linux; the default priority still works.
+                pass
+
+    def _configure(self, tier):
+        # Switches every rate- and block-size-dependent buffer to a quality
+        # tier. Runs on the render thread between blocks (or before start).
+        settings = TIERS[tier]
+        old_rate = self.render_rate
+        divisor = settings["rate_divisor"]
+        self.block_frames = self.base_block_frames * settings["block_scale"]
+        self.block_time = self.block_frames / self.sample_rate
+        self.late_threshold = 2 * self.block_time
+        self.render_rate = self.sample_rate // divisor
+        self.render_frames = self.block_frames // divisor
+        self.mono = settings["mono"]
+        self.filter_mode = settings["filters"]
+        self.cull_gain = settings["cull_gain"]
+        frames = self.render_frames
+        self._buffers = np.zeros((self.max_voices, frames, 2), dtype=np.float32)
+        self._ramp = np.arange(frames, dtype=np.float32) / frames
+        self._out = np.zeros((self.block_frames, 2), dtype=np.float32)
+        self._mix = self._out if divisor == 1 else np.zeros((frames, 2), dtype=np.float32)
+        self._upsampler = None if divisor == 1 else Resampler(self.render_rate, self.sample_rate, "fast")
+        self._up_pending = np.zeros((0, 2), dtype=np.float32)
+        filters = FilterBank(self.max_voices, frames, self.render_rate)
+        if self.filters is not None:
+            filters.adopt(self.filters)
+        self.filters = filters
+        self.modulation.block_time = self.block_time
+        self._power_keep = float(np.exp(-self.block_time / METER_RMS_SECONDS))
+        self._peak_keep = float(10.0 ** (-METER_PEAK_FALL_DB * self.block_time / 20.0))
+        if old_rate is not None and old_rate != self.render_rate:
+            self.glide *= self.render_rate / old_rate
+            for voice in self.voices:
+                if voice is not None:
+                    voice.set_rate(self.render_rate)
+
+    def _apply(self, op, sid, value):
+        if op == OP_ADD:
+            if self.voices[sid] is not None:
+                # Swapping the voice behind a sound (loop <-> events) keeps
+                # it playing; the gain ramps back up over one block.
+                self._retired.append(self.voices[sid])
+            else:
+                self.active[sid] = False
+                self.stopping[sid] = False
+            value.set_rate(self.render_rate)
+            if isinstance(value, Voice):
+                value.set_variation(self.speed[sid], self.semitones[sid])
+            self.voices[sid] = value
+            self.gain[sid] = 0.0
+            self.suspended[sid] = False
+            self.filters.reset(sid)
+        elif op == OP_REMOVE:
+            if self.voices[sid] is not None:
+                self._retired.append(self.voices[sid])
+                self.voices[sid] = None
+            self.active[sid] = False
+            self.stopping[sid] = False
+            self.suspended[sid] = False
+            self.modulation.clear(sid)
+            # The sid may be handed to a new sound; it starts from defaults.
+            self.pan[sid], self.width[sid] = 0.0, 1.0
+            self.speed[sid], self.semitones[sid] = 1.0, 0.0
+            self.filters.set_params(sid, NEUTRAL)
+        elif op == OP_PLAY:
+            if self.voices[sid] is not None:
+                if not self.active[sid]:
+                    self.gain[sid] = 0.0
+                    self._unheard[sid] = True
+                self.active[sid] = True
+                self.stopping[sid] = False
+        elif op == OP_STOP:
+            if self.active[sid]:
+                self.stopping[sid] = True
+        elif op == OP_GAIN:
+            self.target[sid] = value
+            self.glide[sid] = 0.0
+        elif op == OP_LOAD_MIX:
+            entries, transition = value
+            listed = np.zeros(self.max_voices, dtype=bool)
+            for mix_sid, gain, playing in entries:
+                listed[mix_sid] = True
+                self.target[mix_sid] = gain
+                if playing:
+                    self._apply(OP_PLAY, mix_sid, None)
+                else:
+                    self._apply(OP_STOP, mix_sid, None)
+            self.stopping |= self.active & ~listed
+            self.glide[self.active] = transition * self.render_rate
+        elif op == OP_EVENTS:
+            if isinstance(self.voices[sid], EventLayer):
+                self.voices[sid].set_params(*value)
+        elif op == OP_FILTER:
+            self.filters.set_params(sid, value)
+        elif op == OP_PAN:
+            self.pan[sid], self.width[sid] = value
+        elif op == OP_VARY:
+            self.speed[sid], self.semitones[sid] = value
+            if isinstance(self.voices[sid], Voice):
+                self.voices[sid].set_variation(*value)
+        elif op == OP_MOD:
+            target, shape, rate, depth = value
+            self.modulation.set(sid, target, shape, rate, depth, self.stream_time)
+            if MOD_TARGETS[target] == "cutoff" and MOD_SHAPES[shape] == "off":
+                self.filters.modulate(np.array([sid]), 0.0)
+        elif op == OP_QUALITY:
+            change = self.quality.set_mode(value, time.perf_counter())
+            if change:
+                self._configure(change[0])
+        elif op == OP_AT:
+            now = boot_time()
+            for delay, timed_op, timed_sid, timed_value in value:
+                self.timed.push(now + delay, (timed_op, timed_sid, timed_value))
+        elif op == OP_CLEAR_TIMED:
+            self.timed.clear()
+        elif op == OP_SLEEP:
+            delay, fade, curve = value
+            if delay < 0:
+                self._sleep_at = None
+                if self._fade_pos >= 0:
+                    # Cancelled mid-fade: come back up from where the fade
+                    # got to instead of jumping to full level.
+                    progress = min(1.0, self._fade_pos / self._fade_frames)
+                    self._unfade_from = float(fade_curve(self._fade_curve, np.array([progress]))[0])
+                    self._unfade_pos = 0
+                self._fade_pos = -1
+            else:
+                # Boot time, like the UI's scheduler, so device suspend does
+                # not push the deadline back.
+                self._sleep_at = boot_time() + delay
+                self._fade_frames = max(1, int(fade * self.sample_rate))
+                self._fade_curve = FADE_CURVES[int(curve)]
+
+    def _drain_commands(self, now):
+        while True:
+            command = self.queue.pop()
+            if command is None:
+                return
+            op, sid, value, posted = command
+            if now - posted > self.late_threshold:
+                self.late_commands += 1
+            try:
+                self._apply(op, sid, value)
+            except Exception as e:
+                print(f"Error applying engine command {op}: {e}")
+
+    def _render(self):
+        index = np.flatnonzero(self.active)
+        out = self._out
+        self.culled = 0
+        self._decay_meters()
+        if len(index) == 0:
+            out[:] = 0.0
+            return out
+        frames = self.render_frames
+        pan = self.pan[index]
+        goal = np.where(self.stopping[index], 0.0, self.target[index]).astype(np.float32)
+        modulated = index[self.modulation.active[index]]
+        if len(modulated):
+            # Modulation is evaluated per block for all modulated voices at
+            # once; gains and pans are then ramped across the block as usual.
+            slots = np.flatnonzero(self.modulation.active[index])
+            self.modulation.evaluate(modulated, self.stream_time + self.block_time)
+            goal[slots] *= self.modulation.gain_factors(modulated)
+            pan = pan.copy()
+            pan[slots] += self.modulation.pan_offsets(modulated)
+            # Each voice's cutoff is re-targeted every MOD_FILTER_BLOCKS blocks,
+            # staggered by sid so the filter rebuilds spread evenly.
+            cutoff = modulated[(self.modulation.depth[modulated, 1] > 0)
+                               & ((modulated + self.blocks) % MOD_FILTER_BLOCKS == 0)]
+            if len(cutoff):
+                self.filters.modulate(cutoff, self.modulation.cutoff_octaves(cutoff))
+        self.pan_now[index] = pan
+        start = self.gain[index]
+        # Voices too quiet to hear are suspended: neither decoded nor mixed,
+        # only their playhead moves on so they come back in phase. Waking
+        # takes twice the threshold so a voice hovering at it doesn't flap,
+        # and a woken voice stays silent until its decoder has caught up.
+        threshold = max(self.cull_gain, AUDIBLE_GAIN)
+        suspended = self.suspended[index]
+        quiet = np.maximum(start, goal) < np.where(suspended, 2.0 * threshold, threshold)
+        waking = suspended & ~quiet
+        for slot in np.flatnonzero(waking):
+            quiet[slot] = not self.voices[index[slot]].resume()
+        self.suspended[index] = quiet
+        if quiet.any():
+            culled = index[quiet]
+            for sid, catching_up in zip(culled, waking[quiet]):
+                voice = self.voices[sid]
+                if not catching_up:
+                    voice.suspend()
+                voice.skip(frames)
+            self.culled = len(culled)
+            # A voice still catching up keeps its low gain to ramp up from.
+            self.gain[culled] = np.where(waking[quiet], start[quiet], goal[quiet])
+            self._finish(culled[self.stopping[culled]])
+            audible = ~quiet
+            index, pan, goal, start = index[audible], pan[audible], goal[audible], start[audible]
+        mix = self._mix
+        if len(index) == 0:
+            mix[:] = 0.0
+            return self._output(mix)
+        buffers = self._buffers[:len(index)]
+        for slot, sid in enumerate(index):
+            self.voices[sid].fill(buffers[slot])
+        channels = 2
+        if self.mono:
+            buffers[:, :, 0] += buffers[:, :, 1]
+            buffers[:, :, 0] *= 0.5
+            channels = 1
+        if self.filter_mode == "full":
+            self.filters.process(index, buffers, channels)
+        elif self.filter_mode == "lite":
+            self.filters.process(index, buffers, channels, np.maximum(start, goal) >= LITE_FILTER_GAIN)
+        # Gains normally settle within one block; a mix transition spreads
+        # the move over glide frames instead.
+        remaining = self.glide[index]
+        step = np.minimum(1.0, frames / np.maximum(remaining, 1.0)).astype(np.float32)
+        end = start + (goal - start) * step
+        self.glide[index] = np.maximum(remaining - frames, 0.0)
+        ramps = start[:, None] + (end - start)[:, None] * self._ramp
+        if self.mono:
+            np.einsum("vn,vn->n", ramps, buffers[:, :, 0], out=mix[:, 0])
+            mix[:, 1] = mix[:, 0]
+            self._meter(index, buffers[:, :, :1], start, end)
+        else:
+            # Pan and width as one 2x2 matrix per voice, applied to every voice
+            # whether centred or not, so spatial mixes cost the same as flat ones.
+            start_matrix = self._matrix[index]
+            end_matrix = pan_matrix(pan, self.width[index])
+            spatial = np.matmul(buffers, start_matrix.transpose(0, 2, 1))
+            if not np.array_equal(start_matrix, end_matrix):
+                moved = np.matmul(buffers, end_matrix.transpose(0, 2, 1))
+                spatial += (moved - spatial) * self._ramp[None, :, None]
+            self._matrix[index] = end_matrix
+            np.einsum("vn,vnc->nc", ramps, spatial, out=mix)
+            self._meter(index, spatial, start, end)
+        self.gain[index] = end
+        heard = index[self._unheard[index]]
+        if len(heard):
+            self.first_block[heard] = time.perf_counter()
+            self._unheard[heard] = False
+        self._finish(index[self.stopping[index] & (step >= 1.0)])
+        return self._output(mix)
+
+    def _decay_meters(self):
+        # Peaks fall back at METER_PEAK_FALL_DB per second and the mean
+        # squares are averaged over about METER_RMS_SECONDS; silent voices
+        # fade out of the meters the same way.
+        self.peak *= self._peak_keep
+        self.power *= self._power_keep
+        self.master_peak *= self._peak_keep
+        self.master_power *= self._power_keep
+
+    def _meter(self, index, signal, start, end):
+        # Pre-gain levels scaled by the block's gains: two passes over data
+        # the mix has just touched, for every voice at once.
+        loud = np.maximum(np.abs(start), np.abs(end))
+        peak = np.abs(signal).max(axis=(1, 2)) * loud
+        power = np.einsum("vnc,vnc->v", signal, signal) / (signal.shape[1] * signal.shape[2]) * (0.5 * (start + end)) ** 2
+        np.maximum(self.peak[index], peak, out=peak)
+        self.peak[index] = peak
+        self.power[index] += power * (1.0 - self._power_keep)
+
+    def _output(self, mix):
+        out = self._out
+        if self._upsampler is not None:
+            pending = np.concatenate((self._up_pending, self._upsampler.process(mix)))
+            if len(pending) < self.block_frames:
+                # Only right after a tier change, while the filter fills up.
+                pending = np.concatenate((np.zeros((self.block_frames - len(pending), 2), dtype=np.float32), pending))
+            out[:] = pending[:self.block_frames]
+            self._up_pending = pending[self.block_frames:]
+        if self._fade_pos >= 0:
+            progress = (self._fade_pos + np.arange(self.block_frames)) / self._fade_frames
+            out *= fade_curve(self._fade_curve, progress).astype(np.float32)[:, None]
+            self._fade_pos += self.block_frames
+            if self._fade_pos >= self._fade_frames:
+                self.finished = True
+        elif self._unfade_pos >= 0:
+            frames = SLEEP_CANCEL_SECONDS * self.sample_rate
+            progress = np.minimum(1.0, (self._unfade_pos + np.arange(self.block_frames)) / frames)
+            out *= (self._unfade_from + (1.0 - self._unfade_from) * progress).astype(np.float32)[:, None]
+            self._unfade_pos += self.block_frames
+            if self._unfade_pos >= frames:
+                self._unfade_pos = -1
+        self.master_peak = max(self.master_peak, float(np.abs(out).max()))
+        self.master_power += float(np.einsum("nc,nc->", out, out)) / out.size * (1.0 - self._power_keep)
+        return out
+
+    def _finish(self, finished):
+        if len(finished):
+            self.active[finished] = False
+            self.stopping[finished] = False
+            self.suspended[finished] = False
+            for sid in finished:
+                self.voices[sid].restart()
+
+    def _make_snapshot(self):
+        index = np.flatnonzero(self.active & ~self.stopping)
+        mod_index = index[self.modulation.active[index]]
+        blocks = self.blocks - self._snapshot_blocks
+        filter_time = self.filters.process_time - self._snapshot_filter_time
+        self._snapshot_blocks = self.blocks
+        self._snapshot_filter_time = self.filters.process_time
+        peaks = self.peak[index]
+        rms = np.sqrt(self.power[index])
+        master_peak, master_rms = self.master_peak, float(np.sqrt(self.master_power))
+        return {
+            "time": time.perf_counter(),
+            "playing": tuple(int(sid) for sid in index),
+            "gains": tuple(float(g) for g in self.target[index]),
+            "blocks": self.blocks,
+            "render_load": self.render_load,
+            "filter_load": filter_time / (blocks * self.block_time) if blocks else 0.0,
+            "tier": self.quality.tier,
+            "tier_reason": self.quality.reason,
+            "quality_mode": self.quality.mode,
+            "culled": self.culled,
+            "decoding": int(np.count_nonzero(self.active & ~self.suspended)),
+            "source_underruns": sum(v.source.underruns for v in self.voices if v is not None),
+            "output_underruns": self.output_underruns,
+            "late_commands": self.late_commands,
+            "dropped_commands": self.queue.dropped,
+            "mod_sids": tuple(int(sid) for sid in mod_index),
+            "mod_gains": tuple(float(g) for g in self.gain[mod_index]),
+            "mod_pans": tuple(float(p) for p in self.pan_now[mod_index]),
+            "voice_sids": tuple(sid for sid, voice in enumerate(self.voices) if voice is not None),
+            "voice_bytes": tuple(voice.memory_bytes for voice in self.voices if voice is not None),
+            "first_blocks": tuple(float(t) for t in self.first_block[index]),
+            "peaks": tuple(float(p) for p in peaks),
+            "rms": tuple(float(r) for r in rms),
+            "master_peak": master_peak,
+            "master_rms": master_rms,
+            "sleep_in": -1.0 if self._sleep_at is None else max(0.0, self._sleep_at - boot_time()),
+            "running": self.running and not self.finished,
+        }
+
+    def _release_all(self):
+        # End of a sleep fade; the render loop has exited, so blocking work
+        # such as closing decoders is fine on this thread now.
+        self.active[:] = False
+        self.stopping[:] = False
+        for sid, voice in enumerate(self.voices):
+            if voice is not None:
+                self._retired.append(voice)
+                self.voices[sid] = None
+        self.paths.clear()
+        self._reap()
+        if self.sink:
+            self.sink.close()
+            self.sink = None
+        self.hints.stop()
+        self.running = False
+
+    def _run(self):
+        self._raise_priority()
+        idle = False
+        try:
+            while self.running and not self.finished:
+                self._wake.clear()
+                start = time.perf_counter()
+                self._drain_commands(start)
+                now = boot_time()
+                next_timed = self.timed.next_deadline()
+                if next_timed is not None and next_timed <= now:
+                    for timed_op, timed_sid, timed_value in self.timed.pop_due(now):
+                        self._apply(timed_op, timed_sid, timed_value)
+                    next_timed = self.timed.next_deadline()
+                if self._sleep_at is not None and now >= self._sleep_at:
+                    self._sleep_at = None
+                    self._fade_pos = 0
+                    self._unfade_pos = -1
+                    if not self.active.any():
+                        self.finished = True
+                        break
+                if not self.active.any():
+                    if not idle:
+                        self.sink.pause()
+                        idle = True
+                        self.snapshot = self._make_snapshot()
+                    # No polling while idle: sleep until a command arrives or
+                    # the sleep deadline comes due.
+                    deadlines = [d for d in (self._sleep_at, next_timed) if d is not None]
+                    timeout = max(0.0, min(deadlines) - now) if deadlines else None
+                    self._wake.wait(timeout)
+                    continue
+                if idle:
+                    self.sink.resume()
+                    idle = False
+                out = self._render()
+                elapsed = time.perf_counter() - start
+                self.render_load = 0.9 * self.render_load + 0.1 * (elapsed / self.block_time)
+                self.blocks += 1
+                self.stream_time += self.block_time
+                if start - self._last_snapshot >= SNAPSHOT_INTERVAL:
+                    self._last_snapshot = start
+                    self.snapshot = self._make_snapshot()
+                underrun = self.sink.write(out)
+                if underrun:
+                    self.output_underruns += 1
+                change = self.quality.observe(self.render_load, underrun, start)
+                if change:
+                    self._configure(change[0])
+            if self.finished:
+                self._release_all()
+                self.snapshot = self._make_snapshot()
+        finally:
+            if platform == "android":
+                try:
+                    import jnius
+                    jnius.detach()
+                except Exception:
+                    pass
+
+def engine_available(paths=()):
+    return sink_available() and all(decoder_available(path) for path in paths)
+
+def create_engine(paths=()):
+    if not engine_available(paths):
+        return None
+    try:
+        engine = AudioEngine()
+        engine.start()
+        return engine
+    except Exception as e:
+        print(f"Error starting audio engine: {e}")
+        return None
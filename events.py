@@ -0,0 +1,248 @@
+import os
+import numpy as np
+from audio_stream import prefetch
+
+HOP_FRAMES = 512
+ONSET_RISE_DB = 9.0
+NOISE_MARGIN_DB = 6.0
+DECAY_DB = 30.0
+MIN_GAP_SECONDS = 0.15
+MAX_EVENT_SECONDS = 4.0
+EDGE_FRAMES = 64
+MIN_EVENTS = 4
+
+DEFAULT_DENSITY = 15.0    # events per minute
+DEFAULT_JITTER_DB = 6.0
+MAX_OVERLAP = 8
+UPCOMING_EVENTS = 32      # events chosen ahead of time so their pages can be read in
+
+def event_index_path(pcm_path):
+    return pcm_path[:-len(".events.npy")] + ".events_index.npy"
+
+# -----------------------------------------------------------------------------
+# Offline slicing – Finds onsets as sharp rises in short-time energy above the
+# file's noise floor and keeps only the audible part of each event. The
+# slices are packed back to back into one int16 pool with an (offset, length)
+# index, so the silence between birdcalls is never stored.
+# -----------------------------------------------------------------------------
+def frame_energy_db(data, hop=HOP_FRAMES):
+    mono = data.mean(axis=1) if data.ndim == 2 else data
+    count = len(mono) // hop
+    frames = mono[:count * hop].reshape(count, hop)
+    return 10.0 * np.log10(np.mean(np.square(frames, dtype=np.float64), axis=1) + 1e-10)
+
+def detect_onsets(energy, rate, hop=HOP_FRAMES):
+    if len(energy) < 3:
+        return np.zeros(0, dtype=np.int64)
+    floor = np.median(energy)
+    rise = np.diff(energy, prepend=energy[0])
+    candidates = (rise > ONSET_RISE_DB) & (energy > floor + NOISE_MARGIN_DB)
+    candidates[1:] &= ~candidates[:-1]
+    onsets = np.flatnonzero(candidates)
+    min_gap = max(1, int(MIN_GAP_SECONDS * rate / hop))
+    keep = []
+    for onset in onsets:
+        if not keep or onset - keep[-1] >= min_gap:
+            keep.append(onset)
+    return np.asarray(keep, dtype=np.int64)
+
+def slice_events(data, rate, hop=HOP_FRAMES):
+    energy = frame_energy_db(data, hop)
+    onsets = detect_onsets(energy, rate, hop)
+    floor = np.median(energy) + NOISE_MARGIN_DB if len(energy) else 0.0
+    max_hops = int(MAX_EVENT_SECONDS * rate / hop)
+    bounds = []
+    for i, onset in enumerate(onsets):
+        limit = min(onset + max_hops, onsets[i + 1] if i + 1 < len(onsets) else len(energy))
+        segment = energy[onset:limit]
+        peak = onset + int(np.argmax(segment))
+        threshold = max(energy[peak] - DECAY_DB, floor)
+        below = np.flatnonzero(energy[peak:limit] < threshold)
+        end = peak + below[0] if len(below) else limit
+        start = max(0, onset - 1)
+        if end > start:
+            bounds.append((start * hop, end * hop))
+    return bounds
+
+def build_event_pool(data, bounds):
+    if not bounds:
+        return np.zeros((0, 2), dtype=np.int16), np.zeros((0, 2), dtype=np.int32)
+    lengths = np.array([end - start for start, end in bounds], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    pool = np.concatenate([data[start:end] for start, end in bounds]).astype(np.float32)
+    # Short fades at both edges so a slice never starts or ends on a click.
+    edge = np.linspace(0.0, 1.0, EDGE_FRAMES, dtype=np.float32)[:, None]
+    for offset, length in zip(offsets, lengths):
+        n = min(EDGE_FRAMES, length // 2)
+        pool[offset:offset + n] *= edge[:n]
+        pool[offset + length - n:offset + length] *= edge[:n][::-1]
+    pcm = (np.clip(pool, -1.0, 1.0) * 32767.0).astype(np.int16)
+    return pcm, np.stack((offsets, lengths), axis=1).astype(np.int32)
+
+def write_event_index(data, rate, cache_dir, key):
+    pcm, index = build_event_pool(data, slice_events(data, rate))
+    pcm_name = key + ".events.npy"
+    for name, array in ((pcm_name, pcm), (key + ".events_index.npy", index)):
+        path = os.path.join(cache_dir, name)
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, array)
+        os.replace(path + ".tmp", path)
+    return {"events": len(index), "events_pcm": pcm_name, "events_frames": len(pcm)}
+
+# -----------------------------------------------------------------------------
+# EventBank – The sliced pool of one sound, memory-mapped so only the events
+# actually played are paged in. The next UPCOMING_EVENTS picks are made in
+# advance; the StreamWorker pages each one in long before the render thread
+# draws it, so mixing an event never waits on the disk.
+# -----------------------------------------------------------------------------
+class EventBank:
+    def __init__(self, pcm_path, sample_rate, upcoming=UPCOMING_EVENTS):
+        self.path = pcm_path
+        self.sample_rate = sample_rate
+        self.pool = np.load(pcm_path, mmap_mode="r")
+        self.index = np.load(event_index_path(pcm_path))
+        self.underruns = 0
+        self.eof = False
+        self.worker = None
+        self.upcoming = np.zeros(upcoming, dtype=np.int64)
+        self.drawn = 0            # picks handed to the layer so far
+        self.picked = 0           # picks made so far
+        self.paged = 0            # picks paged in so far
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def memory_bytes(self):
+        # Mapped, so only the pages of events played so far are resident.
+        return self.index.nbytes + (self.pool.nbytes if self.pool is not None else 0)
+
+    def prime(self, rng):
+        # Caller's thread: the first picks, paged in before the bank plays.
+        self._pick(rng)
+        while self.refill():
+            pass
+
+    def _pick(self, rng):
+        count = self.drawn + len(self.upcoming) - self.picked
+        if count > 0 and len(self.index):
+            slots = np.arange(self.picked, self.picked + count) % len(self.upcoming)
+            self.upcoming[slots] = rng.integers(0, len(self.index), count)
+            self.picked += count
+
+    def draw(self, count, rng):
+        # The next count events as (offset, length) rows; render thread.
+        count = min(count, len(self.upcoming))
+        slots = np.arange(self.drawn, self.drawn + count) % len(self.upcoming)
+        events = self.index[self.upcoming[slots]]
+        self.drawn += count
+        self._pick(rng)
+        if self.worker is not None and self.paged < self.picked:
+            self.worker.wake()
+        return events
+
+    def needs_refill(self):
+        return not self.eof and self.pool is not None and self.paged < self.picked
+
+    def refill(self):
+        # Worker thread only.
+        pool = self.pool
+        if pool is None or self.paged >= self.picked:
+            return 0
+        self.paged = max(self.paged, self.drawn)
+        offset, length = self.index[self.upcoming[self.paged % len(self.upcoming)]]
+        prefetch(pool, int(offset), int(offset) + int(length))
+        self.paged += 1
+        return int(length)
+
+    def close(self):
+        if self.worker is not None:
+            self.worker.remove(self)
+        self.pool = None
+
+# -----------------------------------------------------------------------------
+# EventLayer – Engine voice that scatters bank events at random. Onsets are a
+# Poisson process at density events per minute, each with up to jitter_db of
+# gain cut; all overlapping events are gathered and mixed in one einsum.
+# -----------------------------------------------------------------------------
+class EventLayer:
+    def __init__(self, bank, rate, density=DEFAULT_DENSITY, jitter_db=DEFAULT_JITTER_DB,
+                 max_overlap=MAX_OVERLAP, seed=None):
+        if len(bank) == 0:
+            raise ValueError(f"No events in {bank.path}")
+        self.source = bank
+        self.rng = np.random.default_rng(seed)
+        self.density = density
+        self.jitter_db = jitter_db
+        self.set_rate(rate)
+        self.starts = np.zeros(max_overlap, dtype=np.int64)
+        self.lengths = np.ones(max_overlap, dtype=np.int64)
+        self.pos = np.zeros(max_overlap, dtype=np.int64)
+        self.gains = np.zeros(max_overlap, dtype=np.float32)
+        self.live = np.zeros(max_overlap, dtype=bool)
+        self.triggered = 0
+        bank.prime(self.rng)
+
+    @property
+    def memory_bytes(self):
+        return self.source.memory_bytes
+
+    def set_rate(self, rate):
+        # Reduced engine rates read the pool with a stride rather than a
+        # resampler; only whole divisors of the bank rate are supported.
+        if self.source.sample_rate % rate:
+            raise ValueError(f"Event bank is {self.source.sample_rate} Hz, engine runs at {rate} Hz")
+        self.rate = rate
+        self.stride = self.source.sample_rate // rate
+        self.set_params(self.density, self.jitter_db)
+
+    def set_params(self, density, jitter_db):
+        self.density = density
+        self.jitter_db = jitter_db
+        self._per_frame = density / 60.0 / self.rate
+
+    def _trigger(self, frames):
+        count = self.rng.poisson(self._per_frame * frames)
+        free = np.flatnonzero(~self.live)[:count]
+        if len(free) == 0:
+            return
+        events = self.source.draw(len(free), self.rng)
+        self.starts[free] = events[:, 0]
+        self.lengths[free] = events[:, 1]
+        # A negative position delays the onset to a random frame in the block.
+        self.pos[free] = -self.rng.integers(0, frames, len(free)) * self.stride
+        self.gains[free] = np.power(10.0, -self.rng.uniform(0.0, self.jitter_db, len(free)) / 20.0)
+        self.live[free] = True
+        self.triggered += len(free)
+
+    def fill(self, out):
+        frames = len(out)
+        self._trigger(frames)
+        live = np.flatnonzero(self.live)
+        if len(live) == 0:
+            out[:] = 0.0
+            return
+        t = self.pos[live, None] + np.arange(frames) * self.stride
+        lengths = self.lengths[live, None]
+        valid = (t >= 0) & (t < lengths)
+        samples = self.source.pool[self.starts[live, None] + np.clip(t, 0, lengths - 1)]
+        weights = valid * (self.gains[live, None] / 32767.0)
+        np.einsum("vn,vnc->nc", weights.astype(np.float32), samples.astype(np.float32), out=out)
+        self.pos[live] += frames * self.stride
+        self.live[live] = self.pos[live] < self.lengths[live]
+
+    def skip(self, frames):
+        # Suspended: keep triggering and advancing events without mixing
+        # them, so the layer carries on where it would have been.
+        self._trigger(frames)
+        self.pos[self.live] += frames * self.stride
+        self.live &= self.pos < self.lengths
+
+    def suspend(self):
+        pass
+
+    def resume(self):
+        return True
+
+    def restart(self):
+        self.live[:] = False
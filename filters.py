@@ -0,0 +1,302 @@
+import time
+import numpy as np
+
+# Filter parameters per voice: high-pass Hz, low-pass Hz, low shelf dB,
+# high shelf dB. NEUTRAL means the voice skips the stage entirely.
+NEUTRAL = (20.0, 20000.0, 0.0, 0.0)
+LOW_SHELF_HZ = 250.0
+HIGH_SHELF_HZ = 4000.0
+BUTTERWORTH_Q = 0.7071
+SMOOTHING_SECONDS = 0.05
+SUBBLOCK_FRAMES = 64
+STATES = 8   # four biquads, two states each
+MAX_GLIDES_PER_BLOCK = 4
+
+PRESETS = {
+    "flat": NEUTRAL,
+    "muffled": (20.0, 900.0, 2.0, -6.0),
+    "distant": (180.0, 2500.0, -4.0, -8.0),
+    "bright": (60.0, 20000.0, -2.0, 4.0),
+}
+
+def to_smooth_domain(params):
+    # Glide frequencies in octaves and gains in dB, so sweeps sound even.
+    params = np.asarray(params, dtype=np.float64)
+    return np.concatenate((np.log2(params[..., :2]), params[..., 2:]), axis=-1)
+
+def from_smooth_domain(values):
+    return np.concatenate((np.exp2(values[..., :2]), values[..., 2:]), axis=-1)
+
+# -----------------------------------------------------------------------------
+# Biquad design (RBJ cookbook), vectorized over voices. Each returns
+# (b0, b1, b2, a1, a2) normalized so that a0 == 1.
+# -----------------------------------------------------------------------------
+def _normalize(b0, b1, b2, a0, a1, a2):
+    return np.stack((b0 / a0, b1 / a0, b2 / a0, a1 / a0, a2 / a0), axis=-1)
+
+def design_pass(freq, rate, high):
+    w0 = 2.0 * np.pi * np.clip(freq, 10.0, 0.45 * rate) / rate
+    cos_w, alpha = np.cos(w0), np.sin(w0) / (2.0 * BUTTERWORTH_Q)
+    sign = -1.0 if high else 1.0
+    edge = (1.0 - sign * cos_w) / 2.0
+    return _normalize(edge, sign * 2.0 * edge, edge, 1.0 + alpha, -2.0 * cos_w, 1.0 - alpha)
+
+def design_shelf(freq, gain_db, rate, high):
+    amp = np.power(10.0, gain_db / 40.0)
+    w0 = 2.0 * np.pi * freq / rate
+    cos_w = np.cos(w0)
+    alpha = np.sin(w0) / 2.0 * np.sqrt(2.0)
+    root = 2.0 * np.sqrt(amp) * alpha
+    sign = 1.0 if high else -1.0
+    b0 = amp * ((amp + 1) + sign * (amp - 1) * cos_w + root)
+    b1 = -2.0 * sign * amp * ((amp - 1) + sign * (amp + 1) * cos_w)
+    b2 = amp * ((amp + 1) + sign * (amp - 1) * cos_w - root)
+    a0 = (amp + 1) - sign * (amp - 1) * cos_w + root
+    a1 = 2.0 * sign * ((amp - 1) - sign * (amp + 1) * cos_w)
+    a2 = (amp + 1) - sign * (amp - 1) * cos_w - root
+    return _normalize(b0, b1, b2, a0, a1, a2)
+
+def design_cascade(params, rate):
+    # (V, 4) parameters -> (V, 4, 5) coefficients, in processing order.
+    params = np.atleast_2d(params)
+    return np.stack((
+        design_pass(params[:, 0], rate, high=True),
+        design_pass(params[:, 1], rate, high=False),
+        design_shelf(LOW_SHELF_HZ, params[:, 2], rate, high=False),
+        design_shelf(HIGH_SHELF_HZ, params[:, 3], rate, high=True),
+    ), axis=1)
+
+# -----------------------------------------------------------------------------
+# State space – Each biquad in transposed direct form II is
+#   y = C s + D x,  s' = A s + B x
+# and a cascade of them is again one such system, here with eight states.
+# Over a sub-block of L samples that system becomes plain matrix algebra:
+#   y = T x + O s0,  s_L = F s0 + G x
+# with T the lower-triangular Toeplitz matrix of the impulse response. The K
+# sub-blocks of an engine block are then chained through F in closed form, so
+# a whole block is five batched matmuls with no per-sample Python loop.
+# -----------------------------------------------------------------------------
+def cascade_state_space(coeffs):
+    voices, stages = coeffs.shape[:2]
+    size = 2 * stages
+    A = np.zeros((voices, size, size))
+    B = np.zeros((voices, size))
+    C = np.zeros((voices, size))
+    D = np.ones(voices)
+    for stage in range(stages):
+        b0, b1, b2, a1, a2 = np.moveaxis(coeffs[:, stage], -1, 0)
+        i = 2 * stage
+        # This stage's input is the previous stages' output C s + D x.
+        A[:, i:i + 2, :i] = np.stack((b1 - a1 * b0, b2 - a2 * b0), axis=-1)[:, :, None] * C[:, None, :i]
+        A[:, i, i], A[:, i, i + 1] = -a1, 1.0
+        A[:, i + 1, i] = -a2
+        B[:, i:i + 2] = np.stack((b1 - a1 * b0, b2 - a2 * b0), axis=-1) * D[:, None]
+        C = b0[:, None] * C
+        C[:, i] = 1.0
+        D = b0 * D
+    return A, B, C, D
+
+def matrix_powers(A, count):
+    # A^0 .. A^(count-1) by repeated doubling: log2(count) batched matmuls.
+    voices, size = A.shape[:2]
+    powers = np.empty((voices, count, size, size))
+    powers[:, 0] = np.eye(size)
+    filled, step = 1, A
+    while filled < count:
+        take = min(filled, count - filled)
+        powers[:, filled:filled + take] = np.matmul(powers[:, :take], step[:, None])
+        filled += take
+        step = np.matmul(step, step)
+    return powers
+
+def block_matrices(params, rate, sub_frames, sub_blocks):
+    A, B, C, D = cascade_state_space(design_cascade(params, rate))
+    powers = matrix_powers(A, sub_frames + 1)                    # A^0 .. A^L
+    observe = np.einsum("vs,vnst->vnt", C, powers[:, :sub_frames])          # C A^n
+    impulse = np.concatenate((D[:, None], np.einsum("vns,vs->vn", observe[:, :-1], B)), axis=1)
+    lag = np.arange(sub_frames)[:, None] - np.arange(sub_frames)[None, :]
+    toeplitz = np.where(lag >= 0, impulse[:, np.clip(lag, 0, None)], 0.0)
+    feed = np.einsum("vnst,vt->vsn", powers[:, sub_frames - 1::-1], B)      # A^(L-1-m) B
+    carry = powers[:, sub_frames]                                           # F = A^L
+    carry_powers = matrix_powers(carry, sub_blocks + 1)                     # F^0 .. F^K
+    k = np.arange(sub_blocks)
+    steps = k[:, None] - 1 - k[None, :]
+    history = np.where((steps >= 0)[None, :, :, None, None],
+                       carry_powers[:, np.clip(steps, 0, None)], 0.0)       # F^(k-1-j), j < k
+    final = carry_powers[:, sub_blocks - 1::-1]                             # F^(K-1-j)
+    # Flatten to the (sub-block, state) row/column layout FilterBank uses.
+    voices, K, S = len(A), sub_blocks, A.shape[1]
+    entry = carry_powers[:, :K].reshape(voices, K * S, S)
+    history = history.transpose(0, 1, 3, 2, 4).reshape(voices, K * S, K * S)
+    final = final.transpose(0, 2, 1, 3).reshape(voices, S, K * S)
+    return tuple(m.astype(np.float32) for m in
+                 (toeplitz, observe, feed, entry, history, final, carry_powers[:, K]))
+
+# -----------------------------------------------------------------------------
+# FilterBank – Per-voice high-pass, low-pass and two shelves, applied in place
+# to the engine's voice buffers. All matrices and states are preallocated per
+# voice; only voices whose parameters are off NEUTRAL (or still gliding back
+# to it) are processed, and all of those go through the same few einsums.
+# -----------------------------------------------------------------------------
+class FilterBank:
+    def __init__(self, max_voices, block_frames, sample_rate, sub_frames=SUBBLOCK_FRAMES):
+        if block_frames % sub_frames:
+            sub_frames = block_frames
+        self.sample_rate = sample_rate
+        self.sub_frames = sub_frames
+        self.sub_blocks = block_frames // sub_frames
+        L, K, S = sub_frames, self.sub_blocks, STATES
+        neutral = to_smooth_domain(NEUTRAL)
+        self.current = np.tile(neutral, (max_voices, 1))
+        self.target = self.current.copy()
+        self.offset = np.zeros_like(self.current)
+        self.enabled = np.zeros(max_voices, dtype=bool)
+        self.dirty = np.zeros(max_voices, dtype=bool)
+        # Voices whose matrices have been built at least once; the others
+        # pass through unfiltered until their first rebuild.
+        self.built = np.zeros(max_voices, dtype=bool)
+        self.states = np.zeros((max_voices, S, 2), dtype=np.float32)
+        self.toeplitz = np.zeros((max_voices, L, L), dtype=np.float32)
+        self.observe = np.zeros((max_voices, L, S), dtype=np.float32)
+        self.feed = np.zeros((max_voices, S, L), dtype=np.float32)
+        self.entry = np.zeros((max_voices, K * S, S), dtype=np.float32)
+        self.history = np.zeros((max_voices, K * S, K * S), dtype=np.float32)
+        self.final = np.zeros((max_voices, S, K * S), dtype=np.float32)
+        self.carry = np.zeros((max_voices, S, S), dtype=np.float32)
+        self.smoothing = float(np.exp(-block_frames / sample_rate / SMOOTHING_SECONDS))
+        self.process_time = 0.0
+        self.processed = 0
+        self._turn = 0
+
+    def set_params(self, sid, params):
+        self.target[sid] = to_smooth_domain(params)
+        if not self.enabled[sid] and np.allclose(self.target[sid] + self.offset[sid], self.current[sid]):
+            return
+        self._enable(sid)
+
+    def modulate(self, sids, cutoff_octaves):
+        # Moves the low-pass cutoff of each voice cutoff_octaves away from
+        # its set value. Modulation arrives in small steps, so it skips the
+        # glide and costs one matrix rebuild per call.
+        self.offset[sids, 1] = cutoff_octaves
+        self.current[sids, 1] = np.where(self.enabled[sids], self.target[sids, 1] + self.offset[sids, 1],
+                                         self.current[sids, 1])
+        self._enable(sids)
+
+    def _enable(self, sids):
+        self.states[sids] = np.where(self.enabled[sids, None, None], self.states[sids], 0.0)
+        self.enabled[sids] = True
+        self.dirty[sids] = True
+
+    def reset(self, sid):
+        self.states[sid] = 0.0
+
+    def adopt(self, other):
+        # Take over another bank's settings after a rate or block size
+        # change. Matrices of the running filters are rebuilt right here,
+        # before the first block at the new size, and at an unchanged rate
+        # the filter states carry over too, so nothing drops out.
+        self.current[:] = other.current
+        self.target[:] = other.target
+        self.offset[:] = other.offset
+        self.enabled[:] = other.enabled
+        self.dirty[:] = other.dirty & other.enabled
+        live = np.flatnonzero(self.enabled)
+        if len(live):
+            self._build(live)
+        if other.sample_rate == self.sample_rate:
+            self.states[:] = other.states
+        self.process_time = other.process_time
+        self.processed = other.processed
+
+    def _build(self, sids):
+        matrices = block_matrices(from_smooth_domain(self.current[sids]), self.sample_rate,
+                                  self.sub_frames, self.sub_blocks)
+        for array, values in zip((self.toeplitz, self.observe, self.feed, self.entry,
+                                  self.history, self.final, self.carry), matrices):
+            array[sids] = values
+        self.built[sids] = True
+
+    def _glide(self, sids):
+        goal = self.target[sids] + self.offset[sids]
+        diff = goal - self.current[sids]
+        settled = np.abs(diff).max(axis=1) < 0.01
+        self.current[sids] = np.where(settled[:, None], goal, goal - diff * self.smoothing)
+        self.dirty[sids] = ~settled
+        self._build(sids)
+        neutral = settled & np.all(np.isclose(goal, to_smooth_domain(NEUTRAL)), axis=1)
+        self.enabled[sids[neutral]] = False
+
+    def process(self, index, buffers, channels=2, only=None):
+        # buffers: (len(index), frames, 2) voice blocks, filtered in place.
+        # channels=1 filters the left channel only (mono rendering); only is
+        # an optional mask over index of voices allowed to run.
+        enabled = self.enabled[index] if only is None else self.enabled[index] & only
+        slots = np.flatnonzero(enabled)
+        if len(slots) == 0:
+            return
+        started = time.perf_counter()
+        sids = index[slots]
+        dirty = sids[self.dirty[sids]]
+        if len(dirty):
+            # Rebuilding matrices is the expensive part, so a mix load that
+            # changes every voice spreads the work over a few blocks. Voices
+            # without matrices go first; until then they play unfiltered,
+            # which is where their glide starts from anyway.
+            self._turn += 1
+            fresh = self.built[dirty]
+            self._glide(np.concatenate((dirty[~fresh], np.roll(dirty[fresh], self._turn)))[:MAX_GLIDES_PER_BLOCK])
+            ready = self.built[sids]
+            slots, sids = slots[ready], sids[ready]
+            if len(slots) == 0:
+                return
+        V, K, L, S, C = len(sids), self.sub_blocks, self.sub_frames, STATES, channels
+        # Sub-block samples as rows, (sub-block, channel) pairs as columns.
+        x = buffers[slots, :, :C].reshape(V, K, L, C).transpose(0, 2, 1, 3).reshape(V, L, K * C)
+        s0 = self.states[sids, :, :C]
+        inputs = np.matmul(self.feed[sids], x).reshape(V, S, K, C).transpose(0, 2, 1, 3).reshape(V, K * S, C)
+        starts = np.matmul(self.entry[sids], s0) + np.matmul(self.history[sids], inputs)
+        starts = starts.reshape(V, K, S, C).transpose(0, 2, 1, 3).reshape(V, S, K * C)
+        y = np.matmul(self.toeplitz[sids], x) + np.matmul(self.observe[sids], starts)
+        self.states[sids, :, :C] = np.matmul(self.carry[sids], s0) + np.matmul(self.final[sids], inputs)
+        buffers[slots, :, :C] = y.reshape(V, L, K, C).transpose(0, 2, 1, 3).reshape(V, K * L, C)
+        self.process_time += time.perf_counter() - started
+        self.processed += len(slots)
+
+def reference_filter(params, rate, x):
+    # Sample-by-sample cascade, for checking FilterBank.
+    out = np.array(x, dtype=np.float64)
+    for b0, b1, b2, a1, a2 in design_cascade(params, rate)[0]:
+        s1 = s2 = np.zeros(out.shape[1])
+        for n in range(len(out)):
+            xn = out[n].copy()
+            yn = b0 * xn + s1
+            s1 = b1 * xn - a1 * yn + s2
+            s2 = b2 * xn - a2 * yn
+            out[n] = yn
+    return out
+
+def benchmark(voices=13, block_frames=512, sample_rate=44100, seconds=2.0):
+    # Per-voice cost of the full filter stage against the real-time budget.
+    bank = FilterBank(voices, block_frames, sample_rate)
+    for sid in range(voices):
+        bank.set_params(sid, PRESETS["distant"])
+    index = np.arange(voices)
+    buffers = np.random.default_rng(0).standard_normal((voices, block_frames, 2)).astype(np.float32)
+    blocks = int(seconds * sample_rate / block_frames)
+    bank.process(index, buffers)
+    bank.process_time, bank.processed = 0.0, 0
+    for _ in range(blocks):
+        bank.process(index, buffers)
+    per_block = bank.process_time / blocks
+    budget = block_frames / sample_rate
+    return {
+        "voices": voices,
+        "us_per_block": per_block * 1e6,
+        "us_per_voice": per_block / voices * 1e6,
+        "budget_percent": 100.0 * per_block / budget,
+    }
+
+if __name__ == "__main__":
+    for key, value in benchmark().items():
+        print(f"{key:>15}: {value:10.2f}")
@@ -0,0 +1,107 @@
+from collections import deque
+
+HISTORY_STEPS = 200
+MERGE_WINDOW = 1.0        # seconds between changes that still merge into one step
+
+# -----------------------------------------------------------------------------
+# MixHistory – Undo/redo over a MixerState as deltas: each step keeps only the
+# sound ids that changed and, per changed field, their rows before and after.
+# Steps live in fixed-size deques, so hours of slider play stay bounded.
+#
+# record() is called after a user change. Changes with the same merge key
+# (one slider being dragged) within MERGE_WINDOW of each other collapse into
+# a single step measured from where the drag started. undo()/redo() return a
+# full snapshot for the caller to apply through its batched mix path.
+# -----------------------------------------------------------------------------
+class MixStep:
+    __slots__ = ("label", "sids", "before", "after")
+
+    def __init__(self, label, sids, before, after):
+        self.label = label
+        self.sids = sids
+        self.before = before
+        self.after = after
+
+class MixHistory:
+    def __init__(self, mixer, steps=HISTORY_STEPS, merge_window=MERGE_WINDOW):
+        self.mixer = mixer
+        self.merge_window = merge_window
+        self.undo_steps = deque(maxlen=steps)
+        self.redo_steps = deque(maxlen=steps)
+        self._base = mixer.snapshot()
+        self._open = None         # (key, base snapshot, last change time, step)
+
+    def _delta(self, base, label):
+        sids = self.mixer.diff(base)
+        if not len(sids):
+            return None
+        before, after = {}, {}
+        for field, array in base.items():
+            old, new = array[sids], self.mixer[field][sids]
+            if (old != new).any():
+                before[field], after[field] = old, new.copy()
+        return MixStep(label, sids, before, after)
+
+    def record(self, label, key=None, now=0.0):
+        base = self._base
+        if self._open is not None and key is not None and self._open[0] == key \
+                and now - self._open[2] < self.merge_window:
+            open_step = self._open[3]
+            if open_step is None or (self.undo_steps and self.undo_steps[-1] is open_step):
+                if open_step is not None:
+                    self.undo_steps.pop()
+                base = self._open[1]
+        step = self._delta(base, label)
+        if step is not None:
+            self.undo_steps.append(step)
+            self.redo_steps.clear()
+        self._open = (key, base, now, step) if key is not None else None
+        self._base = self.mixer.snapshot()
+
+    def rebase(self):
+        # Accept the live state as the new starting point (after applying).
+        self._base = self.mixer.snapshot()
+        self._open = None
+
+    def forget(self, sid):
+        # A removed sound's sid is about to be reused: its rows in older
+        # steps belong to the old sound and must not land on the new one.
+        for steps in (self.undo_steps, self.redo_steps):
+            kept = []
+            for step in steps:
+                keep = step.sids != sid
+                if keep.all():
+                    kept.append(step)
+                elif keep.any():
+                    kept.append(MixStep(step.label, step.sids[keep],
+                                        {field: rows[keep] for field, rows in step.before.items()},
+                                        {field: rows[keep] for field, rows in step.after.items()}))
+            steps.clear()
+            steps.extend(kept)
+        self._open = None
+
+    def _apply(self, step, rows):
+        snapshot = self.mixer.snapshot()
+        for field, values in rows.items():
+            snapshot[field][step.sids] = values
+        self._open = None
+        return snapshot
+
+    def undo(self):
+        if not self.undo_steps:
+            return None, None
+        step = self.undo_steps.pop()
+        self.redo_steps.append(step)
+        return self._apply(step, step.before), step.label
+
+    def redo(self):
+        if not self.redo_steps:
+            return None, None
+        step = self.redo_steps.pop()
+        self.undo_steps.append(step)
+        return self._apply(step, step.after), step.label
+
+    @property
+    def nbytes(self):
+        return sum(sum(v.nbytes for v in step.before.values()) * 2 + step.sids.nbytes
+                   for steps in (self.undo_steps, self.redo_steps) for step in steps)
@@ -0,0 +1,657 @@
+import hmac, os, secrets, socket, struct, subprocess, sys, threading, time
+import numpy as np
+from modulation import MOD_TARGETS, MOD_SHAPES
+from scheduler import boot_time
+
+from engine import (OP_ADD, OP_REMOVE, OP_PLAY, OP_STOP, OP_GAIN, OP_LOAD_MIX, OP_SLEEP, OP_AT,
+                    OP_CLEAR_TIMED, OP_EVENTS, OP_FILTER, OP_PAN, OP_MOD, OP_QUALITY, OP_VARY, SNAPSHOT_INTERVAL, FADE_CURVES)
+
+DEFAULT_PORT = 38917
+TOKEN_FILE = "engine.token"
+TOKEN_BYTES = 32
+HELLO_TIMEOUT = 2.0
+RECONNECT_MIN = 0.1
+RECONNECT_MAX = 5.0
+RESUME_TRANSITION = 1.0   # seconds a resent mix takes to come back in
+
+# Control-channel opcodes (engine opcodes are reused unchanged).
+OP_SNAPSHOT = 100
+OP_PING = 101
+OP_PONG = 102
+OP_SHUTDOWN = 103
+OP_ADD_EVENTS = 104
+OP_ADD_LAYER = 105
+OP_HELLO = 106
+
+# -----------------------------------------------------------------------------
+# Wire format – Every frame is a 5-byte header (opcode u8, sound id u16,
+# payload length u16) followed by an opcode-specific little-endian payload.
+# A connection must open with HELLO carrying the token the engine process
+# wrote to its app-private token file; anything else is disconnected.
+#   HELLO      token bytes
+#   ADD        utf-8 path
+#   EVENTS     density f32, jitter f32
+#   FILTER     high-pass f32, low-pass f32, low shelf f32, high shelf f32
+#   PAN        pan f32, width f32
+#   MOD        target u8, shape u8, rate f32, depth f32
+#   QUALITY    tier index u8 (255 = automatic)
+#   VARY       speed f32, pitch semitones f32
+#   ADD_EVENTS density f32, jitter f32, utf-8 event pool path
+#   ADD_LAYER  offset f32, utf-8 cached PCM path
+#   GAIN       f32 gain
+#   LOAD_MIX   transition f32, then n x (sid u16, gain f32, playing u8)
+#   AT         n x (delay f32, then a complete inner frame)
+#   SLEEP      delay f32, fade f32, curve index u8
+#   PING/PONG  f64 send time
+#   SNAPSHOT   scalar fields in SNAPSHOT_SCALARS order, then each array in
+#              SNAPSHOT_ARRAYS as a u16 count followed by the raw values
+# -----------------------------------------------------------------------------
+HEADER = struct.Struct("<BHH")
+GAIN = struct.Struct("<f")
+DELAY = struct.Struct("<f")
+MIX_ENTRY = struct.Struct("<HfB")
+PING = struct.Struct("<d")
+SLEEP = struct.Struct("<ffB")
+EVENTS = struct.Struct("<ff")
+FILTER = struct.Struct("<ffff")
+PAN = struct.Struct("<ff")
+MOD = struct.Struct("<BBff")
+QUALITY = struct.Struct("<B")
+VARY = struct.Struct("<ff")
+
+SNAPSHOT_SCALARS = (
+    ("time", "d"),
+    ("blocks", "I"),
+    ("render_load", "f"),
+    ("filter_load", "f"),
+    ("tier", "B"),
+    ("tier_reason", "B"),
+    ("quality_mode", "B"),
+    ("culled", "H"),
+    ("decoding", "H"),
+    ("master_peak", "f"),
+    ("master_rms", "f"),
+    ("source_underruns", "I"),
+    ("output_underruns", "I"),
+    ("late_commands", "I"),
+    ("dropped_commands", "I"),
+    ("sleep_in", "f"),
+    ("running", "B"),
+)
+SNAPSHOT_ARRAYS = (
+    ("playing", "<u2"),
+    ("gains", "<f4"),
+    ("mod_sids", "<u2"),
+    ("mod_gains", "<f4"),
+    ("mod_pans", "<f4"),
+    ("voice_sids", "<u2"),
+    ("voice_bytes", "<u4"),
+    ("first_blocks", "<f8"),
+    ("peaks", "<f4"),
+    ("rms", "<f4"),
+)
+SNAPSHOT_HEAD = struct.Struct("<" + "".join(code for _, code in SNAPSHOT_SCALARS))
+COUNT = struct.Struct("<H")
+MAX_PAYLOAD = 0xFFFF
+
+def encode(op, sid=0, value=None):
+    if op == OP_ADD:
+        payload = value.encode("utf-8")
+    elif op == OP_GAIN:
+        payload = GAIN.pack(value)
+    elif op == OP_EVENTS:
+        payload = EVENTS.pack(*value)
+    elif op == OP_FILTER:
+        payload = FILTER.pack(*value)
+    elif op == OP_PAN:
+        payload = PAN.pack(*value)
+    elif op == OP_MOD:
+        payload = MOD.pack(*value)
+    elif op == OP_QUALITY:
+        payload = QUALITY.pack(value)
+    elif op == OP_VARY:
+        payload = VARY.pack(*value)
+    elif op == OP_ADD_EVENTS:
+        path, density, jitter_db = value
+        payload = EVENTS.pack(density, jitter_db) + path.encode("utf-8")
+    elif op == OP_ADD_LAYER:
+        path, offset = value
+        payload = DELAY.pack(offset) + path.encode("utf-8")
+    elif op == OP_LOAD_MIX:
+        entries, transition = value
+        payload = DELAY.pack(transition) + b"".join(MIX_ENTRY.pack(s, g, bool(p)) for s, g, p in entries)
+    elif op == OP_AT:
+        payload = b"".join(DELAY.pack(delay) + encode(inner_op, inner_sid, inner_value)
+                           for delay, inner_op, inner_sid, inner_value in value)
+    elif op == OP_SLEEP:
+        payload = SLEEP.pack(*value)
+    elif op in (OP_PING, OP_PONG):
+        payload = PING.pack(value)
+    elif op == OP_SNAPSHOT:
+        payload = encode_snapshot(value)
+    elif op == OP_HELLO:
+        payload = value
+    else:
+        payload = b""
+    return HEADER.pack(op, sid, len(payload)) + payload
+
+def decode_value(op, payload):
+    if op == OP_ADD:
+        return payload.decode("utf-8")
+    if op == OP_GAIN:
+        return GAIN.unpack(payload)[0]
+    if op == OP_EVENTS:
+        return EVENTS.unpack(payload)
+    if op == OP_FILTER:
+        return FILTER.unpack(payload)
+    if op == OP_PAN:
+        return PAN.unpack(payload)
+    if op == OP_MOD:
+        return MOD.unpack(payload)
+    if op == OP_QUALITY:
+        return QUALITY.unpack(payload)[0]
+    if op == OP_VARY:
+        return VARY.unpack(payload)
+    if op == OP_ADD_EVENTS:
+        density, jitter_db = EVENTS.unpack_from(payload)
+        return payload[EVENTS.size:].decode("utf-8"), density, jitter_db
+    if op == OP_ADD_LAYER:
+        return payload[DELAY.size:].decode("utf-8"), DELAY.unpack_from(payload)[0]
+    if op == OP_LOAD_MIX:
+        entries = tuple((s, g, bool(p)) for s, g, p in MIX_ENTRY.iter_unpack(payload[DELAY.size:]))
+        return entries, DELAY.unpack_from(payload)[0]
+    if op == OP_AT:
+        commands = []
+        offset = 0
+        while offset < len(payload):
+            delay = DELAY.unpack_from(payload, offset)[0]
+            inner_op, inner_sid, length = HEADER.unpack_from(payload, offset + DELAY.size)
+            start = offset + DELAY.size + HEADER.size
+            commands.append((delay, inner_op, inner_sid, decode_value(inner_op, payload[start:start + length])))
+            offset = start + length
+        return tuple(commands)
+    if op == OP_SLEEP:
+        return SLEEP.unpack(payload)
+    if op in (OP_PING, OP_PONG):
+        return PING.unpack(payload)[0]
+    if op == OP_SNAPSHOT:
+        return decode_snapshot(payload)
+    if op == OP_HELLO:
+        return payload
+    return None
+
+def encode_snapshot(snapshot):
+    parts = [SNAPSHOT_HEAD.pack(*(snapshot.get(name, 0) for name, _ in SNAPSHOT_SCALARS))]
+    for name, dtype in SNAPSHOT_ARRAYS:
+        values = np.asarray(snapshot.get(name, ()), dtype=dtype)
+        parts.append(COUNT.pack(len(values)))
+        parts.append(values.tobytes())
+    return b"".join(parts)
+
+def decode_snapshot(payload):
+    snapshot = dict(zip((name for name, _ in SNAPSHOT_SCALARS), SNAPSHOT_HEAD.unpack_from(payload)))
+    offset = SNAPSHOT_HEAD.size
+    for name, dtype in SNAPSHOT_ARRAYS:
+        count = COUNT.unpack_from(payload, offset)[0]
+        offset += COUNT.size
+        values = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+        offset += values.nbytes
+        snapshot[name] = tuple(values.tolist())
+    return snapshot
+
+def recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("control channel closed")
+        data += chunk
+    return bytes(data)
+
+def read_raw_frame(sock):
+    op, sid, length = HEADER.unpack(recv_exact(sock, HEADER.size))
+    return op, sid, recv_exact(sock, length) if length else b""
+
+def read_frame(sock):
+    op, sid, payload = read_raw_frame(sock)
+    return op, sid, decode_value(op, payload)
+
+def at_batches(commands):
+    # (delay, op, sid, value) commands split into as few AT payloads as fit
+    # the u16 length; each is one post into the engine queue on the far side.
+    batches, batch, size = [], [], 0
+    for command in commands:
+        length = DELAY.size + len(encode(*command[1:]))
+        if batch and size + length > MAX_PAYLOAD:
+            batches.append(tuple(batch))
+            batch, size = [], 0
+        batch.append(command)
+        size += length
+    if batch:
+        batches.append(tuple(batch))
+    return batches
+
+def token_path(data_dir):
+    return os.path.join(data_dir, TOKEN_FILE)
+
+def write_token(path):
+    # A fresh token per engine launch, readable by this app only.
+    token = secrets.token_bytes(TOKEN_BYTES)
+    temp = path + ".part"
+    fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(token)
+    os.replace(temp, path)
+    return token
+
+def read_token(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+# -----------------------------------------------------------------------------
+# EngineServer – Runs next to the AudioEngine (Android service process or the
+# desktop stand-in) and turns frames from the UI into engine calls.
+# -----------------------------------------------------------------------------
+class EngineServer:
+    def __init__(self, engine, token, port=DEFAULT_PORT, host="127.0.0.1"):
+        self.engine = engine
+        self.token = token
+        self.port = port
+        self.host = host
+        self.running = False
+        self._conn = None
+        self._send_lock = threading.Lock()
+
+    def serve_forever(self):
+        self.running = True
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.host, self.port))
+        listener.listen(1)
+        listener.settimeout(0.5)
+        try:
+            while self.running and self.engine.running:
+                try:
+                    conn, _ = listener.accept()
+                except socket.timeout:
+                    continue
+                self._serve_client(conn)
+        finally:
+            listener.close()
+
+    def _send(self, conn, frame):
+        with self._send_lock:
+            conn.sendall(frame)
+
+    def _push_snapshots(self, conn):
+        last = None
+        while self._conn is conn:
+            snapshot = self.engine.snapshot
+            if snapshot is not last:
+                last = snapshot
+                try:
+                    self._send(conn, encode(OP_SNAPSHOT, 0, snapshot))
+                except OSError:
+                    return
+            if not self.engine.running:
+                # Sleep timer finished: the final snapshot is out, so close
+                # the channel and let the service process exit.
+                self.running = False
+                try:
+                    conn.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                return
+            time.sleep(SNAPSHOT_INTERVAL)
+
+    def _hello(self, conn):
+        # Other apps on the device can reach the port too; only a client
+        # that read our token file gets to send commands. Nothing it sends
+        # is decoded before then.
+        conn.settimeout(HELLO_TIMEOUT)
+        try:
+            op, _, payload = read_raw_frame(conn)
+        except (ConnectionError, OSError, struct.error):
+            return False
+        conn.settimeout(None)
+        return op == OP_HELLO and hmac.compare_digest(payload, self.token)
+
+    def _serve_client(self, conn):
+        # One UI at a time; its reader is the engine queue's only producer.
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if not self._hello(conn):
+            print("Rejected engine connection without a valid token")
+            conn.close()
+            return
+        self._conn = conn
+        threading.Thread(target=self._push_snapshots, args=(conn,), name="ipc-snapshots", daemon=True).start()
+        try:
+            while self.running:
+                op, sid, value = read_frame(conn)
+                if op == OP_ADD:
+                    try:
+                        self.engine.add_sound(sid, value)
+                    except Exception as e:
+                        print(f"Error adding {value} to audio engine: {e}")
+                elif op == OP_ADD_LAYER:
+                    try:
+                        self.engine.add_layer(sid, *value)
+                    except Exception as e:
+                        print(f"Error adding layer {value[0]} to audio engine: {e}")
+                elif op == OP_ADD_EVENTS:
+                    try:
+                        self.engine.add_events(sid, *value)
+                    except Exception as e:
+                        print(f"Error adding events {value[0]} to audio engine: {e}")
+                elif op == OP_REMOVE:
+                    self.engine.remove_sound(sid)
+                elif op == OP_LOAD_MIX:
+                    self.engine.load_mix(*value)
+                elif op == OP_VARY:
+                    self.engine.set_variation(sid, *value)
+                elif op == OP_PING:
+                    self._send(conn, encode(OP_PONG, sid, value))
+                elif op == OP_SHUTDOWN:
+                    self.running = False
+                else:
+                    self.engine.post(op, sid, value)
+        except (ConnectionError, OSError):
+            pass
+        except (UnicodeDecodeError, ValueError, struct.error) as e:
+            # A malformed frame drops this client, not the listener.
+            print(f"Error reading engine command: {e}")
+        finally:
+            self._conn = None
+            conn.close()
+
+# -----------------------------------------------------------------------------
+# EngineClient – UI-side stand-in for AudioEngine. Mirrors post/add_sound/
+# remove_sound/load_mix/stop and exposes the last received snapshot.
+#
+# The client also keeps the latest of everything it has told the engine:
+# sources and parameters per sound, gains and playing, timed commands and the
+# sleep timer. While disconnected, posts only update that state. Each
+# (re)connect, with backoff, starts by sending it, so a dropped socket or a
+# restarted service ends up where the UI left it.
+# -----------------------------------------------------------------------------
+class EngineClient:
+    def __init__(self, token_file, port=DEFAULT_PORT, host="127.0.0.1"):
+        self.token_file = token_file
+        self.port = port
+        self.host = host
+        self.snapshot = {}
+        self.connected = False
+        self.sock = None
+        self._owned = {}          # key -> last frame: sources, parameters, quality
+        self._mix = {}            # sid -> (gain, playing)
+        self._timed = None        # [(deadline, op, sid, value)]; None until first scheduled
+        self._sleep = None        # (posted, (delay, fade, curve)); None until first set
+        self._lock = threading.Lock()
+        self._closing = threading.Event()
+        self._pong = threading.Event()
+        self._pong_time = 0.0
+        self._snapshot_seen = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ipc-client", daemon=True)
+        self._thread.start()
+
+    def post(self, op, sid=0, value=None):
+        # True once the engine has the command, or will get its effect on
+        # the next connect.
+        frame = encode(op, sid, value)
+        with self._lock:
+            owned = self._remember(op, sid, value, frame)
+            if self.sock is not None:
+                try:
+                    self.sock.sendall(frame)
+                    return True
+                except OSError as e:
+                    print(f"Error sending engine command: {e}")
+                    self._drop()
+            return owned
+
+    def _remember(self, op, sid, value, frame):
+        if op in (OP_ADD, OP_ADD_LAYER, OP_ADD_EVENTS):
+            self._owned[("source", sid)] = frame
+        elif op == OP_REMOVE:
+            for key in [key for key in self._owned if key[1] == sid]:
+                del self._owned[key]
+            self._mix.pop(sid, None)
+        elif op in (OP_EVENTS, OP_FILTER, OP_PAN, OP_VARY):
+            self._owned[(op, sid)] = frame
+        elif op == OP_MOD:
+            self._owned[(op, sid, value[0])] = frame
+        elif op == OP_QUALITY:
+            self._owned[(op, None)] = frame
+        elif op == OP_GAIN:
+            self._mix[sid] = (value, self._mix.get(sid, (0.0, False))[1])
+        elif op in (OP_PLAY, OP_STOP):
+            self._mix[sid] = (self._mix.get(sid, (0.0, False))[0], op == OP_PLAY)
+        elif op == OP_LOAD_MIX:
+            self._mix = {mix_sid: (gain, False) for mix_sid, (gain, _) in self._mix.items()}
+            for mix_sid, gain, playing in value[0]:
+                self._mix[mix_sid] = (gain, bool(playing))
+        elif op == OP_AT:
+            now = boot_time()
+            self._settle(now)
+            self._timed = (self._timed or []) + [(now + delay, timed_op, timed_sid, timed_value)
+                                                 for delay, timed_op, timed_sid, timed_value in value]
+        elif op == OP_CLEAR_TIMED:
+            self._timed = []
+        elif op == OP_SLEEP:
+            self._sleep = (boot_time(), value)
+        else:
+            return False
+        return True
+
+    def _settle(self, now):
+        # Timed commands the engine has run by now become plain state.
+        if not self._timed:
+            return
+        self._timed.sort(key=lambda command: command[0])
+        while self._timed and self._timed[0][0] <= now:
+            _, op, sid, value = self._timed.pop(0)
+            self._remember(op, sid, value, encode(op, sid, value))
+
+    def _state_frames(self):
+        now = boot_time()
+        self._settle(now)
+        frames = [frame for key, frame in self._owned.items() if key[0] == "source"]
+        frames += [frame for key, frame in self._owned.items() if key[0] != "source"]
+        if self._mix:
+            entries = tuple((sid, gain, playing) for sid, (gain, playing) in self._mix.items())
+            frames.append(encode(OP_LOAD_MIX, 0, (entries, RESUME_TRANSITION)))
+        if self._timed is not None:
+            frames.append(encode(OP_CLEAR_TIMED))
+            commands = [(deadline - now, op, sid, value) for deadline, op, sid, value in self._timed]
+            frames += [encode(OP_AT, 0, batch) for batch in at_batches(commands)]
+        if self._sleep is not None:
+            posted, (delay, fade, curve) = self._sleep
+            if delay >= 0:
+                remaining = delay - (now - posted)
+                if remaining + fade > 0:
+                    frames.append(encode(OP_SLEEP, 0, (max(0.0, remaining), fade + min(0.0, remaining), curve)))
+            else:
+                frames.append(encode(OP_SLEEP, 0, self._sleep[1]))
+        return frames
+
+    def add_sound(self, sid, path):
+        return self.post(OP_ADD, sid, path)
+
+    def add_layer(self, sid, pcm_path, offset=0.0):
+        return self.post(OP_ADD_LAYER, sid, (pcm_path, offset))
+
+    def add_events(self, sid, bank_path, density, jitter_db):
+        return self.post(OP_ADD_EVENTS, sid, (bank_path, density, jitter_db))
+
+    def set_events(self, sid, density, jitter_db):
+        return self.post(OP_EVENTS, sid, (density, jitter_db))
+
+    def set_filter(self, sid, params):
+        return self.post(OP_FILTER, sid, tuple(params))
+
+    def set_pan(self, sid, pan, width=1.0):
+        return self.post(OP_PAN, sid, (pan, width))
+
+    def set_modulation(self, sid, target, shape, rate=0.0, depth=0.0):
+        return self.post(OP_MOD, sid, (MOD_TARGETS.index(target), MOD_SHAPES.index(shape), rate, depth))
+
+    def set_quality(self, tier):
+        return self.post(OP_QUALITY, 0, tier)
+
+    def set_variation(self, sid, speed=1.0, semitones=0.0):
+        return self.post(OP_VARY, sid, (speed, semitones))
+
+    def remove_sound(self, sid):
+        return self.post(OP_REMOVE, sid)
+
+    def load_mix(self, entries, transition=0.0):
+        return self.post(OP_LOAD_MIX, 0, (tuple(entries), transition))
+
+    def schedule(self, delay, op, sid=0, value=None):
+        return self.schedule_all(((delay, op, sid, value),))
+
+    def schedule_all(self, commands):
+        return all([self.post(OP_AT, 0, batch) for batch in at_batches(commands)])
+
+    def clear_scheduled(self):
+        return self.post(OP_CLEAR_TIMED)
+
+    def sleep(self, delay, fade, curve="cosine"):
+        return self.post(OP_SLEEP, 0, (delay, fade, FADE_CURVES.index(curve)))
+
+    def wait_snapshot(self, timeout):
+        # The engine's first snapshot, or {} if none arrives within timeout
+        # (no service running yet).
+        self._snapshot_seen.wait(timeout)
+        return self.snapshot
+
+    def ping(self, timeout=1.0):
+        self._pong.clear()
+        sent = time.perf_counter()
+        if not self.post(OP_PING, 0, sent) or not self._pong.wait(timeout):
+            return None
+        return self._pong_time - sent
+
+    def stop(self):
+        # Shuts the remote engine down, as AudioEngine.stop() would.
+        self.post(OP_SHUTDOWN)
+        self.close()
+
+    def close(self):
+        # Disconnects for good; the engine keeps running.
+        self._closing.set()
+        with self._lock:
+            self._drop()
+
+    def _drop(self):
+        # Shutting down first wakes the reader blocked in recv.
+        if self.sock is not None:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+            self.sock = None
+        self.connected = False
+
+    def _connect(self):
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=1.0)
+        except OSError:
+            return None
+        # The engine writes its token before it listens, so once the
+        # connection is up the file holds the current one.
+        token = read_token(self.token_file)
+        try:
+            if token is None:
+                raise OSError(f"no engine token at {self.token_file}")
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.settimeout(None)
+            sock.sendall(encode(OP_HELLO, 0, token))
+            return sock
+        except OSError as e:
+            print(f"Error greeting audio engine: {e}")
+            sock.close()
+            return None
+
+    def _run(self):
+        backoff = RECONNECT_MIN
+        reported = False
+        while not self._closing.is_set():
+            sock = self._connect()
+            if sock is not None:
+                with self._lock:
+                    try:
+                        for frame in self._state_frames():
+                            sock.sendall(frame)
+                        self.sock = sock
+                        self.connected = True
+                    except OSError:
+                        sock.close()
+                        sock = None
+            if sock is None:
+                if not reported:
+                    print(f"Error connecting to audio engine on port {self.port}; retrying")
+                    reported = True
+                self._closing.wait(backoff)
+                backoff = min(backoff * 2, RECONNECT_MAX)
+                continue
+            backoff, reported = RECONNECT_MIN, False
+            try:
+                while True:
+                    op, sid, value = read_frame(sock)
+                    if op == OP_SNAPSHOT:
+                        self.snapshot = value
+                        self._snapshot_seen.set()
+                    elif op == OP_PONG:
+                        self._pong_time = time.perf_counter()
+                        self._pong.set()
+            except (ConnectionError, OSError, struct.error):
+                pass
+            with self._lock:
+                if self.sock is sock:
+                    self._drop()
+
+def spawn_standin(token_file, port=DEFAULT_PORT, null_sink=False):
+    # Desktop stand-in for the Android service: the same service.py entry
+    # point in a child process.
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "service.py")
+    args = [sys.executable, script, "--port", str(port), "--token-file", token_file]
+    if null_sink:
+        args.append("--null-sink")
+    return subprocess.Popen(args)
+
+def benchmark(count=1000, port=DEFAULT_PORT + 1):
+    import tempfile
+    token_file = os.path.join(tempfile.mkdtemp(), TOKEN_FILE)
+    process = spawn_standin(token_file, port, null_sink=True)
+    client = EngineClient(token_file, port)
+    try:
+        while not client.connected:
+            time.sleep(0.05)
+        rtts = []
+        for _ in range(count):
+            rtt = client.ping()
+            if rtt is not None:
+                rtts.append(rtt)
+        start = time.perf_counter()
+        for i in range(count):
+            client.post(OP_GAIN, i % 13, 0.5)
+        send_time = time.perf_counter() - start
+        rtts = np.array(rtts) * 1000.0
+        return {
+            "rtt_p50_ms": float(np.percentile(rtts, 50)),
+            "rtt_p95_ms": float(np.percentile(rtts, 95)),
+            "rtt_p99_ms": float(np.percentile(rtts, 99)),
+            "commands_per_s": count / send_time if send_time > 0 else float("inf"),
+        }
+    finally:
+        client.stop()
+        process.wait(timeout=5)
+
+if __name__ == "__main__":
+    for key, value in benchmark().items():
+        print(f"{key:>16}: {value:10.3f}")
@@ -0,0 +1,64 @@
+import copy
+
+# -----------------------------------------------------------------------------
+# LifecycleManager – Remembers what each player backend was last told (playing,
+# volume, loop) and what was last written to the store, so that pause/resume
+# and repeated play/volume calls only cross the bridge when something changed.
+# -----------------------------------------------------------------------------
+class LifecycleManager:
+    def __init__(self, store=None, session_key="last_session"):
+        self.store = store
+        self.session_key = session_key
+        self.committed = {}
+        self.bridge_calls = 0
+        self.store_writes = 0
+        self.skipped_writes = 0
+        self._saved = None
+        if store is not None and store.exists(session_key):
+            self._saved = store.get(session_key)
+
+    def commit(self, player, playing, volume, loop=True):
+        # Record state that reached the backend some other way (batched mix
+        # load, session restore) without issuing any calls.
+        self.committed[player] = (playing, volume, loop)
+
+    def forget(self, player):
+        self.committed.pop(player, None)
+
+    def reconcile(self, player, playing, volume, loop=True):
+        last_playing, last_volume, last_loop = self.committed.get(player, (False, None, None))
+        if loop != last_loop:
+            player.set_loop(loop)
+            self.bridge_calls += 1
+        if volume != last_volume:
+            player.set_volume(volume)
+            self.bridge_calls += 1
+        if playing and not last_playing:
+            player.play()
+            self.bridge_calls += 1
+        elif last_playing and not playing:
+            player.stop()
+            self.bridge_calls += 1
+        self.committed[player] = (playing, volume, loop)
+
+    def sync_from_snapshot(self, snapshot, players):
+        # The engine may have lost voices behind our back (service restart);
+        # its snapshot is the ground truth for what is actually playing.
+        if "playing" not in snapshot:
+            return
+        playing = set(snapshot["playing"])
+        for sid, player in players.items():
+            if player in self.committed:
+                _, volume, loop = self.committed[player]
+                self.committed[player] = (sid in playing, volume, loop)
+
+    def save_session(self, mix_data):
+        if self.store is None:
+            return False
+        if mix_data == self._saved:
+            self.skipped_writes += 1
+            return False
+        self.store.put(self.session_key, **mix_data)
+        self._saved = copy.deepcopy(mix_data)
+        self.store_writes += 1
+        return True
@@ -1,9 +1,8 @@
-import os, json
+import os, json, math, time
 from kivy.clock import Clock
 from kivy.metrics import dp, sp
 from kivy.properties import NumericProperty, StringProperty, BooleanProperty, ObjectProperty
 from kivy.uix.scrollview import ScrollView
-from kivy.storage.jsonstore import JsonStore
 from kivy.utils import platform
 
 # Import KivyMD modules
@@ -15,19 +14,95 @@ from kivymd.uix.button import MDIconButton, MDRaisedButton, MDFlatButton
 from kivymd.uix.label import MDLabel
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.tab import MDTabsBase, MDTabs
-from kivymd.uix.list import OneLineAvatarIconListItem, IconLeftWidget
+from kivymd.uix.list import OneLineAvatarIconListItem, OneLineListItem, IconLeftWidget
+
+from engine import create_engine, fade_curve, pan_gains, OP_PLAY, OP_STOP, OP_GAIN, AUDIBLE_GAIN, MAX_VOICES
+from modulation import MOD_TARGETS, MOD_SHAPES
+from ipc import EngineClient, spawn_standin, token_path, DEFAULT_PORT as ENGINE_PORT
+from warmup import WarmupJob
+from lifecycle import LifecycleManager
+from events import DEFAULT_JITTER_DB
+from filters import NEUTRAL as FLAT_FILTER, PRESETS as FILTER_PRESETS
+from scheduler import get_scheduler
+from timeline import TimelinePlayer, parse_timeline, format_timeline
+from mixer import MixerState, DEFAULT_MOD
+from audio_stream import shared_bytes
+from pitch import quantize as quantize_variation, pitch_ratio, SPEED_RANGE, PITCH_RANGE
+from history import MixHistory
+from search import SearchIndex
+from mixfile import export_mixes, import_mixes, latest_export, format_report as format_import_report, POLICIES as IMPORT_POLICIES, EXPORT_NAME
+from tracing import LatencyTracer, format_stats
+from memprofile import MemoryProfiler, format_report
+from metrics import MeteredJsonStore, MetricsSampler, MetricsServer, resident_bytes, SAMPLE_INTERVAL as METRICS_INTERVAL
+from quality import TIERS as QUALITY_TIERS, REASONS as QUALITY_REASONS, AUTO as QUALITY_AUTO
+
+# Sleep timer choices (minutes) and the fade that ends them.
+SLEEP_OPTIONS = (15, 30, 45, 60, 90)
+SLEEP_FADE_SECONDS = 60
+SLEEP_FADE_CURVE = "cosine"
+SLEEP_WATCH_INTERVAL = 1.0
+SESSION_PROBE_SECONDS = 1.0   # wait for a running service to report what it plays
+
+# Generative density steps (events per minute) cycled by the tile's dice
+# button; 0 plays the plain loop.
+EVENT_DENSITIES = (0, 6, 15, 40)
+DENSITY_ICONS = ("dice-multiple-outline", "dice-1", "dice-2", "dice-3")
+
+# Filter sliders: (label, min, max) for high-pass Hz, low-pass Hz, low shelf
+# dB and high shelf dB, in the engine's parameter order.
+FILTER_CONTROLS = (("Low cut", 20, 1000), ("High cut", 500, 20000), ("Bass", -12, 12), ("Treble", -12, 12))
+
+# Placement sliders: pan (-1 left .. 1 right) and stereo width.
+CENTERED = (0.0, 1.0)
+PAN_CONTROLS = (("Pan", -1, 1), ("Width", 0, 1))
+
+# Variation sliders: playback speed and pitch in semitones.
+UNVARIED = (1.0, 0.0)
+VARY_CONTROLS = (("Speed", *SPEED_RANGE), ("Pitch", *PITCH_RANGE))
+
+# Modulation per target: [shape, rate Hz, depth]. Tiles showing modulation
+# refresh from the engine snapshot at MOD_UI_INTERVAL, and only while visible.
+MOD_OFF = list(DEFAULT_MOD)
+MOD_RATE_RANGE = (0.005, 0.5)
+MOD_UI_INTERVAL = 0.2
+
+# Level meters read the engine snapshot at most this often, visible tiles only,
+# and show RMS on a dB scale from METER_FLOOR_DB up to full scale.
+METER_UI_INTERVAL = 0.1
+
+# Open tap-latency traces check the engine snapshot this often.
+SNAPSHOT_POLL_INTERVAL = 0.05
+METER_FLOOR_DB = -60.0
+
+# Undo and redo glide to the restored mix instead of cutting.
+UNDO_TRANSITION = 0.3
+
+# Fraction of the file between the start offsets of successive layers.
+LAYER_SPREAD = 0.618
+
+def meter_value(level):
+    if level <= 0.0:
+        return 0.0
+    return max(0.0, min(100.0, 100.0 * (1.0 - 20.0 * math.log10(level) / METER_FLOOR_DB)))
 
 # -----------------------------------------------------------------------------
 # Native Audio Implementation (Compatible with Android and Other Platforms)
 # -----------------------------------------------------------------------------
 class AndroidAudio:
+    bridge_calls = 0          # JNI calls made by every player, for the metrics
+
     def __init__(self, sound_path):
         self.sound_path = sound_path
         self.volume = 0.7
+        self.pan = 0.0
         self.loop = False
         self.is_prepared = False
         self.sound = None
         self.player = None
+        self.playing = False
+        self.suspended_at = None
+        self.variation = UNVARIED
+        self._varied = False
 
         if platform == 'android':
             self._init_android_player()
@@ -51,17 +126,25 @@ class AndroidAudio:
             uri = Uri.fromFile(file)
             self.player.setDataSource(Context, uri)
             self.player.setLooping(self.loop)
-            self.player.setVolume(self.volume, self.volume)
+            self.player.setVolume(*self._channel_volumes())
             self.player.prepare()
+            AndroidAudio.bridge_calls += 7
             self.is_prepared = True
         except Exception as e:
             print(f"Error initializing Android player: {e}")
 
     def play(self):
+        self.playing = True
         if platform == 'android':
             if self.player and self.is_prepared:
+                if self.volume < AUDIBLE_GAIN:
+                    # Starts out silent: don't decode until it's audible.
+                    self.suspended_at = (0, time.monotonic())
+                    return
                 try:
                     self.player.start()
+                    AndroidAudio.bridge_calls += 1
+                    self._apply_variation()
                 except Exception as e:
                     print(f"Error playing Android audio: {e}")
         else:
@@ -69,35 +152,106 @@ class AndroidAudio:
                 self.sound.play()
 
     def stop(self):
+        self.playing = False
+        self.suspended_at = None
         if platform == 'android':
             if self.player:
                 try:
                     self.player.pause()
                     self.player.seekTo(0)
+                    AndroidAudio.bridge_calls += 2
                 except Exception as e:
                     print(f"Error stopping Android audio: {e}")
         else:
             if self.sound:
                 self.sound.stop()
 
+    def _channel_volumes(self):
+        left, right = pan_gains(self.pan)
+        return min(1.0, self.volume * float(left)), min(1.0, self.volume * float(right))
+
     def set_volume(self, volume):
         self.volume = volume
         if platform == 'android':
             if self.player:
                 try:
-                    self.player.setVolume(volume, volume)
+                    self.player.setVolume(*self._channel_volumes())
+                    AndroidAudio.bridge_calls += 1
+                    if self.playing:
+                        if volume < AUDIBLE_GAIN and self.suspended_at is None:
+                            self._suspend()
+                        elif volume >= 2 * AUDIBLE_GAIN and self.suspended_at is not None:
+                            self._resume()
                 except Exception as e:
                     print(f"Error setting Android volume: {e}")
         else:
             if self.sound:
                 self.sound.volume = volume
 
+    def _suspend(self):
+        # Inaudible: pause the decoder and remember where the playhead was,
+        # so it comes back where it would have been had it kept playing.
+        self.suspended_at = (self.player.getCurrentPosition(), time.monotonic())
+        self.player.pause()
+        AndroidAudio.bridge_calls += 2
+
+    def _resume(self):
+        position, since = self.suspended_at
+        self.suspended_at = None
+        position += int((time.monotonic() - since) * 1000)
+        duration = self.player.getDuration()
+        AndroidAudio.bridge_calls += 1
+        if duration > 0:
+            if self.loop:
+                position %= duration
+            elif position >= duration:
+                self.playing = False
+                return
+        self.player.seekTo(position)
+        self.player.start()
+        AndroidAudio.bridge_calls += 2
+        self._apply_variation()
+
+    def set_pan(self, pan, width=1.0):
+        # MediaPlayer only has per-channel volume, so width is engine-only.
+        self.pan = pan
+        if platform == 'android':
+            self.set_volume(self.volume)
+        elif self.sound and hasattr(self.sound, "pan"):
+            self.sound.pan = pan
+
+    def set_variation(self, speed, semitones):
+        self.variation = (speed, semitones)
+        if platform == 'android':
+            if self.player and self.playing and self.suspended_at is None:
+                self._apply_variation()
+        elif self.sound and hasattr(self.sound, "pitch"):
+            # Desktop backends only have varispeed: pitch follows speed.
+            self.sound.pitch = speed * pitch_ratio(semitones)
+
+    def _apply_variation(self):
+        # PlaybackParams (API 23+) starts a paused MediaPlayer, so it is only
+        # set while playing; a stopped player gets it on its next start.
+        if self.variation == UNVARIED and not self._varied:
+            return
+        try:
+            from jnius import autoclass
+            PlaybackParams = autoclass('android.media.PlaybackParams')
+            speed, semitones = self.variation
+            params = PlaybackParams().setSpeed(float(speed)).setPitch(float(pitch_ratio(semitones)))
+            self.player.setPlaybackParams(params)
+            AndroidAudio.bridge_calls += 4
+            self._varied = self.variation != UNVARIED
+        except Exception as e:
+            print(f"Error setting Android playback speed: {e}")
+
     def set_loop(self, loop):
         self.loop = loop
         if platform == 'android':
             if self.player:
                 try:
                     self.player.setLooping(loop)
+                    AndroidAudio.bridge_calls += 1
                 except Exception as e:
                     print(f"Error setting Android loop: {e}")
         else:
@@ -109,6 +263,7 @@ class AndroidAudio:
             if self.player:
                 try:
                     self.player.release()
+                    AndroidAudio.bridge_calls += 1
                     self.player = None
                     self.is_prepared = False
                 except Exception as e:
@@ -118,6 +273,113 @@ class AndroidAudio:
                 self.sound.unload()
                 self.sound = None
 
+    def fade_out(self, duration, curve=SLEEP_FADE_CURVE):
+        # Native fade through VolumeShaper (API 26+); other platforms keep
+        # their volume until the player is released.
+        if platform == 'android' and self.player:
+            try:
+                from jnius import autoclass
+                Builder = autoclass('android.media.VolumeShaper$Configuration$Builder')
+                Configuration = autoclass('android.media.VolumeShaper$Configuration')
+                Operation = autoclass('android.media.VolumeShaper$Operation')
+                times = [i / 16.0 for i in range(17)]
+                volumes = [float(v) for v in fade_curve(curve, times)]
+                config = (Builder().setDuration(int(duration * 1000)).setCurve(times, volumes)
+                          .setInterpolatorType(Configuration.INTERPOLATOR_TYPE_LINEAR).build())
+                self.shaper = self.player.createVolumeShaper(config)
+                self.shaper.apply(Operation.PLAY)
+                AndroidAudio.bridge_calls += 7
+            except Exception as e:
+                print(f"Error fading Android audio: {e}")
+
+# -----------------------------------------------------------------------------
+# EngineAudio – Handle onto one voice of the shared AudioEngine. Same interface
+# as AndroidAudio, but every call is a non-blocking post to the render thread.
+# -----------------------------------------------------------------------------
+class EngineAudio:
+    def __init__(self, engine, sid, sound_path, pcm_path=None, offset=0.0):
+        self.engine = engine
+        self.sid = sid
+        self.sound_path = sound_path
+        self.pcm_path = pcm_path
+        self.offset = offset
+        self.volume = 0.7
+        self.loop = True
+        self.is_prepared = False
+
+        self.add_source()
+        self.is_prepared = True
+
+    def add_source(self):
+        # Once the warm-up cache has the sound it plays from the shared
+        # decoded buffer, where layers of one file differ only in offset.
+        if self.pcm_path:
+            self.engine.add_layer(self.sid, self.pcm_path, self.offset)
+        else:
+            self.engine.add_sound(self.sid, self.sound_path)
+
+    def play(self):
+        self.engine.post(OP_PLAY, self.sid)
+
+    def stop(self):
+        self.engine.post(OP_STOP, self.sid)
+
+    def set_volume(self, volume):
+        self.volume = volume
+        self.engine.post(OP_GAIN, self.sid, volume)
+
+    def set_loop(self, loop):
+        # Engine voices always loop; kept for interface compatibility.
+        self.loop = loop
+
+    def set_events(self, bank_path, density):
+        if bank_path and density > 0:
+            self.engine.add_events(self.sid, bank_path, density, DEFAULT_JITTER_DB)
+        else:
+            self.add_source()
+
+    def set_filter(self, params):
+        self.engine.set_filter(self.sid, params)
+
+    def set_pan(self, pan, width=1.0):
+        self.engine.set_pan(self.sid, pan, width)
+
+    def set_modulation(self, target, shape, rate, depth):
+        self.engine.set_modulation(self.sid, target, shape, rate, depth)
+
+    def set_variation(self, speed, semitones):
+        self.engine.set_variation(self.sid, speed, semitones)
+
+    def release(self):
+        self.engine.remove_sound(self.sid)
+        self.is_prepared = False
+
+def sound_name_from_path(sound_path):
+    basename = os.path.basename(sound_path)
+    return os.path.splitext(basename)[0].replace("-", " ").title()
+
+def create_audio(sound_path, engine=None, sid=0, pcm_path=None, offset=0.0):
+    if engine is not None:
+        try:
+            return EngineAudio(engine, sid, sound_path, pcm_path, offset)
+        except Exception as e:
+            print(f"Error adding {sound_path} to audio engine: {e}")
+    return AndroidAudio(sound_path)
+
+def apply_saved_settings(player, state):
+    # Filter, placement, variation and modulation of a saved sound, for a
+    # player started before its tile exists.
+    if isinstance(player, EngineAudio) and "filter" in state:
+        player.set_filter(state["filter"])
+    if "pan" in state and hasattr(player, "set_pan"):
+        player.set_pan(*state["pan"][:2])
+    if ("speed" in state or "pitch" in state) and hasattr(player, "set_variation"):
+        player.set_variation(state.get("speed", UNVARIED[0]), state.get("pitch", UNVARIED[1]))
+    if isinstance(player, EngineAudio):
+        for target, mod in state.get("mod", {}).items():
+            if target in MOD_TARGETS and mod[0] != "off":
+                player.set_modulation(target, *mod)
+
 # -----------------------------------------------------------------------------
 # SoundTile – Represents an individual audio clip as a modern card widget.
 # -----------------------------------------------------------------------------
@@ -125,11 +387,20 @@ class SoundTile(MDCard):
     volume = NumericProperty(0.7)
     sound_name = StringProperty("")
     is_playing = BooleanProperty(False)
+    density = NumericProperty(0)
     sound = ObjectProperty(None, allownone=True)
     sound_path = StringProperty("")
 
-    def __init__(self, sound_path, **kwargs):
+    def __init__(self, sound_path, mixer, engine=None, sid=0, player=None, state=None, lifecycle=None,
+                 name=None, offset=0.0, **kwargs):
         super().__init__(**kwargs)
+        self.engine = engine
+        self.sid = sid
+        # The mix itself lives in the shared MixerState; the properties here
+        # mirror this tile's row for display and for talking to the player.
+        self.mixer = mixer
+        self.lifecycle = lifecycle or LifecycleManager()
+        self._syncing = False
         self.orientation = "vertical"
         self.size_hint = (None, None)
         self.size = (dp(150), dp(200))
@@ -139,13 +410,27 @@ class SoundTile(MDCard):
         self.spacing = dp(10)
         self.sound_path = sound_path
 
-        # Format sound name from filename.
-        basename = os.path.basename(sound_path)
-        self.sound_name = os.path.splitext(basename)[0].replace("-", " ").title()
+        # Format sound name from filename; layers of a sound bring their own
+        # name and start offset into the file.
+        self.sound_name = name or sound_name_from_path(sound_path)
+        self.is_layer = name is not None
+        self.offset = offset
 
-        # Header: Sound title.
+        # Header: Sound title and the generative (random events) toggle.
+        header = MDBoxLayout(orientation="horizontal")
         self.title_label = MDLabel(text=self.sound_name, halign="center", theme_text_color="Primary")
-        self.add_widget(self.title_label)
+        header.add_widget(self.title_label)
+        self.gen_btn = MDIconButton(icon=DENSITY_ICONS[0], disabled=True)
+        self.gen_btn.bind(on_release=self.cycle_density)
+        header.add_widget(self.gen_btn)
+        self.filter = list(FLAT_FILTER)
+        self.placement = list(CENTERED)
+        self.variation = list(UNVARIED)
+        self.settings_dialog = None
+        self.filter_btn = MDIconButton(icon="tune-vertical")
+        self.filter_btn.bind(on_release=self.show_settings_dialog)
+        header.add_widget(self.filter_btn)
+        self.add_widget(header)
 
         # Central play/pause button.
         # Replace the invalid property "user_font_size" with the valid "icon_size"
@@ -161,73 +446,374 @@ class SoundTile(MDCard):
         self.slider = MDSlider(min=0, max=1, value=self.volume)
         self.slider.bind(value=self.on_volume_change)
         vol_layout.add_widget(self.slider)
+        # Effective (modulated) volume, shown only while gain is modulated.
+        from kivymd.uix.progressbar import MDProgressBar
+        self.mod_bar = MDProgressBar(value=0, size_hint_y=None, height=dp(3), opacity=0)
+        vol_layout.add_widget(self.mod_bar)
+        self.level_bar = MDProgressBar(value=0, size_hint_y=None, height=dp(3), opacity=0)
+        vol_layout.add_widget(self.level_bar)
         self.add_widget(vol_layout)
+        self.mods = {target: list(MOD_OFF) for target in MOD_TARGETS}
 
-        Clock.schedule_once(lambda dt: self.load_sound(), 0.1)
+        if player is not None:
+            # Adopt a player that session restore already started.
+            self.sound = player
+            self.show_state(state or {"is_playing": True})
+        else:
+            if state is not None:
+                # Playing in the service already; the player comes next.
+                self.show_state(state)
+            get_scheduler().schedule(0.1, self.load_sound)
 
     def load_sound(self):
         if self.sound is not None:
             return
+        app = MDApp.get_running_app()
+        if app is not None and getattr(app, "engine_released", False):
+            self.engine = app.ensure_engine()
         try:
-            self.sound = AndroidAudio(self.sound_path)
+            pcm_path = app.pcm_path(self.sound_path) if app is not None and hasattr(app, "pcm_path") else None
+            self.sound = create_audio(self.sound_path, self.engine, self.sid, pcm_path, self.offset)
             if self.sound:
-                self.sound.set_loop(True)
-                self.sound.set_volume(self.volume)
+                self.lifecycle.reconcile(self.sound, self.is_playing, self.volume)
+                if isinstance(self.sound, EngineAudio) and self.filter != list(FLAT_FILTER):
+                    self.sound.set_filter(self.filter)
+                if self.placement != list(CENTERED):
+                    self.sound.set_pan(*self.placement)
+                if self.variation != list(UNVARIED):
+                    self.sound.set_variation(*self.variation)
+                if isinstance(self.sound, EngineAudio):
+                    for target, mod in self.mods.items():
+                        if mod[0] != "off":
+                            self.sound.set_modulation(target, *mod)
+            self.refresh_events()
         except Exception as e:
             print(f"Error loading sound {self.sound_path}: {e}")
-            Clock.schedule_once(lambda dt: self.load_sound(), 1.0)
+            get_scheduler().schedule(1.0, self.load_sound)
 
     def toggle_sound(self, instance):
         if self.is_playing:
             self.stop()
         else:
+            app = MDApp.get_running_app()
+            if app is not None and hasattr(app, "trace_tap"):
+                app.trace_tap(self)
             self.play()
+        self.record(f"{'Play' if self.is_playing else 'Stop'} {self.sound_name}")
+
+    def record(self, label, key=None):
+        # Marks a finished user change as one undo step.
+        app = MDApp.get_running_app()
+        if app is not None and hasattr(app, "record_change"):
+            app.record_change(label, key)
 
     def on_volume_change(self, instance, value):
         self.volume = value
-        if self.sound:
-            self.sound.set_volume(value)
+        self.mixer.set(self.sid, gain=value)
+        if not self._syncing:
+            if self.sound:
+                self.lifecycle.reconcile(self.sound, self.is_playing, value)
+            self.record(f"{self.sound_name} volume", ("gain", self.sid))
 
     def play(self):
+        app = MDApp.get_running_app()
+        tracer = getattr(app, "tracer", None)
         if not self.sound:
             self.load_sound()
+            if tracer:
+                tracer.mark(self.sid, "loaded")
         if self.sound:
-            self.sound.set_loop(True)
-            self.sound.set_volume(self.volume)
-            self.sound.play()
+            if tracer:
+                tracer.mark(self.sid, "play")
+            self.lifecycle.reconcile(self.sound, True, self.volume)
+            if tracer:
+                # Only the engine can say when the sound actually went out.
+                if isinstance(self.sound, EngineAudio):
+                    tracer.mark(self.sid, "start")
+                else:
+                    tracer.end(self.sid, "start")
             self.is_playing = True
+            self.mixer.set(self.sid, playing=True)
             self.play_btn.icon = "pause-circle-outline"
 
     def stop(self):
+        app = MDApp.get_running_app()
+        if getattr(app, "tracer", None):
+            app.tracer.cancel(self.sid)
         if self.sound and self.is_playing:
-            self.sound.stop()
+            self.lifecycle.reconcile(self.sound, False, self.volume)
             self.is_playing = False
+            self.mixer.set(self.sid, playing=False)
             self.play_btn.icon = "play-circle-outline"
 
+    def events_path(self):
+        app = MDApp.get_running_app()
+        if app is None or not isinstance(self.sound, EngineAudio):
+            return None
+        return app.events_path(self.sound_path)
+
+    def refresh_events(self):
+        # Called once the warm-up cache has the sliced events for this sound.
+        self.gen_btn.disabled = self.events_path() is None
+
+    def cycle_density(self, instance):
+        step = EVENT_DENSITIES.index(self.density) if self.density in EVENT_DENSITIES else 0
+        self.apply_density(EVENT_DENSITIES[(step + 1) % len(EVENT_DENSITIES)])
+        self.record(f"{self.sound_name} events")
+
+    def apply_density(self, density):
+        bank_path = self.events_path()
+        if bank_path is None:
+            density = 0
+        if density != self.density and isinstance(self.sound, EngineAudio):
+            self.sound.set_events(bank_path, density)
+        self.density = density
+        self.mixer.set(self.sid, density=density)
+        self.gen_btn.icon = DENSITY_ICONS[EVENT_DENSITIES.index(density)] if density in EVENT_DENSITIES else DENSITY_ICONS[-1]
+
+    def show_settings_dialog(self, instance):
+        if not self.settings_dialog:
+            from kivymd.uix.slider import MDSlider
+            content = MDBoxLayout(orientation="vertical", spacing=dp(4), size_hint_y=None)
+            content.bind(minimum_height=content.setter("height"))
+            presets = MDBoxLayout(orientation="horizontal", spacing=dp(4), size_hint_y=None, height=dp(40))
+            for name, params in FILTER_PRESETS.items():
+                presets.add_widget(MDFlatButton(text=name.upper(), on_release=lambda x, p=params: self.apply_filter(p)))
+            content.add_widget(presets)
+
+            def add_slider(label, low, high, value, callback):
+                content.add_widget(MDLabel(text=label, font_style="Caption", size_hint_y=None, height=dp(20)))
+                slider = MDSlider(min=low, max=high, value=value, size_hint_y=None, height=dp(36))
+                slider.bind(value=callback)
+                content.add_widget(slider)
+                return slider
+
+            self.filter_sliders = [add_slider(label, low, high, self.filter[i],
+                                              lambda instance, value, i=i: self.on_filter_change(i, value))
+                                   for i, (label, low, high) in enumerate(FILTER_CONTROLS)]
+            self.pan_sliders = [add_slider(label, low, high, self.placement[i],
+                                           lambda instance, value, i=i: self.on_placement_change(i, value))
+                                for i, (label, low, high) in enumerate(PAN_CONTROLS)]
+            self.vary_sliders = [add_slider(label, low, high, self.variation[i],
+                                            lambda instance, value, i=i: self.on_variation_change(i, value))
+                                 for i, (label, low, high) in enumerate(VARY_CONTROLS)]
+            self.mod_buttons = {}
+            self.mod_sliders = {}
+            for target in MOD_TARGETS:
+                row = MDBoxLayout(orientation="horizontal", size_hint_y=None, height=dp(40))
+                row.add_widget(MDLabel(text=f"{target.title()} modulation", font_style="Caption"))
+                button = MDFlatButton(text=self.mods[target][0].upper(),
+                                      on_release=lambda x, t=target: self.cycle_mod_shape(t))
+                row.add_widget(button)
+                content.add_widget(row)
+                self.mod_buttons[target] = button
+                self.mod_sliders[target] = (
+                    add_slider("Rate", *MOD_RATE_RANGE, self.mods[target][1],
+                               lambda instance, value, t=target: self.on_mod_change(t, 1, value)),
+                    add_slider("Depth", 0, 1, self.mods[target][2],
+                               lambda instance, value, t=target: self.on_mod_change(t, 2, value)),
+                )
+            scroll = ScrollView(size_hint_y=None, height=dp(420))
+            scroll.add_widget(content)
+            app = MDApp.get_running_app()
+            buttons = [MDFlatButton(text="ADD LAYER", on_release=lambda x: app.add_layer(self))]
+            if self.is_layer:
+                buttons.append(MDFlatButton(text="REMOVE LAYER", on_release=lambda x: app.remove_layer(self)))
+            self.settings_dialog = MDDialog(title=self.sound_name, type="custom", content_cls=scroll, buttons=buttons)
+        self.settings_dialog.open()
+
+    def cycle_mod_shape(self, target):
+        shape = MOD_SHAPES[(MOD_SHAPES.index(self.mods[target][0]) + 1) % len(MOD_SHAPES)]
+        self.apply_modulation(target, [shape] + self.mods[target][1:])
+        self.record(f"{self.sound_name} {target} modulation")
+
+    def on_mod_change(self, target, i, value):
+        if self._syncing:
+            return
+        mod = list(self.mods[target])
+        mod[i] = value
+        self.apply_modulation(target, mod)
+        self.record(f"{self.sound_name} {target} modulation", ("mod", self.sid, target, i))
+
+    def apply_modulation(self, target, mod):
+        mod = [mod[0], float(mod[1]), float(mod[2])]
+        if mod != self.mods[target] and isinstance(self.sound, EngineAudio):
+            # Evaluated per block in the engine; nothing here runs per tick.
+            self.sound.set_modulation(target, *mod)
+        self.mods[target] = mod
+        self.mixer.set(self.sid, mod={target: mod})
+        modulated = self.is_modulated()
+        self.mod_bar.opacity = 1 if self.mods["gain"][0] != "off" else 0
+        if not modulated:
+            self.vol_label.text = "Volume"
+        app = MDApp.get_running_app()
+        if app is not None and hasattr(app, "watch_modulation"):
+            app.watch_modulation(self, modulated)
+        if self.settings_dialog:
+            self._syncing = True
+            self.mod_buttons[target].text = mod[0].upper()
+            for slider, value in zip(self.mod_sliders[target], mod[1:]):
+                slider.value = value
+            self._syncing = False
+
+    def is_modulated(self):
+        return any(mod[0] != "off" for mod in self.mods.values())
+
+    def show_modulation(self, gain, pan):
+        # Decimated engine values; only called for visible tiles.
+        if self.mods["gain"][0] != "off":
+            self.mod_bar.value = 100.0 * gain / max(self.volume, 1e-6)
+        label = "Volume"
+        if self.mods["pan"][0] != "off":
+            label += f"  L{'<' if pan < -0.1 else '|'}{'>' if pan > 0.1 else '|'}R"
+        self.vol_label.text = label
+
+    def show_level(self, rms):
+        # Engine meter reading; only called for visible tiles.
+        self.level_bar.opacity = 1 if self.is_playing else 0
+        self.level_bar.value = meter_value(rms)
+
+    def on_placement_change(self, i, value):
+        if self._syncing:
+            return
+        placement = list(self.placement)
+        placement[i] = value
+        self.apply_placement(placement)
+        self.record(f"{self.sound_name} placement", ("placement", self.sid, i))
+
+    def apply_placement(self, placement):
+        if len(placement) > 2:
+            # Older mixes stored a pan drift rate; it is pan modulation now.
+            if placement[2] > 0:
+                self.apply_modulation("pan", ["sine", placement[2], 0.6])
+            placement = placement[:2]
+        placement = [float(value) for value in placement]
+        if placement != self.placement and self.sound and hasattr(self.sound, "set_pan"):
+            self.sound.set_pan(*placement)
+        self.placement = placement
+        self.mixer.set(self.sid, placement=placement)
+        if self.settings_dialog:
+            self._syncing = True
+            for slider, value in zip(self.pan_sliders, placement):
+                slider.value = value
+            self._syncing = False
+
+    def on_variation_change(self, i, value):
+        if self._syncing:
+            return
+        variation = list(self.variation)
+        variation[i] = value
+        self.apply_variation(variation)
+        self.record(f"{self.sound_name} {VARY_CONTROLS[i][0].lower()}", ("vary", self.sid, i))
+
+    def apply_variation(self, variation):
+        # Snapped to the steps the engine keeps kernels for, so a slider drag
+        # only posts when the sound would actually change.
+        variation = list(quantize_variation(*variation))
+        if variation != self.variation and self.sound and hasattr(self.sound, "set_variation"):
+            self.sound.set_variation(*variation)
+        self.variation = variation
+        self.mixer.set(self.sid, speed=variation[0], pitch=variation[1])
+        if self.settings_dialog:
+            self._syncing = True
+            for slider, value in zip(self.vary_sliders, variation):
+                slider.value = value
+            self._syncing = False
+
+    def on_filter_change(self, i, value):
+        if self._syncing:
+            return
+        params = list(self.filter)
+        params[i] = value
+        self.apply_filter(params)
+        self.record(f"{self.sound_name} filter", ("filter", self.sid, i))
+
+    def apply_filter(self, params):
+        params = [float(value) for value in params]
+        if params != self.filter and isinstance(self.sound, EngineAudio):
+            # The engine glides to the new settings, so slider drags are smooth.
+            self.sound.set_filter(params)
+        self.filter = params
+        self.mixer.set(self.sid, filter=params)
+        self.filter_btn.icon = "tune-vertical" if params == list(FLAT_FILTER) else "tune-vertical-variant"
+        if self.settings_dialog:
+            self._syncing = True
+            for slider, value in zip(self.filter_sliders, params):
+                slider.value = value
+            self._syncing = False
+
     def get_state(self):
-        return {
-            "sound_name": self.sound_name,
-            "is_playing": self.is_playing,
-            "volume": self.volume,
-        }
+        return self.mixer.state(self.sid)
 
     def set_state(self, state):
+        if "density" in state:
+            self.apply_density(state["density"])
+        if "filter" in state:
+            self.apply_filter(state["filter"])
+        if "pan" in state:
+            self.apply_placement(state["pan"])
+        if "speed" in state or "pitch" in state:
+            self.apply_variation([state.get("speed", UNVARIED[0]), state.get("pitch", UNVARIED[1])])
+        for target, mod in state.get("mod", {}).items():
+            if target in self.mods:
+                self.apply_modulation(target, mod)
         if "volume" in state:
             self.volume = state["volume"]
             self.slider.value = state["volume"]
+            self.mixer.set(self.sid, gain=state["volume"])
             if self.sound:
-                self.sound.set_volume(state["volume"])
+                self.lifecycle.reconcile(self.sound, self.is_playing, state["volume"])
         if state.get("is_playing", False):
-            if not self.sound:
-                self.load_sound()
-            Clock.schedule_once(lambda dt: self.play(), 0.2)
+            self.play()
         else:
             self.stop()
 
+    def show_state(self, state):
+        # Update the widgets only; the engine was already told in one batch.
+        self._syncing = True
+        if "volume" in state:
+            self.volume = state["volume"]
+            self.slider.value = state["volume"]
+            self.mixer.set(self.sid, gain=state["volume"])
+        self._syncing = False
+        if "density" in state:
+            self.apply_density(state["density"])
+        if "filter" in state:
+            self.apply_filter(state["filter"])
+        if "pan" in state:
+            self.apply_placement(state["pan"])
+        if "speed" in state or "pitch" in state:
+            self.apply_variation([state.get("speed", UNVARIED[0]), state.get("pitch", UNVARIED[1])])
+        for target, mod in state.get("mod", {}).items():
+            if target in self.mods:
+                self.apply_modulation(target, mod)
+        self.is_playing = bool(state.get("is_playing", False))
+        self.mixer.set(self.sid, playing=self.is_playing)
+        self.play_btn.icon = "pause-circle-outline" if self.is_playing else "play-circle-outline"
+        if self.sound:
+            self.lifecycle.commit(self.sound, self.is_playing, self.volume)
+
+    def sync_backend(self):
+        if self.sound:
+            self.lifecycle.reconcile(self.sound, self.is_playing, self.volume)
+
+    def drop_player(self):
+        # The backend has already released (or is releasing) this player.
+        if self.sound:
+            self.lifecycle.forget(self.sound)
+            self.sound = None
+        self.is_playing = False
+        self.play_btn.icon = "play-circle-outline"
+        self.density = 0
+        self.mixer.set(self.sid, playing=False, density=0)
+        self.gen_btn.icon = DENSITY_ICONS[0]
+        self.gen_btn.disabled = True
+
     def release_resources(self):
         if self.sound:
             self.stop()
             self.sound.release()
+            self.lifecycle.forget(self.sound)
             self.sound = None
 
 # -----------------------------------------------------------------------------
@@ -262,6 +848,13 @@ class SavedMixItem(OneLineAvatarIconListItem):
 #
 # Each custom tab includes a "title" property so that MDTabs displays a valid label.
 # -----------------------------------------------------------------------------
+def search_field(hint, handler):
+    # Search box that re-filters the tab on every keystroke.
+    from kivymd.uix.textfield import MDTextField
+    field = MDTextField(hint_text=hint, size_hint_y=None, height=dp(48), icon_right="magnify")
+    field.bind(text=lambda instance, text: getattr(MDApp.get_running_app(), handler)(text))
+    return field
+
 class SoundsTab(MDBoxLayout, MDTabsBase):
     title = StringProperty("")  # Used by MDTabs for the tab label
 
@@ -269,12 +862,14 @@ class SoundsTab(MDBoxLayout, MDTabsBase):
         super().__init__(**kwargs)
         self.orientation = "vertical"
         self.spacing = dp(10)
-        scroll = ScrollView()
+        self.search_field = search_field("Search sounds", "filter_sounds")
+        self.add_widget(self.search_field)
+        self.scroll = ScrollView()
         from kivy.uix.gridlayout import GridLayout
         self.grid = GridLayout(cols=2, padding=dp(10), spacing=dp(10), size_hint_y=None)
         self.grid.bind(minimum_height=self.grid.setter("height"))
-        scroll.add_widget(self.grid)
-        self.add_widget(scroll)
+        self.scroll.add_widget(self.grid)
+        self.add_widget(self.scroll)
 
     def add_sound_tile(self, tile):
         self.grid.add_widget(tile)
@@ -286,6 +881,12 @@ class MixesTab(MDBoxLayout, MDTabsBase):
         super().__init__(**kwargs)
         self.orientation = "vertical"
         self.spacing = dp(10)
+        self.search_field = search_field("Search mixes", "filter_mixes")
+        self.add_widget(self.search_field)
+        buttons = MDBoxLayout(orientation="horizontal", spacing=dp(10), size_hint_y=None, height=dp(48))
+        buttons.add_widget(MDFlatButton(text="IMPORT", on_release=lambda x: MDApp.get_running_app().show_import_dialog()))
+        buttons.add_widget(MDFlatButton(text="EXPORT", on_release=lambda x: MDApp.get_running_app().export_collection()))
+        self.add_widget(buttons)
         scroll = ScrollView()
         from kivy.uix.boxlayout import BoxLayout
         self.mix_list = BoxLayout(orientation="vertical", spacing=dp(5), size_hint_y=None)
@@ -296,6 +897,54 @@ class MixesTab(MDBoxLayout, MDTabsBase):
     def add_mix_item(self, mix_item):
         self.mix_list.add_widget(mix_item)
 
+class TimelinesTab(MDBoxLayout, MDTabsBase):
+    title = StringProperty("")  # Used by MDTabs for the tab label
+
+    def __init__(self, app, **kwargs):
+        super().__init__(**kwargs)
+        self.orientation = "vertical"
+        self.spacing = dp(10)
+        self.padding = dp(10)
+        from kivymd.uix.textfield import MDTextField
+        self.text_field = MDTextField(hint_text="Rain 30 → Waves 60 → fade out", size_hint_y=None, height=dp(48))
+        self.add_widget(self.text_field)
+        buttons = MDBoxLayout(orientation="horizontal", spacing=dp(10), size_hint_y=None, height=dp(48))
+        buttons.add_widget(MDRaisedButton(text="PLAY", on_release=lambda x: app.play_timeline(None, self.text_field.text)))
+        buttons.add_widget(MDFlatButton(text="SAVE", on_release=lambda x: app.save_timeline(self.text_field.text)))
+        buttons.add_widget(MDFlatButton(text="STOP", on_release=lambda x: app.stop_timeline()))
+        self.add_widget(buttons)
+        scroll = ScrollView()
+        from kivy.uix.boxlayout import BoxLayout
+        self.timeline_list = BoxLayout(orientation="vertical", spacing=dp(5), size_hint_y=None)
+        self.timeline_list.bind(minimum_height=self.timeline_list.setter("height"))
+        scroll.add_widget(self.timeline_list)
+        self.add_widget(scroll)
+
+# -----------------------------------------------------------------------------
+# TimelineItem – A saved timeline in the Timelines tab.
+# -----------------------------------------------------------------------------
+class TimelineItem(OneLineAvatarIconListItem):
+    def __init__(self, name, timeline, app, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.timeline = timeline
+        self.app = app
+        self.text = f"{name}: {format_timeline(timeline)}"
+
+        self.add_widget(IconLeftWidget(icon="timeline-clock-outline"))
+
+        delete_btn = MDIconButton(icon="delete", theme_text_color="Error")
+        delete_btn.bind(on_release=self.delete_timeline)
+        self.add_widget(delete_btn)
+
+    def on_release(self):
+        self.app.play_timeline(self.name, timeline=self.timeline)
+
+    def delete_timeline(self, instance):
+        self.app.delete_timeline(self.name)
+        if self.parent:
+            self.parent.remove_widget(self)
+
 # -----------------------------------------------------------------------------
 # Main App Class – SoundBlanketApp
 # -----------------------------------------------------------------------------
@@ -304,10 +953,40 @@ class SoundBlanketApp(MDApp):
         self.title = "Sound Blanket"
         self.theme_cls.primary_palette = "DeepPurple"
         self.store = None
-        self.sound_tiles = []
+        self.sound_tiles = {}     # sid -> tile, live sounds only
         self.dialog = None
+        self.warmup_job = None
+        self.engine = None
+        self.engine_process = None
+        self.prewarmed = {}
+        self.engine_released = False
+        self.sleep_event = None
+        self.sleep_fading = False
+        self.sleep_dialog = None
+        self.quality_dialog = None
+        self.transfer_dialog = None
+        self.debug_dialog = None
+        self.tracer = LatencyTracer()
+        self.trace_event = None
+        self.hud = None
+        self.metrics_server = None
+        self.memory_profiler = None
+        self.timeline_player = None
+        self.mod_tiles = set()
+        self.mod_event = None
+        self.mixer = MixerState()
+        self.mixer.bind(self.on_mixer_change)
+        self.history = MixHistory(self.mixer)
+        self.applying = False
+        self.search = SearchIndex()
+        self.mix_items = {}
+        self.session_version = None
 
         self.setup_storage()
+        self.lifecycle = LifecycleManager(self.store)
+        self.setup_metrics()
+        self.setup_background_audio()
+        self.restore_last_session()
 
         screen = MDScreen()
 
@@ -317,8 +996,12 @@ class SoundBlanketApp(MDApp):
             title="Sound Blanket",
             pos_hint={"top": 1},
             elevation=10,
-            left_action_items=[["menu", lambda x: None]],
+            left_action_items=[["menu", lambda x: self.show_debug_menu()]],
             right_action_items=[
+                ["undo", lambda x: self.undo()],
+                ["redo", lambda x: self.redo()],
+                ["timer-outline", lambda x: self.show_sleep_dialog()],
+                ["speedometer", lambda x: self.show_quality_dialog()],
                 ["stop-circle", lambda x: self.stop_all_sounds()],
                 ["content-save", lambda x: self.show_save_mix_dialog()],
             ],
@@ -332,6 +1015,19 @@ class SoundBlanketApp(MDApp):
         )
         screen.add_widget(self.tabs)
 
+        # Thin progress strip for the background cache warm-up.
+        from kivymd.uix.progressbar import MDProgressBar
+        self.warmup_bar = MDProgressBar(value=0, pos_hint={"y": 0}, size_hint_y=None, height=dp(4), opacity=0)
+        screen.add_widget(self.warmup_bar)
+        self.master_meter = MDProgressBar(value=0, pos_hint={"top": 0.9}, size_hint_y=None, height=dp(3), opacity=0)
+        screen.add_widget(self.master_meter)
+
+        # Performance HUD, off until enabled from the debug menu.
+        self.hud = MDLabel(text="", font_style="Caption", theme_text_color="Custom", text_color=(1, 1, 1, 1),
+                           md_bg_color=(0, 0, 0, 0.6), size_hint=(None, None), size=(dp(220), dp(150)),
+                           pos_hint={"x": 0, "y": 0.02}, padding=(dp(6), dp(4)), opacity=0)
+        screen.add_widget(self.hud)
+
         # Instantiate the Sounds tab and assign a title.
         self.sounds_tab = SoundsTab()
         self.sounds_tab.title = "Sounds"
@@ -342,9 +1038,14 @@ class SoundBlanketApp(MDApp):
         self.mixes_tab.title = "Mixes"
         self.tabs.add_widget(self.mixes_tab)
 
+        self.timelines_tab = TimelinesTab(app=self)
+        self.timelines_tab.title = "Timelines"
+        self.tabs.add_widget(self.timelines_tab)
+
+        Clock.schedule_interval(lambda dt: self.update_meters(), METER_UI_INTERVAL)
         Clock.schedule_once(lambda dt: self.setup_sounds(), 0.3)
         Clock.schedule_once(lambda dt: self.load_saved_mixes(), 0.5)
-        self.setup_background_audio()
+        Clock.schedule_once(lambda dt: self.load_timelines(), 0.5)
 
         return screen
 
@@ -357,39 +1058,232 @@ class SoundBlanketApp(MDApp):
         data_dir = os.path.join(app_folder, "data")
         if not os.path.exists(data_dir):
             os.makedirs(data_dir)
-        self.store = JsonStore(os.path.join(data_dir, "mixes.json"))
+        self.data_dir = data_dir
+        self.store = MeteredJsonStore(os.path.join(data_dir, "mixes.json"))
+        self.timeline_store = MeteredJsonStore(os.path.join(data_dir, "timelines.json"))
+        self.layer_store = MeteredJsonStore(os.path.join(data_dir, "layers.json"))
 
-    def setup_sounds(self):
+    def get_sound_dir(self):
         if platform == "android":
             from android.storage import app_storage_path
-            from android.permissions import request_permissions, Permission
-            request_permissions([Permission.READ_EXTERNAL_STORAGE, Permission.WRITE_EXTERNAL_STORAGE])
             app_folder = os.path.join(app_storage_path(), "app")
             sound_dir = os.path.join(app_folder, "sounds")
             if not os.path.exists(sound_dir):
                 os.makedirs(sound_dir)
         else:
             sound_dir = os.path.join(os.getcwd(), "sounds")
-        if os.path.exists(sound_dir):
-            for filename in sorted(os.listdir(sound_dir)):
-                if filename.lower().endswith((".ogg", ".wav", ".mp3")):
-                    full_path = os.path.join(sound_dir, filename)
-                    tile = SoundTile(sound_path=full_path)
-                    self.sounds_tab.add_sound_tile(tile)
-                    self.sound_tiles.append(tile)
+        return sound_dir
+
+    def get_sound_paths(self):
+        sound_dir = self.get_sound_dir()
+        if not os.path.exists(sound_dir):
+            return []
+        return [os.path.join(sound_dir, filename) for filename in sorted(os.listdir(sound_dir))
+                if filename.lower().endswith((".ogg", ".wav", ".mp3"))]
+
+    def sound_layout(self, paths):
+        # (name, path, offset) per sound id, in the order setup_sounds adds
+        # the tiles: every file, then the saved layers of files still there.
+        layout = [(None, path, 0.0) for path in paths]
+        by_file = {os.path.basename(path): path for path in paths}
+        for name in self.layer_store.keys():
+            layer = self.layer_store.get(name)
+            if layer.get("file") in by_file and len(layout) < MAX_VOICES:
+                layout.append((name, by_file[layer["file"]], layer.get("offset", 0.0)))
+        return layout
+
+    def restore_last_session(self):
+        # Runs from build(), before any widget exists: start only the sounds
+        # that were playing, loudest first, and let the tiles adopt them later.
+        # Sounds a still-running service reports playing are left alone.
+        if not self.store.exists("last_session"):
+            return
+        try:
+            saved = [state for state in self.store.get("last_session").get("sounds", [])
+                     if state.get("is_playing")]
+            if not saved:
+                return
+            paths = self.get_sound_paths()
+            layout = self.sound_layout(paths)
+            by_name = {(name or sound_name_from_path(path)).lower(): (sid, path, offset)
+                       for sid, (name, path, offset) in enumerate(layout)}
+            self.engine = self.setup_engine(paths)
+            self.make_warmup_job(paths)
+            running = set()
+            if hasattr(self.engine, "wait_snapshot"):
+                running = set(self.engine.wait_snapshot(SESSION_PROBE_SECONDS).get("playing", ()))
+            for state in sorted(saved, key=lambda state: state.get("volume", 0.0), reverse=True):
+                match = by_name.get(state.get("sound_name", "").lower())
+                if match is None:
+                    continue
+                sid, path, offset = match
+                if sid in running:
+                    self.prewarmed[sid] = (None, state)
+                    continue
+                player = create_audio(path, self.engine, sid, self.pcm_path(path), offset)
+                apply_saved_settings(player, state)
+                self.lifecycle.reconcile(player, True, state.get("volume", 0.7))
+                self.prewarmed[sid] = (player, state)
+        except Exception as e:
+            print(f"Error restoring last session: {e}")
+
+    def setup_sounds(self):
+        if platform == "android":
+            from android.permissions import request_permissions, Permission
+            request_permissions([Permission.READ_EXTERNAL_STORAGE, Permission.WRITE_EXTERNAL_STORAGE])
+        paths = self.get_sound_paths()
+        if paths:
+            if self.engine is None:
+                self.engine = self.setup_engine(paths)
+            for sid, (name, path, offset) in enumerate(self.sound_layout(paths)):
+                player, state = self.prewarmed.pop(sid, (None, None))
+                self.add_sound_tile(path, name, offset, player=player, state=state)
+            self.history.rebase()
+            self.start_warmup()
         else:
-            print(f"Sound directory not found: {sound_dir}")
+            print(f"Sound directory not found: {self.get_sound_dir()}")
+
+    def add_sound_tile(self, path, name=None, offset=0.0, player=None, state=None):
+        sid = self.mixer.add_sound(name or sound_name_from_path(path))
+        self.history.forget(sid)
+        tile = SoundTile(sound_path=path, mixer=self.mixer, engine=self.engine, sid=sid, player=player,
+                         state=state, lifecycle=self.lifecycle, name=name, offset=offset)
+        self.sounds_tab.add_sound_tile(tile)
+        self.sound_tiles[sid] = tile
+        self.search.add(("sound", sid), tile.sound_name)
+        return tile
+
+    # -------------------------------------------------------------------------
+    # Layers: extra tiles playing the same file, each with its own gain, pan,
+    # filter and start offset. They read the warm-up cache's decoded buffer,
+    # which every layer of the file shares, so they need the cache first.
+    def pcm_path(self, sound_path):
+        return self.warmup_job.pcm_path(sound_path) if self.warmup_job else None
+
+    def add_layer(self, tile):
+        if self.pcm_path(tile.sound_path) is None:
+            self.top_bar.title = f"{tile.sound_name} can be layered once it is cached"
+            return None
+        if len(self.sound_tiles) >= MAX_VOICES:
+            self.top_bar.title = f"No room for more layers ({MAX_VOICES} sounds at most)"
+            return None
+        base = sound_name_from_path(tile.sound_path)
+        count = 2
+        while self.mixer.sid_of(f"{base} {count}") is not None or self.layer_store.exists(f"{base} {count}"):
+            count += 1
+        name = f"{base} {count}"
+        # Spread layers over the file by the golden ratio so none line up.
+        offset = ((count - 1) * LAYER_SPREAD) % 1.0 * self.warmup_job.duration(tile.sound_path)
+        self.layer_store.put(name, file=os.path.basename(tile.sound_path), offset=offset)
+        if tile.settings_dialog:
+            tile.settings_dialog.dismiss()
+        layer = self.add_sound_tile(tile.sound_path, name, offset)
+        self.filter_sounds(self.sounds_tab.search_field.text)
+        return layer
+
+    def remove_layer(self, tile):
+        if tile.settings_dialog:
+            tile.settings_dialog.dismiss()
+        tile.release_resources()
+        tile.drop_player()
+        self.mixer.drop(tile.sid)
+        self.sound_tiles.pop(tile.sid, None)
+        self.search.remove(("sound", tile.sid))
+        if self.layer_store.exists(tile.sound_name):
+            self.layer_store.delete(tile.sound_name)
+        if tile.parent:
+            tile.parent.remove_widget(tile)
+        self.history.rebase()
+
+    def setup_engine(self, paths):
+        # Android hosts the engine in the foreground service process; desktop
+        # runs it in-process unless SOUND_BLANKET_ENGINE=process asks for the
+        # stand-in, which speaks the same control protocol.
+        if platform == "android":
+            return EngineClient(token_path(self.data_dir), ENGINE_PORT)
+        if os.environ.get("SOUND_BLANKET_ENGINE") == "process":
+            self.engine_process = spawn_standin(token_path(self.data_dir), ENGINE_PORT)
+            return EngineClient(token_path(self.data_dir), ENGINE_PORT)
+        return create_engine(paths)
+
+    def ensure_engine(self):
+        # The engine shuts itself down after a sleep fade; bring it (and on
+        # Android the service and screen flag) back on the next interaction.
+        # Interacting while it is still fading calls the sleep off instead.
+        if self.sleep_fading:
+            self.cancel_sleep_timer()
+        if self.engine_released:
+            self.engine_released = False
+            self.setup_background_audio()
+            self.engine = self.setup_engine([tile.sound_path for tile in self.sound_tiles.values()])
+            for tile in self.sound_tiles.values():
+                tile.engine = self.engine
+        return self.engine
+
+    def make_warmup_job(self, paths):
+        if self.warmup_job is None:
+            self.warmup_job = WarmupJob(
+                sorted(set(paths)),
+                os.path.join(self.data_dir, "cache"),
+                on_progress=self.on_warmup_progress,
+                on_complete=self.on_warmup_complete,
+            )
+        return self.warmup_job
+
+    def start_warmup(self):
+        self.make_warmup_job([tile.sound_path for tile in self.sound_tiles.values()])
+        if self.warmup_job.pending():
+            self.warmup_bar.opacity = 1
+            self.warmup_job.start()
+
+    def events_path(self, sound_path):
+        if self.warmup_job is None:
+            return None
+        return self.warmup_job.events_path(sound_path)
+
+    def cancel_warmup(self):
+        if self.warmup_job:
+            self.warmup_job.cancel()
+
+    def on_warmup_progress(self, done, total):
+        self.warmup_bar.value = 100.0 * done / total if total else 100.0
+
+    def on_warmup_complete(self, cancelled):
+        self.warmup_bar.opacity = 0
+        for tile in self.sound_tiles.values():
+            tile.refresh_events()
+        if self.warmup_job and self.warmup_job.failed:
+            print(f"Cache warm-up finished with {self.warmup_job.failed} failed file(s)")
+        skipped = self.warmup_job.skipped() if self.warmup_job else []
+        if skipped:
+            print(f"Cache warm-up skipped {len(skipped)} file(s) it cannot decode")
 
     def load_saved_mixes(self):
-        self.mixes_tab.mix_list.clear_widgets()
         try:
             for mix_name in self.store.keys():
                 if mix_name == "last_session":
                     continue
-                mix_item = SavedMixItem(mix_name=mix_name, app=self)
-                self.mixes_tab.add_mix_item(mix_item)
+                self.index_mix(mix_name)
         except Exception as e:
             print(f"Error loading saved mixes: {e}")
+        self.filter_mixes(self.mixes_tab.search_field.text)
+
+    def index_mix(self, mix_name):
+        # A mix is found by its name and by the sounds playing in it.
+        tags = [saved.get("sound_name", "") for saved in self.saved_sounds(mix_name) if saved.get("is_playing")]
+        self.search.add(("mix", mix_name), mix_name, tags)
+
+    def filter_mixes(self, text):
+        self.mixes_tab.mix_list.clear_widgets()
+        for _, mix_name in self.search.search(text, "mix"):
+            if mix_name not in self.mix_items:
+                self.mix_items[mix_name] = SavedMixItem(mix_name=mix_name, app=self)
+            self.mixes_tab.add_mix_item(self.mix_items[mix_name])
+
+    def filter_sounds(self, text):
+        self.sounds_tab.grid.clear_widgets()
+        for _, sid in self.search.search(text, "sound", limit=len(self.sound_tiles)):
+            self.sounds_tab.add_sound_tile(self.sound_tiles[sid])
 
     def show_save_mix_dialog(self):
         if not self.dialog:
@@ -415,87 +1309,593 @@ class SoundBlanketApp(MDApp):
     def do_save_mix(self, *args):
         mix_name = self.mix_name_field.text.strip()
         if mix_name:
-            mix_data = {"sounds": [tile.get_state() for tile in self.sound_tiles]}
+            mix_data = {"sounds": self.mixer.states()}
             self.store.put(mix_name, **mix_data)
             self.top_bar.title = mix_name
-            self.load_saved_mixes()
+            self.index_mix(mix_name)
+            self.filter_mixes(self.mixes_tab.search_field.text)
             self.close_dialog()
 
+    # Mix collections move between devices as one JSON-lines file, streamed
+    # both ways; an import lands in the store in a single write.
+    def export_collection(self):
+        path = os.path.join(self.data_dir, time.strftime(EXPORT_NAME))
+        try:
+            count = export_mixes(self.store, path)
+            self.show_transfer_result("Export", f"{count} mixes written to {path}")
+        except Exception as e:
+            print(f"Error exporting mixes: {e}")
+
+    def show_import_dialog(self):
+        from kivymd.uix.textfield import MDTextField
+        path = latest_export(self.data_dir) or os.path.join(self.data_dir, "")
+        self.import_path_field = MDTextField(hint_text="Collection file", text=path)
+        buttons = [MDFlatButton(text="CANCEL", on_release=lambda x: self.close_transfer_dialog())]
+        # One button per way of handling names that already exist.
+        buttons += [MDRaisedButton(text=policy.upper(), on_release=lambda x, policy=policy: self.import_collection(policy))
+                    for policy in IMPORT_POLICIES]
+        self.close_transfer_dialog()
+        self.transfer_dialog = MDDialog(title="Import mixes", type="custom", content_cls=self.import_path_field, buttons=buttons)
+        self.transfer_dialog.open()
+
+    def import_collection(self, policy):
+        path = self.import_path_field.text.strip()
+        try:
+            report = import_mixes(self.store, path, lambda name: self.mixer.sid_of(name) is not None, policy)
+        except Exception as e:
+            print(f"Error importing mixes: {e}")
+            self.show_transfer_result("Import", f"Nothing imported: {e}")
+            return
+        for mix_name in report["added"] + report["replaced"] + list(report["renamed"].values()):
+            self.index_mix(mix_name)
+        self.filter_mixes(self.mixes_tab.search_field.text)
+        self.show_transfer_result("Import", format_import_report(report))
+
+    def show_transfer_result(self, title, text):
+        self.close_transfer_dialog()
+        self.transfer_dialog = MDDialog(title=title, text=text,
+                                        buttons=[MDFlatButton(text="OK", on_release=lambda x: self.close_transfer_dialog())])
+        self.transfer_dialog.open()
+
+    def close_transfer_dialog(self):
+        if self.transfer_dialog:
+            self.transfer_dialog.dismiss()
+            self.transfer_dialog = None
+
+    def saved_sounds(self, mix_name):
+        if self.store.exists(mix_name):
+            return self.store.get(mix_name).get("sounds", [])
+        return []
+
     def load_mix(self, mix_name):
+        self.ensure_engine()
         if self.store.exists(mix_name):
-            self.stop_all_sounds()
-            mix_data = self.store.get(mix_name)
-            saved_sounds = mix_data.get("sounds", [])
-            for saved_sound in saved_sounds:
-                saved_name = saved_sound.get("sound_name", "").lower()
-                for tile in self.sound_tiles:
-                    if tile.sound_name.lower() == saved_name:
-                        Clock.schedule_once(lambda dt, t=tile, s=saved_sound: t.set_state(s), 0.1)
-                        break
+            self.apply_snapshot(self.mixer.from_saved(self.saved_sounds(mix_name)))
+            self.record_change(f"Load {mix_name}")
             self.top_bar.title = mix_name
 
+    def apply_snapshot(self, snapshot, transition=0.0):
+        # Whole-mix changes (mix loads, undo/redo). With the engine this is
+        # one LOAD_MIX and the tiles only mirror the result; without it only
+        # the tiles whose sound changed are reconciled.
+        snapshot = self.mixer.live(snapshot)
+        if self.engine:
+            self.engine.load_mix(self.mix_entries(snapshot=snapshot), transition)
+            return
+        self.applying = True
+        try:
+            for sid in self.mixer.diff(snapshot):
+                if sid in self.sound_tiles:
+                    self.sound_tiles[sid].set_state(self.mixer.state(sid, snapshot))
+        finally:
+            self.applying = False
+
+    def mix_entries(self, saved_sounds=(), show=True, snapshot=None):
+        # Engine entries for a saved mix; with show, the mixer state takes the
+        # mix and only the tiles whose sound changed are refreshed.
+        if snapshot is None:
+            snapshot = self.mixer.from_saved(saved_sounds)
+        entries = self.mixer.entries(snapshot)
+        for sid, _, _ in entries:
+            if not self.sound_tiles[sid].sound:
+                self.sound_tiles[sid].load_sound()
+        if show:
+            self.mixer.restore(snapshot)
+        return entries
+
+    # -------------------------------------------------------------------------
+    # Undo/redo. Tiles record each finished change (slider drags merge into
+    # one step); undo and redo go through apply_snapshot like a mix load.
+    def record_change(self, label, key=None):
+        if not self.applying:
+            if self.sleep_fading:
+                self.cancel_sleep_timer()
+            self.history.record(label, key, time.monotonic())
+
+    def undo(self):
+        snapshot, label = self.history.undo()
+        if snapshot is not None:
+            self.apply_snapshot(snapshot, UNDO_TRANSITION)
+            self.history.rebase()
+            self.top_bar.title = f"Undo {label}"
+
+    def redo(self):
+        snapshot, label = self.history.redo()
+        if snapshot is not None:
+            self.apply_snapshot(snapshot, UNDO_TRANSITION)
+            self.history.rebase()
+            self.top_bar.title = f"Redo {label}"
+
+    def on_mixer_change(self, sids):
+        for sid in sids:
+            if sid in self.sound_tiles:
+                self.sound_tiles[sid].show_state(self.mixer.state(sid))
+
     def delete_mix(self, mix_name):
         if self.store.exists(mix_name):
             self.store.delete(mix_name)
+            self.search.remove(("mix", mix_name))
+            self.mix_items.pop(mix_name, None)
             print(f"Deleted mix: {mix_name}")
 
+    # -------------------------------------------------------------------------
+    # Timelines – saved mixes chained with durations, kept in their own store.
+    # -------------------------------------------------------------------------
+    def load_timelines(self):
+        self.timelines_tab.timeline_list.clear_widgets()
+        try:
+            for name in self.timeline_store.keys():
+                timeline = self.timeline_store.get(name)
+                self.timelines_tab.timeline_list.add_widget(TimelineItem(name, timeline, app=self))
+        except Exception as e:
+            print(f"Error loading timelines: {e}")
+
+    def parse_timeline_text(self, text):
+        try:
+            return parse_timeline(text, [name for name in self.store.keys() if name != "last_session"])
+        except ValueError as e:
+            self.timelines_tab.text_field.error = True
+            self.timelines_tab.text_field.helper_text = str(e)
+            self.timelines_tab.text_field.helper_text_mode = "on_error"
+            return None
+
+    def save_timeline(self, text):
+        timeline = self.parse_timeline_text(text)
+        if timeline:
+            name = " → ".join(step["mix"] for step in timeline["steps"])
+            self.timeline_store.put(name, **timeline)
+            self.load_timelines()
+
+    def play_timeline(self, name, text=None, timeline=None):
+        if timeline is None:
+            timeline = self.parse_timeline_text(text)
+            if timeline is None:
+                return
+        self.stop_timeline()
+        self.ensure_engine()
+        self.timeline_player = TimelinePlayer(self, name or "Timeline", timeline)
+        if not self.timeline_player.start():
+            self.timeline_player = None
+            self.top_bar.title = "Timeline could not start"
+
+    def stop_timeline(self):
+        if self.timeline_player:
+            if self.timeline_player.running and self.timeline_player.timeline.get("fade"):
+                self.cancel_sleep_timer()
+            self.timeline_player.stop()
+            self.timeline_player = None
+
+    def delete_timeline(self, name):
+        if self.timeline_store.exists(name):
+            self.timeline_store.delete(name)
+
+    # -------------------------------------------------------------------------
+    # Modulation display. Tiles with modulation subscribe here; one slow Clock
+    # interval reads the engine snapshot and refreshes only the visible ones.
+    # -------------------------------------------------------------------------
+    def watch_modulation(self, tile, active):
+        if active:
+            self.mod_tiles.add(tile)
+        else:
+            self.mod_tiles.discard(tile)
+        if self.mod_tiles and self.mod_event is None:
+            self.mod_event = Clock.schedule_interval(lambda dt: self.update_modulation(), MOD_UI_INTERVAL)
+        elif not self.mod_tiles and self.mod_event is not None:
+            self.mod_event.cancel()
+            self.mod_event = None
+
+    def tile_visible(self, tile):
+        if tile.parent is None or self.tabs.get_current_tab() is not self.sounds_tab:
+            return False
+        scroll = self.sounds_tab.scroll
+        _, tile_y = tile.to_window(*tile.pos)
+        _, scroll_y = scroll.to_window(*scroll.pos)
+        return tile_y + tile.height > scroll_y and tile_y < scroll_y + scroll.height
+
+    def update_modulation(self):
+        snapshot = self.engine.snapshot if self.engine else {}
+        values = dict(zip(snapshot.get("mod_sids", ()), zip(snapshot.get("mod_gains", ()), snapshot.get("mod_pans", ()))))
+        for tile in self.mod_tiles:
+            if tile.sid in values and self.tile_visible(tile):
+                tile.show_modulation(*values[tile.sid])
+
+    def update_meters(self):
+        # The engine meters every sound as part of mixing; this only copies
+        # the latest snapshot into whichever meters are on screen.
+        if not self.engine:
+            self.master_meter.opacity = 0
+            return
+        snapshot = self.engine.snapshot
+        self.master_meter.opacity = 1 if snapshot.get("playing") else 0
+        self.master_meter.value = meter_value(snapshot.get("master_rms", 0.0))
+        if self.tabs.get_current_tab() is not self.sounds_tab:
+            return
+        levels = dict(zip(snapshot.get("playing", ()), snapshot.get("rms", ())))
+        for tile in self.sound_tiles.values():
+            if self.tile_visible(tile):
+                tile.show_level(levels.get(tile.sid, 0.0))
+
     def stop_all_sounds(self):
-        for tile in self.sound_tiles:
+        for tile in self.sound_tiles.values():
             if tile.is_playing:
                 tile.stop()
+        self.record_change("Stop all")
 
     def setup_background_audio(self):
         if platform == "android":
             try:
-                from jnius import autoclass
-                PythonActivity = autoclass("org.kivy.android.PythonActivity")
-                activity = PythonActivity.mActivity
-                activity.getWindow().addFlags(128)  # FLAG_KEEP_SCREEN_ON
+                self.set_keep_screen_on(True)
                 self.start_foreground_service()
             except Exception as e:
                 print(f"Error setting up Android background audio: {e}")
 
+    def set_keep_screen_on(self, enabled):
+        if platform == "android":
+            from jnius import autoclass
+            from android.runnable import run_on_ui_thread
+            PythonActivity = autoclass("org.kivy.android.PythonActivity")
+
+            @run_on_ui_thread
+            def apply_flag():
+                window = PythonActivity.mActivity.getWindow()
+                if enabled:
+                    window.addFlags(128)  # FLAG_KEEP_SCREEN_ON
+                else:
+                    window.clearFlags(128)
+
+            apply_flag()
+
     def start_foreground_service(self):
         if platform == "android":
             try:
                 from jnius import autoclass
-                PythonService = autoclass("org.kivy.android.PythonService")
                 PythonActivity = autoclass("org.kivy.android.PythonActivity")
-                Context = PythonActivity.mActivity.getApplicationContext()
-                NotificationBuilder = autoclass("android.app.Notification$Builder")
-                NotificationChannel = autoclass("android.app.NotificationChannel")
-                NotificationManager = autoclass("android.app.NotificationManager")
-                channel_id = "sound_blanket_channel"
-                channel_name = "Sound Blanket"
-                channel = NotificationChannel(channel_id, channel_name, NotificationManager.IMPORTANCE_LOW)
-                notification_manager = Context.getSystemService(Context.NOTIFICATION_SERVICE)
-                notification_manager.createNotificationChannel(channel)
-                notification_builder = NotificationBuilder(Context, channel_id)
-                notification_builder.setContentTitle("Sound Blanket")
-                notification_builder.setContentText("Playing ambient sounds")
-                notification_builder.setOngoing(True)
-                notification_builder.setSmallIcon(Context.getApplicationInfo().icon)
-                notification = notification_builder.build()
-                service_args = ""
-                PythonService.start(Context, "Sound Blanket Service", service_args)
-                PythonService.mService.startForeground(101, notification)
+                service = autoclass("org.deekshith.ambientsounds.ServiceAudioengine")
+                service.start(PythonActivity.mActivity, "", "Sound Blanket", "Playing ambient sounds",
+                              str(ENGINE_PORT))
                 print("Foreground service started successfully")
             except Exception as e:
                 print(f"Error starting foreground service: {e}")
 
+    def stop_foreground_service(self):
+        if platform == "android":
+            try:
+                from jnius import autoclass
+                PythonActivity = autoclass("org.kivy.android.PythonActivity")
+                service = autoclass("org.deekshith.ambientsounds.ServiceAudioengine")
+                service.stop(PythonActivity.mActivity)
+            except Exception as e:
+                print(f"Error stopping foreground service: {e}")
+
+    # -------------------------------------------------------------------------
+    # Sleep timer. The engine holds the one real deadline and runs the fade,
+    # because its clock keeps going while the activity is paused; the Clock
+    # event below fires at the same moment only to tidy up the UI side.
+    # -------------------------------------------------------------------------
+    def show_sleep_dialog(self):
+        if not self.sleep_dialog:
+            items = [OneLineListItem(text=f"{minutes} minutes", on_release=lambda x, m=minutes: self.start_sleep_timer(m))
+                     for minutes in SLEEP_OPTIONS]
+            items.append(OneLineListItem(text="Off", on_release=lambda x: self.cancel_sleep_timer()))
+            self.sleep_dialog = MDDialog(title="Sleep timer", type="simple", items=items)
+        self.sleep_dialog.open()
+
+    def start_sleep_timer(self, minutes):
+        self.cancel_sleep_timer()
+        self.arm_sleep(max(0.0, minutes * 60 - SLEEP_FADE_SECONDS), SLEEP_FADE_SECONDS)
+
+    def arm_sleep(self, delay, fade):
+        if self.engine:
+            self.engine.sleep(delay, fade, SLEEP_FADE_CURVE)
+        self.sleep_event = get_scheduler().schedule(delay, self.on_sleep, fade)
+
+    def cancel_sleep_timer(self):
+        if self.sleep_dialog:
+            self.sleep_dialog.dismiss()
+        if self.sleep_event or self.sleep_fading:
+            if self.sleep_event:
+                self.sleep_event.cancel()
+                self.sleep_event = None
+            if self.sleep_fading:
+                self.sleep_fading = False
+                self.set_keep_screen_on(True)
+            if self.engine:
+                self.engine.sleep(-1, 0)
+
+    def on_sleep(self, fade=SLEEP_FADE_SECONDS):
+        self.sleep_event = None
+        self.set_keep_screen_on(False)
+        if self.engine:
+            # The engine fades, releases its voices and decoders and exits
+            # (the service process ends with it). Players stay until it says
+            # the fade is over, so a tap before then cancels the sleep.
+            self.sleep_fading = True
+            self.watch_sleep_fade()
+            return
+        for tile in self.sound_tiles.values():
+            if tile.sound and tile.is_playing and hasattr(tile.sound, "fade_out"):
+                tile.sound.fade_out(fade, SLEEP_FADE_CURVE)
+        get_scheduler().schedule(fade, self.release_after_sleep)
+
+    def watch_sleep_fade(self):
+        # Also run from on_resume: scheduler events do not fire while paused.
+        if not self.sleep_fading:
+            return
+        if self.engine and self.engine.snapshot.get("running", True):
+            get_scheduler().schedule(SLEEP_WATCH_INTERVAL, self.watch_sleep_fade)
+            return
+        self.sleep_fading = False
+        for tile in self.sound_tiles.values():
+            tile.drop_player()
+        if hasattr(self.engine, "close"):
+            self.engine.close()
+        elif self.engine:
+            self.engine.stop()
+        self.engine = None
+        self.engine_released = True
+        self.history.rebase()
+
+    def release_after_sleep(self):
+        for tile in self.sound_tiles.values():
+            tile.release_resources()
+            tile.drop_player()
+        self.history.rebase()
+        self.stop_foreground_service()
+
+    # -------------------------------------------------------------------------
+    # Render quality. The engine steps its own tier down under load, low
+    # battery or heat; this dialog shows where it is and why, and can pin it.
+    # -------------------------------------------------------------------------
+    def show_quality_dialog(self):
+        if not self.engine:
+            return
+        snapshot = self.engine.snapshot
+        tier = QUALITY_TIERS[min(snapshot.get("tier", 0), len(QUALITY_TIERS) - 1)]["name"]
+        reason = QUALITY_REASONS[min(snapshot.get("tier_reason", 0), len(QUALITY_REASONS) - 1)]
+        mode = snapshot.get("quality_mode", QUALITY_AUTO)
+        items = [OneLineListItem(text=("● " if mode == QUALITY_AUTO else "") + "Auto",
+                                 on_release=lambda x: self.set_quality(QUALITY_AUTO))]
+        for index, settings in enumerate(QUALITY_TIERS):
+            items.append(OneLineListItem(text=("● " if mode == index else "") + settings["name"].capitalize(),
+                                         on_release=lambda x, i=index: self.set_quality(i)))
+        self.quality_dialog = MDDialog(title=f"Quality: {tier} ({reason.replace('_', ' ')})",
+                                       type="simple", items=items)
+        self.quality_dialog.open()
+
+    def set_quality(self, tier):
+        if self.quality_dialog:
+            self.quality_dialog.dismiss()
+            self.quality_dialog = None
+        if self.engine:
+            self.engine.set_quality(tier)
+
+    # -------------------------------------------------------------------------
+    # Debug tools behind the menu button.
+    # -------------------------------------------------------------------------
+    def show_debug_menu(self):
+        hud = "Hide" if self.hud.opacity else "Show"
+        endpoint = "Stop" if self.metrics_server.running else "Start"
+        items = [OneLineListItem(text="Tap latency", on_release=lambda x: self.show_latency_dialog()),
+                 OneLineListItem(text=f"{hud} performance HUD", on_release=lambda x: self.toggle_hud()),
+                 OneLineListItem(text=f"{endpoint} metrics endpoint", on_release=lambda x: self.toggle_metrics_server()),
+                 OneLineListItem(text="Memory profiling", on_release=lambda x: self.show_memory_dialog())]
+        self.debug_dialog = MDDialog(title="Debug", type="simple", items=items)
+        self.debug_dialog.open()
+
+    def close_debug_dialog(self):
+        if self.debug_dialog:
+            self.debug_dialog.dismiss()
+            self.debug_dialog = None
+
+    # Performance metrics. One sample a second into a preallocated ring, kept
+    # running always; the HUD and the local endpoint only read the latest row.
+    def setup_metrics(self):
+        snapshot = lambda: self.engine.snapshot if self.engine else {}
+        stores = (self.store, self.timeline_store, self.layer_store)
+        gauges = (
+            ("fps", Clock.get_fps),
+            ("players", lambda: sum(1 for tile in self.sound_tiles.values() if tile.is_playing)),
+            ("decoders", lambda: snapshot().get("decoding", sum(1 for tile in self.sound_tiles.values() if tile.is_playing))),
+            ("rss_bytes", resident_bytes),
+            ("sound_bytes", lambda: sum(snapshot().get("voice_bytes", ()))),
+            ("render_load", lambda: snapshot().get("render_load", 0.0)),
+        )
+        counters = (
+            ("bridge_calls", lambda: AndroidAudio.bridge_calls),
+            ("store_writes", lambda: sum(store.writes for store in stores)),
+            ("store_bytes", lambda: sum(store.bytes_written for store in stores)),
+            ("underruns", lambda: snapshot().get("source_underruns", 0) + snapshot().get("output_underruns", 0)),
+        )
+        self.metrics = MetricsSampler(gauges, counters)
+        self.metrics_server = MetricsServer(self.metrics)
+        Clock.schedule_interval(lambda dt: self.sample_metrics(), METRICS_INTERVAL)
+
+    def sample_metrics(self):
+        self.metrics.sample()
+        if not (self.hud.opacity or self.metrics_server.running):
+            return
+        snapshot = self.engine.snapshot if self.engine else {}
+        names = {tile.sid: tile.sound_name for tile in self.sound_tiles.values()}
+        self.metrics.details["sound_bytes_by_sound"] = {
+            names.get(sid, str(sid)): size for sid, size in zip(snapshot.get("voice_sids", ()), snapshot.get("voice_bytes", ()))}
+        if self.hud.opacity:
+            self.hud.text = self.format_hud(self.metrics.latest())
+
+    def format_hud(self, m):
+        mb = 1024.0 * 1024.0
+        heaviest = sorted(m.get("sound_bytes_by_sound", {}).items(), key=lambda item: -item[1])[:3]
+        lines = [
+            f"FPS {m['fps']:.0f}   render load {m['render_load'] * 100:.0f}%",
+            f"players {m['players']:.0f}   decoders {m['decoders']:.0f}",
+            f"RSS {m['rss_bytes'] / mb:.1f} MB   sounds {m['sound_bytes'] / mb:.1f} MB",
+            *(f"  {name} {size / mb:.1f} MB" for name, size in heaviest),
+            f"JNI/bridge {m.get('bridge_calls_per_s', 0):.1f}/s   underruns {m['underruns']:.0f}",
+            f"store {m['store_writes']:.0f} writes, {m['store_bytes'] / 1024:.0f} KB",
+        ]
+        return "\n".join(lines)
+
+    def toggle_hud(self):
+        self.close_debug_dialog()
+        self.hud.opacity = 0 if self.hud.opacity else 1
+        if self.hud.opacity:
+            self.sample_metrics()
+
+    def toggle_metrics_server(self):
+        self.close_debug_dialog()
+        try:
+            if self.metrics_server.running:
+                self.metrics_server.stop()
+            else:
+                self.metrics_server.start()
+                print(f"Metrics at http://127.0.0.1:{self.metrics_server.port}/metrics")
+        except Exception as e:
+            print(f"Error toggling metrics endpoint: {e}")
+
+    # Memory accounting by subsystem. tracemalloc slows every allocation
+    # down, so it only runs between Start and Stop here.
+    def show_memory_dialog(self):
+        self.close_debug_dialog()
+        if self.memory_profiler is None:
+            snapshot = lambda: self.engine.snapshot if self.engine else {}
+            self.memory_profiler = MemoryProfiler({
+                "rss": resident_bytes,
+                "engine_voices": lambda: sum(snapshot().get("voice_bytes", ())),
+                "shared_buffers": shared_bytes,
+                "store_files": lambda: sum(os.path.getsize(store.filename) for store in (self.store, self.timeline_store)
+                                           if os.path.exists(store.filename)),
+            })
+        profiler = self.memory_profiler
+        if profiler.running:
+            buttons = [MDFlatButton(text="SNAPSHOT", on_release=lambda x: self.memory_snapshot()),
+                       MDFlatButton(text="EXPORT", on_release=lambda x: self.export_memory()),
+                       MDFlatButton(text="STOP", on_release=lambda x: (profiler.stop(), self.close_debug_dialog()))]
+        else:
+            buttons = [MDFlatButton(text="START", on_release=lambda x: (profiler.start(), self.show_memory_dialog()))]
+        buttons.append(MDFlatButton(text="CLOSE", on_release=lambda x: self.close_debug_dialog()))
+        text = format_report(profiler.report()) if profiler.running else "Tracks allocations by subsystem until stopped."
+        self.debug_dialog = MDDialog(title="Memory", text=text, buttons=buttons)
+        self.debug_dialog.open()
+
+    def memory_snapshot(self):
+        try:
+            self.memory_profiler.snapshot()
+            self.debug_dialog.text = format_report(self.memory_profiler.report())
+        except Exception as e:
+            print(f"Error taking memory snapshot: {e}")
+
+    def export_memory(self):
+        path = os.path.join(self.data_dir, time.strftime("memory-%Y%m%d-%H%M%S.json"))
+        try:
+            self.memory_profiler.snapshot()
+            self.memory_profiler.export(path)
+            self.debug_dialog.text = f"Memory report written to {path}"
+        except Exception as e:
+            print(f"Error exporting memory report: {e}")
+
+    # Tap-to-sound latency. A tap opens a trace that the tile marks as it
+    # loads and starts the player; with the engine, a short poll of its
+    # snapshot closes the trace at the first block the sound went out in.
+    def trace_tap(self, tile):
+        self.tracer.begin(tile.sid, tile.sound_name)
+        if self.engine and self.trace_event is None:
+            self.trace_event = Clock.schedule_interval(lambda dt: self.poll_traces(), SNAPSHOT_POLL_INTERVAL)
+
+    def poll_traces(self):
+        snapshot = self.engine.snapshot if self.engine else {}
+        self.tracer.poll(dict(zip(snapshot.get("playing", ()), snapshot.get("first_blocks", ()))))
+        if not self.tracer.waiting() and self.trace_event is not None:
+            self.trace_event.cancel()
+            self.trace_event = None
+
+    def show_latency_dialog(self):
+        self.close_debug_dialog()
+        self.debug_dialog = MDDialog(
+            title="Tap latency",
+            text=format_stats(self.tracer.stats()),
+            buttons=[
+                MDFlatButton(text="EXPORT", on_release=lambda x: self.export_latency()),
+                MDFlatButton(text="CLEAR", on_release=lambda x: (self.tracer.clear(), self.close_debug_dialog())),
+                MDFlatButton(text="CLOSE", on_release=lambda x: self.close_debug_dialog()),
+            ],
+        )
+        self.debug_dialog.open()
+
+    def export_latency(self):
+        path = os.path.join(self.data_dir, time.strftime("latency-%Y%m%d-%H%M%S.jsonl"))
+        try:
+            count = self.tracer.export(path)
+            self.debug_dialog.text = f"{count} traces written to {path}"
+        except Exception as e:
+            print(f"Error exporting latency log: {e}")
+
     def on_pause(self):
-        mix_data = {"sounds": [tile.get_state() for tile in self.sound_tiles]}
-        self.store.put("last_session", **mix_data)
+        # The Clock stops while paused, so a running timeline's later steps
+        # get their sounds loaded now.
+        if self.timeline_player:
+            self.timeline_player.load_all()
+        # Written only when the mix changed since the last pause.
+        if self.mixer.version != self.session_version:
+            self.lifecycle.save_session({"sounds": self.mixer.states()})
+            self.session_version = self.mixer.version
         return True
 
     def on_resume(self):
-        for tile in self.sound_tiles:
-            if tile.is_playing:
-                tile.play()
+        # Fire timeline steps and timers that came due while paused.
+        get_scheduler().resync()
+        self.watch_sleep_fade()
+        if self.engine:
+            self.lifecycle.sync_from_snapshot(
+                self.engine.snapshot, {tile.sid: tile.sound for tile in self.sound_tiles.values() if tile.sound})
+        for tile in self.sound_tiles.values():
+            tile.sync_backend()
 
     def on_stop(self):
-        for tile in self.sound_tiles:
+        self.cancel_warmup()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if platform == "android" and self.engine:
+            # With something to play, the service plays on without the
+            # activity, timeline and sleep timer included; only this side of
+            # the channel goes away. Otherwise it goes too.
+            self.on_pause()
+            playing = any(tile.is_playing for tile in self.sound_tiles.values())
+            timeline = self.timeline_player is not None and self.timeline_player.running
+            if playing or timeline or self.sleep_event or self.sleep_fading:
+                self.engine.close()
+            else:
+                self.engine.stop()
+                self.stop_foreground_service()
+            return
+        self.stop_timeline()
+        for tile in self.sound_tiles.values():
             tile.release_resources()
+        if self.engine:
+            self.engine.stop()
+        if self.engine_process:
+            try:
+                self.engine_process.wait(timeout=2)
+            except Exception:
+                self.engine_process.terminate()
 
 if __name__ == "__main__":
     SoundBlanketApp().run()
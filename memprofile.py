@@ -0,0 +1,154 @@
+import ast, gc, json, os, time, tracemalloc
+
+TRACE_FRAMES = 12
+TOP_LINES = 20
+
+# Library files are matched by path fragment, app modules by file name. The
+# innermost frame that matches decides the subsystem of an allocation.
+SUBSYSTEMS = (
+    ("widgets", ("kivymd", "kivy/uix", "kivy/graphics", "kivy/core/text", "kivy/lang", "kivy/properties")),
+    ("store", ("kivy/storage", "json/", "lifecycle.py", "metrics.py", "mixfile.py")),
+    ("audio", ("audio_stream.py", "audio_output.py", "engine.py", "resampler.py", "events.py",
+               "filters.py", "modulation.py", "warmup.py", "ipc.py", "numpy")),
+)
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def subsystem_of(filename):
+    path = filename.replace("\\", "/")
+    for name, patterns in SUBSYSTEMS:
+        if any(pattern in path for pattern in patterns):
+            return name
+    return None
+
+def class_ranges(path):
+    # [(first line, last line, class name)] for the classes in an app module.
+    try:
+        with open(path) as f:
+            tree = ast.parse(f.read())
+    except Exception:
+        return []
+    return [(node.lineno, node.end_lineno, node.name) for node in ast.walk(tree) if isinstance(node, ast.ClassDef)]
+
+def widget_counts():
+    # Live instances per widget class; walks the heap, so on demand only.
+    try:
+        from kivy.uix.widget import Widget
+    except Exception:
+        return {}
+    counts = {}
+    for obj in gc.get_objects():
+        if isinstance(obj, Widget):
+            name = type(obj).__name__
+            counts[name] = counts.get(name, 0) + 1
+    return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+# -----------------------------------------------------------------------------
+# MemoryProfiler – Opt-in tracemalloc accounting. Each allocation is tagged
+# with a subsystem (innermost matching frame) and the app class it was made
+# from (innermost frame inside an app module, e.g. SoundTile), so widget,
+# audio and store memory can be told apart. Memory Python never sees (decoder
+# rings in the service process, mapped event pools, native players) comes
+# from the backend callables as reported sizes.
+# -----------------------------------------------------------------------------
+class MemoryProfiler:
+    def __init__(self, backends=None, frames=TRACE_FRAMES):
+        self.backends = backends or {}
+        self.frames = frames
+        self.baseline = None
+        self.previous = None
+        self.latest = None
+        self._classes = {}
+
+    @property
+    def running(self):
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self.baseline = self.previous = self.latest = self.take()
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def _owner(self, filename, lineno):
+        if not filename.startswith(APP_DIR):
+            return None
+        if filename not in self._classes:
+            self._classes[filename] = class_ranges(filename)
+        for first, last, name in self._classes[filename]:
+            if first <= lineno <= last:
+                return name
+        return os.path.basename(filename)
+
+    def take(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        subsystems, owners = {}, {}
+        for stat in snapshot.statistics("traceback"):
+            subsystem = owner = None
+            for frame in reversed(stat.traceback):
+                if subsystem is None:
+                    subsystem = subsystem_of(frame.filename)
+                if owner is None:
+                    owner = self._owner(frame.filename, frame.lineno)
+                if subsystem and owner:
+                    break
+            subsystem = subsystem or "other"
+            subsystems[subsystem] = subsystems.get(subsystem, 0) + stat.size
+            key = f"{subsystem}:{owner or '-'}"
+            owners[key] = owners.get(key, 0) + stat.size
+        backend = {}
+        for name, source in self.backends.items():
+            try:
+                backend[name] = int(source())
+            except Exception as e:
+                print(f"Error reading {name} size: {e}")
+        lines = [{"line": str(stat.traceback[-1]), "bytes": stat.size, "count": stat.count}
+                 for stat in snapshot.statistics("lineno")[:TOP_LINES]]
+        return {"time": time.time(), "traced": tracemalloc.get_traced_memory()[0],
+                "subsystems": subsystems, "owners": owners, "backend": backend, "top_lines": lines}
+
+    def snapshot(self):
+        self.previous, self.latest = self.latest, self.take()
+        return self.latest
+
+    @staticmethod
+    def diff(old, new, key="owners"):
+        # Growth per tag from old to new, largest change first.
+        names = set(old[key]) | set(new[key])
+        changes = {name: new[key].get(name, 0) - old[key].get(name, 0) for name in names}
+        return dict(sorted(((n, c) for n, c in changes.items() if c), key=lambda item: -abs(item[1])))
+
+    def report(self):
+        if self.latest is None:
+            return {}
+        return {
+            "latest": self.latest,
+            "since_previous": self.diff(self.previous, self.latest),
+            "since_start": self.diff(self.baseline, self.latest),
+            "widgets": widget_counts(),
+        }
+
+    def export(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=1)
+        return path
+
+def format_report(report, limit=8):
+    if not report:
+        return "Profiling is off."
+    kb = 1024.0
+    latest = report["latest"]
+    lines = [f"traced {latest['traced'] / kb:.0f} KB"]
+    lines += [f"  {name}: {size / kb:.0f} KB" for name, size in
+              sorted(latest["subsystems"].items(), key=lambda item: -item[1])]
+    lines += [f"backend {name}: {size / kb:.0f} KB" for name, size in latest["backend"].items()]
+    changes = list(report["since_previous"].items())[:limit]
+    if changes:
+        lines.append("since last snapshot:")
+        lines += [f"  {name}: {change / kb:+.0f} KB" for name, change in changes]
+    return "\n".join(lines)
@@ -0,0 +1,152 @@
+import json, os, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from kivy.storage.jsonstore import JsonStore
+
+METRICS_PORT = 38918
+SAMPLE_INTERVAL = 1.0
+HISTORY = 120             # samples kept, one per SAMPLE_INTERVAL
+
+def resident_bytes():
+    # Current RSS of this process; /proc is there on Linux and Android.
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss
+        except Exception:
+            return 0
+
+# -----------------------------------------------------------------------------
+# MeteredJsonStore – JsonStore that counts its file writes and their size.
+# Each write goes to a temporary file that is renamed over the old one, so a
+# crash or a full disk mid-write leaves the previous file as it was.
+# -----------------------------------------------------------------------------
+class MeteredJsonStore(JsonStore):
+    def __init__(self, filename, **kwargs):
+        self.writes = 0
+        self.bytes_written = 0
+        super().__init__(filename, **kwargs)
+
+    def store_sync(self):
+        if not self._is_changed:
+            return
+        temp = self.filename + ".tmp"
+        try:
+            with open(temp, "w") as fd:
+                json.dump(self._data, fd, indent=self.indent, sort_keys=self.sort_keys)
+                fd.flush()
+                os.fsync(fd.fileno())
+            os.replace(temp, self.filename)
+        except Exception:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        self._is_changed = False
+        self.writes += 1
+        self.bytes_written += os.path.getsize(self.filename)
+
+# -----------------------------------------------------------------------------
+# MetricsSampler – Samples a fixed set of sources into a preallocated ring.
+# Gauges are read as they are; counters are cumulative totals reported as a
+# per-second rate over the last interval. A sample only writes one row in
+# place, so leaving it running costs a few attribute reads per second.
+# -----------------------------------------------------------------------------
+class MetricsSampler:
+    def __init__(self, gauges, counters, history=HISTORY):
+        # gauges / counters: sequences of (name, callable returning a number).
+        self.gauges = tuple(gauges)
+        self.counters = tuple(counters)
+        self.names = tuple(name for name, _ in self.gauges + self.counters)
+        self._sources = tuple(source for _, source in self.gauges + self.counters)
+        self.values = np.zeros((history, len(self.names)))
+        self.times = np.zeros(history)
+        self.count = 0
+        self.details = {}
+
+    def sample(self, now=None):
+        row = self.count % len(self.times)
+        self.times[row] = now if now is not None else time.perf_counter()
+        values = self.values[row]
+        for i, source in enumerate(self._sources):
+            try:
+                values[i] = source()
+            except Exception:
+                values[i] = np.nan
+        self.count += 1
+
+    def latest(self):
+        if not self.count:
+            return {}
+        row = (self.count - 1) % len(self.times)
+        result = dict(zip(self.names, self.values[row].tolist()))
+        if self.count > 1:
+            prev = (self.count - 2) % len(self.times)
+            elapsed = max(self.times[row] - self.times[prev], 1e-6)
+            for name, _ in self.counters:
+                i = self.names.index(name)
+                result[name + "_per_s"] = (self.values[row, i] - self.values[prev, i]) / elapsed
+        result.update(self.details)
+        return result
+
+def format_prometheus(metrics, prefix="soundblanket_"):
+    lines = []
+    for name, value in metrics.items():
+        if isinstance(value, (int, float)):
+            lines.append(f"{prefix}{name} {value}")
+        elif isinstance(value, dict):
+            for label, item in value.items():
+                lines.append(f'{prefix}{name}{{sound="{label}"}} {item}')
+    return "\n".join(lines) + "\n"
+
+# -----------------------------------------------------------------------------
+# MetricsServer – Local-only HTTP endpoint serving the sampler's latest row as
+# Prometheus text (/metrics) or JSON (/metrics.json). Requests never sample;
+# they only format what the UI-side sampler already collected.
+# -----------------------------------------------------------------------------
+class MetricsServer:
+    def __init__(self, sampler, port=METRICS_PORT, host="127.0.0.1"):
+        self.sampler = sampler
+        self.port = port
+        self.host = host
+        self._server = None
+
+    @property
+    def running(self):
+        return self._server is not None
+
+    def start(self):
+        if self._server is not None:
+            return
+        sampler = self.sampler
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                metrics = sampler.latest()
+                if self.path.startswith("/metrics.json"):
+                    body, kind = json.dumps(metrics).encode("utf-8"), "application/json"
+                elif self.path.startswith("/metrics"):
+                    body, kind = format_prometheus(metrics).encode("utf-8"), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,203 @@
+import numpy as np
+from filters import NEUTRAL
+from modulation import MOD_TARGETS, MOD_SHAPES
+
+DEFAULT_GAIN = 0.7
+DEFAULT_PLACEMENT = (0.0, 1.0)
+DEFAULT_MOD = ("off", 0.05, 0.5)
+LEGACY_DRIFT_DEPTH = 0.6
+
+# -----------------------------------------------------------------------------
+# MixerState – The mix as a handful of arrays indexed by sound id: gain,
+# playing, event density, filter, placement, modulation, speed and pitch.
+# Tiles write their own changes with set() and only display what they are
+# told; whole-mix operations (load a mix, undo) go through snapshot()/
+# restore(), which are array copies plus a diff, and listeners hear only
+# about the sounds that actually changed. version moves on every change, so
+# "did anything change since the last save" is one comparison.
+# -----------------------------------------------------------------------------
+class MixerState:
+    def __init__(self, capacity=16):
+        self.names = []
+        self.sids = {}
+        self.arrays = self._defaults(capacity)
+        self.version = 0
+        self.dropped = set()
+        self._listeners = []
+
+    @staticmethod
+    def _defaults(count):
+        return {
+            "gain": np.full(count, DEFAULT_GAIN, dtype=float),
+            "playing": np.zeros(count, dtype=bool),
+            "density": np.zeros(count, dtype=float),
+            "filter": np.tile(np.asarray(NEUTRAL, dtype=float), (count, 1)),
+            "placement": np.tile(np.asarray(DEFAULT_PLACEMENT, dtype=float), (count, 1)),
+            "mod_shape": np.zeros((count, len(MOD_TARGETS)), dtype=np.int8),
+            "mod_params": np.tile(np.asarray(DEFAULT_MOD[1:], dtype=float), (count, len(MOD_TARGETS), 1)),
+            "speed": np.ones(count, dtype=float),
+            "pitch": np.zeros(count, dtype=float),
+        }
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, field):
+        return self.arrays[field][:len(self.names)]
+
+    def add_sound(self, name):
+        # The sid of a removed sound is reused before the arrays grow, so
+        # adding and removing layers never runs out of sounds.
+        if self.dropped:
+            sid = min(self.dropped)
+            self.dropped.discard(sid)
+            for field, row in self._defaults(1).items():
+                self.arrays[field][sid] = row[0]
+            self.names[sid] = name
+            self.sids[name.lower()] = sid
+            self.version += 1
+            return sid
+        sid = len(self.names)
+        if sid == len(self.arrays["gain"]):
+            extra = self._defaults(max(sid, 1))
+            self.arrays = {field: np.concatenate((array, extra[field])) for field, array in self.arrays.items()}
+        self.names.append(name)
+        self.sids[name.lower()] = sid
+        self.version += 1
+        return sid
+
+    def sid_of(self, name):
+        return self.sids.get(name.lower())
+
+    def drop(self, sid):
+        # A removed sound (a deleted layer) stops and can no longer be found
+        # by name; its row stays so that sound ids do not move, until
+        # add_sound() hands the sid to a new sound.
+        self.sids.pop(self.names[sid].lower(), None)
+        self.dropped.add(sid)
+        self.set(sid, playing=False)
+
+    def live(self, snapshot):
+        # snapshot with removed sounds kept stopped (older undo steps and
+        # snapshots may still have them playing).
+        for sid in self.dropped:
+            if sid < len(snapshot["playing"]):
+                snapshot["playing"][sid] = False
+        return snapshot
+
+    def bind(self, callback):
+        # callback(sids) after restore() with the sound ids that changed.
+        self._listeners.append(callback)
+
+    # -- single sounds -------------------------------------------------------
+    def set(self, sid, **fields):
+        # Fields as in state(); "mod" may carry any subset of the targets.
+        changed = False
+        mods = fields.pop("mod", None) or {}
+        if "volume" in fields:
+            fields["gain"] = fields.pop("volume")
+        if "is_playing" in fields:
+            fields["playing"] = fields.pop("is_playing")
+        if "pan" in fields:
+            fields["placement"] = fields.pop("pan")
+        for field, value in fields.items():
+            array = self.arrays[field]
+            value = np.asarray(value, dtype=array.dtype)
+            if not np.array_equal(array[sid], value):
+                array[sid] = value
+                changed = True
+        for target, mod in mods.items():
+            t = MOD_TARGETS.index(target)
+            shape = MOD_SHAPES.index(mod[0])
+            params = np.asarray(mod[1:], dtype=float)
+            if self.arrays["mod_shape"][sid, t] != shape or not np.array_equal(self.arrays["mod_params"][sid, t], params):
+                self.arrays["mod_shape"][sid, t] = shape
+                self.arrays["mod_params"][sid, t] = params
+                changed = True
+        if changed:
+            self.version += 1
+        return changed
+
+    def state(self, sid, arrays=None):
+        # One sound in the saved-mix dict format.
+        a = arrays or self.arrays
+        return {
+            "sound_name": self.names[sid],
+            "is_playing": bool(a["playing"][sid]),
+            "volume": float(a["gain"][sid]),
+            "density": float(a["density"][sid]),
+            "filter": a["filter"][sid].tolist(),
+            "pan": a["placement"][sid].tolist(),
+            "mod": {target: [MOD_SHAPES[a["mod_shape"][sid, t]]] + a["mod_params"][sid, t].tolist()
+                    for t, target in enumerate(MOD_TARGETS)},
+            "speed": float(a["speed"][sid]),
+            "pitch": float(a["pitch"][sid]),
+        }
+
+    def states(self, arrays=None):
+        # Removed sounds are left out, so saved mixes never bring them back.
+        return [self.state(sid, arrays) for sid in range(len(self.names)) if sid not in self.dropped]
+
+    # -- whole mix -----------------------------------------------------------
+    def snapshot(self):
+        n = len(self.names)
+        return {field: array[:n].copy() for field, array in self.arrays.items()}
+
+    def diff(self, snapshot):
+        # Sound ids whose state differs between snapshot and the live arrays.
+        n = min(len(self.names), len(snapshot["gain"]))
+        changed = np.zeros(n, dtype=bool)
+        for field, array in snapshot.items():
+            changed |= (array[:n] != self.arrays[field][:n]).reshape(n, -1).any(axis=1)
+        return np.flatnonzero(changed)
+
+    def restore(self, snapshot):
+        changed = self.diff(snapshot)
+        if len(changed):
+            for field, array in snapshot.items():
+                self.arrays[field][changed] = array[changed]
+            self.version += 1
+            for callback in self._listeners:
+                callback(changed)
+        return changed
+
+    def from_saved(self, saved_sounds):
+        # Snapshot of the current mix with a saved mix applied on top: listed
+        # sounds take the saved values, every other sound stops.
+        snapshot = self.snapshot()
+        snapshot["playing"][:] = False
+        for saved in saved_sounds:
+            sid = self.sid_of(saved.get("sound_name", ""))
+            if sid is None:
+                continue
+            snapshot["playing"][sid] = bool(saved.get("is_playing", False))
+            if "volume" in saved:
+                snapshot["gain"][sid] = saved["volume"]
+            if "density" in saved:
+                snapshot["density"][sid] = saved["density"]
+            if "filter" in saved:
+                snapshot["filter"][sid] = saved["filter"]
+            if "speed" in saved:
+                snapshot["speed"][sid] = saved["speed"]
+            if "pitch" in saved:
+                snapshot["pitch"][sid] = saved["pitch"]
+            if "pan" in saved:
+                pan = list(saved["pan"])
+                if len(pan) > 2 and pan[2] > 0:
+                    # Older mixes stored a pan drift rate; it is pan modulation now.
+                    t = MOD_TARGETS.index("pan")
+                    snapshot["mod_shape"][sid, t] = MOD_SHAPES.index("sine")
+                    snapshot["mod_params"][sid, t] = (pan[2], LEGACY_DRIFT_DEPTH)
+                snapshot["placement"][sid] = pan[:2]
+            for target, mod in saved.get("mod", {}).items():
+                if target in MOD_TARGETS:
+                    t = MOD_TARGETS.index(target)
+                    snapshot["mod_shape"][sid, t] = MOD_SHAPES.index(mod[0])
+                    snapshot["mod_params"][sid, t] = mod[1:]
+        return snapshot
+
+    def entries(self, snapshot=None):
+        # Engine LOAD_MIX entries: the playing sounds; the engine stops the rest.
+        a = snapshot if snapshot is not None else self.arrays
+        playing = np.flatnonzero(a["playing"][:len(self.names)])
+        return list(zip(playing.tolist(), a["gain"][playing].tolist(), [True] * len(playing)))
@@ -0,0 +1,152 @@
+import glob, json, os
+
+FORMAT = "soundblanket-mixes"
+VERSION = 1
+POLICIES = ("skip", "replace", "rename")
+RESERVED = ("last_session",)
+NUMERIC_FIELDS = ("volume", "density", "speed", "pitch")
+EXPORT_NAME = "mixes-%Y%m%d-%H%M%S.jsonl"
+
+# A collection file is JSON lines: a header, then one {"name", "sounds"} record
+# per mix, so both sides only ever hold one mix. A copied mixes.json (a single
+# {name: {"sounds": ...}} object) is read as well.
+
+def export_mixes(store, path, names=None):
+    # Streams the mixes to path through a temporary file; returns the count.
+    names = [name for name in (names if names is not None else store.keys()) if name not in RESERVED]
+    temp = path + ".part"
+    count = 0
+    with open(temp, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"format": FORMAT, "version": VERSION}) + "\n")
+        for name in names:
+            if store.exists(name):
+                f.write(json.dumps({"name": name, "sounds": store.get(name).get("sounds", [])}) + "\n")
+                count += 1
+    os.replace(temp, path)
+    return count
+
+def latest_export(directory):
+    # Newest collection written by an export there, or None; the timestamp
+    # in EXPORT_NAME sorts the same as the names do.
+    paths = sorted(glob.glob(os.path.join(directory, "mixes-*.jsonl")))
+    return paths[-1] if paths else None
+
+def read_mixes(path):
+    # Yields (line number, name, sounds) or (line number, None, error).
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, None, f"not JSON ({e})"
+                continue
+            if not isinstance(record, dict):
+                yield number, None, "not an object"
+            elif record.get("format") == FORMAT:
+                if record.get("version", 0) > VERSION:
+                    yield number, None, f"file version {record['version']} is newer than {VERSION}"
+                    return
+            elif "name" in record:
+                yield number, record["name"], record.get("sounds")
+            else:
+                for name, value in record.items():
+                    if name in RESERVED:
+                        continue
+                    yield number, name, value.get("sounds") if isinstance(value, dict) else None
+
+def clean_sounds(sounds, known):
+    # (sounds fit for the store, unknown sound names) or raises ValueError.
+    if not isinstance(sounds, list):
+        raise ValueError("sounds is not a list")
+    kept, unknown = [], []
+    for saved in sounds:
+        if not isinstance(saved, dict) or not isinstance(saved.get("sound_name"), str):
+            raise ValueError("sound without a name")
+        for field in NUMERIC_FIELDS:
+            if field in saved and not isinstance(saved[field], (int, float)):
+                raise ValueError(f"{field} of {saved['sound_name']} is not a number")
+        if known(saved["sound_name"]):
+            kept.append(saved)
+        else:
+            unknown.append(saved["sound_name"])
+    return kept, unknown
+
+def free_name(name, taken):
+    number = 2
+    while taken(f"{name} ({number})"):
+        number += 1
+    return f"{name} ({number})"
+
+# -----------------------------------------------------------------------------
+# import_mixes – Reads a collection file into the store as one transaction:
+# mixes are staged with store_put (no disk write each), written by a single
+# store_sync at the end, and any error rolls the store back to how it was.
+# The store must write that file atomically (MeteredJsonStore renames a
+# temporary file over it), or a failed write would lose every saved mix.
+# Names already in the store are skipped, replaced or renamed per policy;
+# sound names are checked with known(name) against the library, and sounds
+# not in it are dropped from their mix.
+#
+# Memory: the file is parsed one line at a time, but a JsonStore holds its
+# whole collection in memory, so the peak is the size of the store after the
+# import plus the previous values of the mixes replaced, as Python objects.
+# -----------------------------------------------------------------------------
+def import_mixes(store, path, known, policy="skip"):
+    if policy not in POLICIES:
+        raise ValueError(f"unknown policy {policy}")
+    report = {"added": [], "replaced": [], "renamed": {}, "skipped": [], "invalid": [], "unknown_sounds": set()}
+    undo = {}                 # name -> previous value, None if it was new
+    seen = set()
+    try:
+        for number, name, sounds in read_mixes(path):
+            if name is None:
+                report["invalid"].append((number, sounds))
+                continue
+            try:
+                if not isinstance(name, str) or not name.strip() or name in RESERVED:
+                    raise ValueError(f"bad mix name {name!r}")
+                kept, unknown = clean_sounds(sounds, known)
+                if unknown and not kept:
+                    raise ValueError(f"none of the sounds of {name} are in the library")
+            except ValueError as e:
+                report["invalid"].append((number, str(e)))
+                continue
+            report["unknown_sounds"].update(unknown)
+            target = name
+            if store.exists(name) or name in seen:
+                if policy == "skip":
+                    report["skipped"].append(name)
+                    continue
+                if policy == "rename":
+                    target = free_name(name, store.exists)
+                    report["renamed"][name] = target
+                else:
+                    report["replaced"].append(name)
+            else:
+                report["added"].append(name)
+            if target not in undo:
+                undo[target] = store.get(target) if store.exists(target) else None
+            store.store_put(target, {"sounds": kept})
+            seen.add(target)
+        if undo:
+            store.store_sync()
+    except Exception:
+        for name, value in undo.items():
+            if value is None:
+                store.store_delete(name)
+            else:
+                store.store_put(name, value)
+        raise
+    return report
+
+def format_report(report):
+    lines = [f"{len(report['added'])} added, {len(report['replaced'])} replaced, "
+             f"{len(report['renamed'])} renamed, {len(report['skipped'])} skipped"]
+    if report["invalid"]:
+        lines.append(f"{len(report['invalid'])} invalid, first on line {report['invalid'][0][0]}: {report['invalid'][0][1]}")
+    if report["unknown_sounds"]:
+        lines.append("not in the library: " + ", ".join(sorted(report["unknown_sounds"])[:8]))
+    return "\n".join(lines)
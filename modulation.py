@@ -0,0 +1,71 @@
+import numpy as np
+
+MOD_TARGETS = ("gain", "cutoff", "pan")
+MOD_SHAPES = ("off", "sine", "random")
+CUTOFF_OCTAVES = 2.0      # full-depth low-pass sweep either way
+REVERSION = 0.5           # how strongly a random walk is pulled back to 0
+
+# -----------------------------------------------------------------------------
+# ModulationBank – Slow per-voice LFOs evaluated once per block for all voices
+# at once. Each voice has one source per target in MOD_TARGETS: a sine at rate
+# Hz, or a mean-reverting random walk whose rate sets how fast it wanders.
+# Values are in [-1, 1]; depth (0..1) says how much of that reaches the target.
+# -----------------------------------------------------------------------------
+class ModulationBank:
+    def __init__(self, max_voices, block_time, seed=None):
+        shape = (max_voices, len(MOD_TARGETS))
+        self.block_time = block_time
+        self.shape = np.zeros(shape, dtype=np.int8)
+        self.rate = np.zeros(shape)
+        self.depth = np.zeros(shape, dtype=np.float32)
+        self.phase = np.zeros(shape)
+        self.walk = np.zeros(shape)
+        self.values = np.zeros(shape, dtype=np.float32)
+        self.active = np.zeros(max_voices, dtype=bool)
+        self.rng = np.random.default_rng(seed)
+
+    def set(self, sid, target, shape, rate, depth, now):
+        t = MOD_TARGETS.index(target) if isinstance(target, str) else int(target)
+        s = MOD_SHAPES.index(shape) if isinstance(shape, str) else int(shape)
+        if s == 1 and (self.shape[sid, t] != 1 or self.rate[sid, t] != rate):
+            # Start the sine at zero crossing so the target doesn't jump.
+            self.phase[sid, t] = -2.0 * np.pi * rate * now
+        if s != 2:
+            self.walk[sid, t] = 0.0
+        self.shape[sid, t] = s
+        self.rate[sid, t] = rate
+        self.depth[sid, t] = depth if s else 0.0
+        self.values[sid, t] = 0.0
+        self.active[sid] = bool(self.shape[sid].any())
+
+    def clear(self, sid):
+        self.shape[sid] = 0
+        self.depth[sid] = 0.0
+        self.values[sid] = 0.0
+        self.active[sid] = False
+
+    def evaluate(self, index, now):
+        # Advances every source of the given voices to time now.
+        shape = self.shape[index]
+        rate = self.rate[index]
+        sine = np.sin(2.0 * np.pi * rate * now + self.phase[index])
+        walk = self.walk[index]
+        step = rate * self.block_time
+        # Variance 2 * rate per second: going from one end of the range to
+        # the other takes about 1 / rate seconds, as a sine of that rate would.
+        walk += np.sqrt(2.0 * step) * self.rng.standard_normal(walk.shape) - REVERSION * step * walk
+        np.clip(walk, -1.0, 1.0, out=walk)
+        self.walk[index] = np.where(shape == 2, walk, 0.0)
+        values = np.where(shape == 1, sine, np.where(shape == 2, walk, 0.0)).astype(np.float32)
+        self.values[index] = values
+
+    def gain_factors(self, index):
+        # Gain modulation only ever dips below the set volume, down to
+        # 1 - depth at the bottom of the cycle.
+        return 1.0 - self.depth[index, 0] * (1.0 - self.values[index, 0]) / 2.0
+
+    def cutoff_octaves(self, index):
+        return self.depth[index, 1] * self.values[index, 1] * CUTOFF_OCTAVES
+
+    def pan_offsets(self, index):
+        return self.depth[index, 2] * self.values[index, 2]
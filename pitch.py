@@ -0,0 +1,67 @@
+from functools import lru_cache
+import numpy as np
+
+GRAIN_SECONDS = 0.05
+SPEED_RANGE = (0.5, 1.5)
+PITCH_RANGE = (-12.0, 12.0)   # semitones
+SPEED_STEP = 0.01
+PITCH_STEP = 0.05             # semitones
+
+def quantize(speed, semitones):
+    # Steps small enough to be inaudible, coarse enough that slider drags
+    # keep hitting the same cached resampler kernels.
+    speed = float(np.clip(round(speed / SPEED_STEP) * SPEED_STEP, *SPEED_RANGE))
+    semitones = float(np.clip(round(semitones / PITCH_STEP) * PITCH_STEP, *PITCH_RANGE))
+    return speed, semitones
+
+def pitch_ratio(semitones):
+    return 2.0 ** (semitones / 12.0)
+
+@lru_cache(maxsize=8)
+def grain_window(size):
+    # Hann window over one grain; two taps half a grain apart sum to one.
+    window = np.sin(np.pi * np.arange(size, dtype=np.float64) / size) ** 2
+    window = window.astype(np.float32)
+    window.setflags(write=False)
+    return window
+
+# -----------------------------------------------------------------------------
+# PitchShifter – Moves pitch by ratio without changing speed: two read taps
+# sweep through a short delay line at (1 - ratio) frames per frame, each
+# faded in and out by a Hann window, half a grain apart. A whole block is one
+# set of vector operations over a fixed-size history, so the cost per block
+# does not depend on the ratio. Speed itself is varispeed in the voice's
+# resampler; this only puts the pitch where it is asked to be.
+# -----------------------------------------------------------------------------
+class PitchShifter:
+    def __init__(self, ratio, sample_rate, channels=2, grain_seconds=GRAIN_SECONDS):
+        self.grain = max(64, int(grain_seconds * sample_rate))
+        self.window = grain_window(self.grain)
+        self.channels = channels
+        self.set_ratio(ratio)
+        self.reset()
+
+    def set_ratio(self, ratio):
+        self.ratio = ratio
+        self._step = 1.0 - ratio
+
+    def reset(self):
+        self._history = np.zeros((self.grain + 2, self.channels), dtype=np.float32)
+        self._phase = 0.0
+
+    def process_into(self, block):
+        frames = len(block)
+        history = len(self._history)
+        buffer = np.concatenate((self._history, block))
+        self._history = buffer[frames:]
+        # Delay of each tap in grains, one row per tap.
+        phase = (self._phase + self._step * np.arange(frames) / self.grain) % 1.0
+        self._phase = float((self._phase + self._step * frames / self.grain) % 1.0)
+        phases = np.stack((phase, (phase + 0.5) % 1.0))
+        read = history + np.arange(frames) - 1.0 - phases * self.grain
+        whole = read.astype(np.int64)
+        frac = (read - whole).astype(np.float32)[..., None]
+        taps = buffer[whole] * (1.0 - frac) + buffer[whole + 1] * frac
+        weight = self.window[(phases * self.grain).astype(np.int64)][..., None]
+        np.sum(taps * weight, axis=0, out=block)
+        return block
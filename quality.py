@@ -0,0 +1,171 @@
+import threading
+from collections import deque
+from kivy.utils import platform
+
+# -----------------------------------------------------------------------------
+# Quality tiers, best first. Each step down trades fidelity for CPU:
+#   rate_divisor  render voices at sample_rate / divisor and upsample the mix
+#   block_scale   bigger output blocks (more latency, less per-block overhead)
+#   mono          sum each voice to mono before filtering and mixing
+#   filters       "full", "lite" (only voices above LITE_FILTER_GAIN) or "off"
+#   cull_gain     voices whose gain is below this are not rendered at all
+# -----------------------------------------------------------------------------
+TIERS = (
+    {"name": "full", "rate_divisor": 1, "block_scale": 1, "mono": False, "filters": "full", "cull_gain": 0.0},
+    {"name": "balanced", "rate_divisor": 1, "block_scale": 2, "mono": False, "filters": "full", "cull_gain": 0.001},
+    {"name": "saver", "rate_divisor": 2, "block_scale": 2, "mono": False, "filters": "lite", "cull_gain": 0.003},
+    {"name": "minimal", "rate_divisor": 2, "block_scale": 4, "mono": True, "filters": "off", "cull_gain": 0.01},
+)
+LITE_FILTER_GAIN = 0.06   # about -24 dB
+
+REASONS = ("start", "render_load", "underruns", "battery", "thermal", "headroom", "manual")
+AUTO = 255
+
+DOWN_LOAD = 0.7           # render time / block time that triggers a step down
+UP_LOAD = 0.35            # ... and the headroom needed to step back up
+DOWN_HOLD = 1.0           # seconds the load must stay high
+UP_HOLD = 10.0            # seconds the load must stay low (doubles on flapping)
+MAX_UP_HOLD = 160.0
+UNDERRUN_WINDOW = 5.0
+UNDERRUN_LIMIT = 2
+LOW_BATTERY = 15
+THERMAL_SEVERE = 3        # PowerManager.THERMAL_STATUS_SEVERE
+THERMAL_CRITICAL = 4
+HINT_INTERVAL = 15.0
+
+# -----------------------------------------------------------------------------
+# QualityGovernor – Decides the tier from the render thread's own load numbers
+# plus device hints. observe() is called once per block and is cheap; it
+# returns (tier, reason) when the tier should change, otherwise None.
+# -----------------------------------------------------------------------------
+class QualityGovernor:
+    def __init__(self, tiers=TIERS):
+        self.tiers = tiers
+        self.tier = 0
+        self.reason = REASONS.index("start")
+        self.mode = AUTO
+        self.hints = {}
+        self.history = deque(maxlen=32)
+        self.up_hold = UP_HOLD
+        self._high_since = None
+        self._low_since = None
+        self._underruns = deque()
+        self._last_up = None
+
+    def floor(self):
+        # Lowest-numbered (best) tier the device hints allow, and why.
+        floor, reason = 0, None
+        battery = self.hints.get("battery")
+        if battery is not None and battery < LOW_BATTERY and not self.hints.get("charging", False):
+            floor, reason = 2, "battery"
+        thermal = self.hints.get("thermal", 0)
+        if thermal >= THERMAL_CRITICAL:
+            floor, reason = 3, "thermal"
+        elif thermal >= THERMAL_SEVERE and floor < 2:
+            floor, reason = 2, "thermal"
+        return min(floor, len(self.tiers) - 1), reason
+
+    def set_mode(self, mode, now):
+        self.mode = mode
+        if mode != AUTO:
+            return self._change(min(int(mode), len(self.tiers) - 1), "manual", now)
+        return None
+
+    def _change(self, tier, reason, now):
+        if tier == self.tier:
+            return None
+        if tier > self.tier and self._last_up is not None and now - self._last_up < 2 * self.up_hold:
+            # Had to step down again soon after stepping up: wait longer.
+            self.up_hold = min(MAX_UP_HOLD, self.up_hold * 2)
+        if tier < self.tier:
+            self._last_up = now
+        self.tier = tier
+        self.reason = REASONS.index(reason)
+        self.history.append((now, tier, reason))
+        self._high_since = self._low_since = None
+        return tier, reason
+
+    def observe(self, load, underrun, now):
+        if self.mode != AUTO:
+            return None
+        if underrun:
+            self._underruns.append(now)
+        while self._underruns and now - self._underruns[0] > UNDERRUN_WINDOW:
+            self._underruns.popleft()
+        floor, floor_reason = self.floor()
+        if self.tier < floor:
+            return self._change(floor, floor_reason, now)
+        last = len(self.tiers) - 1
+        if len(self._underruns) >= UNDERRUN_LIMIT and self.tier < last:
+            self._underruns.clear()
+            return self._change(self.tier + 1, "underruns", now)
+        if load > DOWN_LOAD:
+            self._low_since = None
+            self._high_since = self._high_since or now
+            if now - self._high_since >= DOWN_HOLD and self.tier < last:
+                return self._change(self.tier + 1, "render_load", now)
+        elif load < UP_LOAD:
+            self._high_since = None
+            self._low_since = self._low_since or now
+            if now - self._low_since >= self.up_hold and self.tier > floor:
+                return self._change(self.tier - 1, "headroom", now)
+        else:
+            self._high_since = self._low_since = None
+        return None
+
+def read_device_hints():
+    hints = {}
+    if platform == "android":
+        try:
+            from jnius import autoclass
+            Context = autoclass("android.content.Context")
+            service = autoclass("org.kivy.android.PythonService").mService
+            context = service if service is not None else autoclass("org.kivy.android.PythonActivity").mActivity
+            battery = context.getSystemService(Context.BATTERY_SERVICE)
+            BatteryManager = autoclass("android.os.BatteryManager")
+            hints["battery"] = battery.getIntProperty(BatteryManager.BATTERY_PROPERTY_CAPACITY)
+            hints["charging"] = bool(battery.isCharging())
+            power = context.getSystemService(Context.POWER_SERVICE)
+            hints["thermal"] = power.getCurrentThermalStatus()
+        except Exception as e:
+            print(f"Error reading device hints: {e}")
+    else:
+        try:
+            import psutil
+            status = psutil.sensors_battery()
+            if status is not None:
+                hints["battery"] = status.percent
+                hints["charging"] = bool(status.power_plugged)
+        except Exception:
+            pass
+    return hints
+
+# -----------------------------------------------------------------------------
+# HintsMonitor – Polls battery and thermal state off the render thread (these
+# are JNI calls) and drops the result into the governor.
+# -----------------------------------------------------------------------------
+class HintsMonitor:
+    def __init__(self, governor, interval=HINT_INTERVAL):
+        self.governor = governor
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="quality-hints", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.governor.hints = read_device_hints()
+            self._stop.wait(self.interval)
+        if platform == "android":
+            try:
+                import jnius
+                jnius.detach()
+            except Exception:
+                pass
@@ -0,0 +1,135 @@
+import time
+from fractions import Fraction
+from functools import lru_cache
+import numpy as np
+
+# taps: filter length per phase, beta: Kaiser window shape,
+# rolloff: passband edge as a fraction of the lower Nyquist frequency.
+QUALITY_PRESETS = {
+    "fast": {"taps": 8, "beta": 5.0, "rolloff": 0.85},
+    "balanced": {"taps": 16, "beta": 7.0, "rolloff": 0.92},
+    "high": {"taps": 32, "beta": 9.0, "rolloff": 0.95},
+}
+DEFAULT_QUALITY = "balanced"
+
+# Ratios needing more phases than this are approximated, which keeps every
+# kernel bank small no matter how odd the source rate is.
+MAX_PHASES = 1024
+
+# Input frames per process() call when converting a whole buffer.
+RESAMPLE_CHUNK_FRAMES = 16384
+
+def rate_ratio(source_rate, target_rate):
+    ratio = Fraction(int(target_rate), int(source_rate))
+    if ratio.denominator > MAX_PHASES or ratio.numerator > MAX_PHASES:
+        ratio = ratio.limit_denominator(MAX_PHASES)
+    return ratio.numerator, ratio.denominator
+
+@lru_cache(maxsize=32)
+def polyphase_kernel(up, down, quality=DEFAULT_QUALITY):
+    preset = QUALITY_PRESETS[quality]
+    taps = preset["taps"]
+    length = taps * up
+    cutoff = preset["rolloff"] * min(1.0, up / down)
+    # Centered on a whole input sample (taps // 2) so the delay is exact.
+    t = (np.arange(length) - (taps // 2) * up) / up
+    window = np.i0(preset["beta"] * np.sqrt(np.clip(1.0 - (t / (taps / 2.0)) ** 2, 0.0, 1.0)))
+    kernel = cutoff * np.sinc(cutoff * t) * window / np.i0(preset["beta"])
+    # bank[phase, k] is the tap applied to input sample (i - k) for that phase.
+    bank = kernel.reshape(taps, up).T.copy()
+    bank /= bank.sum(axis=1, keepdims=True)
+    bank = bank.astype(np.float32)
+    bank.setflags(write=False)
+    return bank
+
+# -----------------------------------------------------------------------------
+# Resampler – Streaming polyphase rate converter. process() takes blocks of any
+# size and returns every output frame that the input so far fully determines.
+# -----------------------------------------------------------------------------
+class Resampler:
+    def __init__(self, source_rate, target_rate, quality=DEFAULT_QUALITY, channels=2):
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        self.quality = quality
+        self.channels = channels
+        self.up, self.down = rate_ratio(source_rate, target_rate)
+        self.bank = polyphase_kernel(self.up, self.down, quality)
+        self.taps = self.bank.shape[1]
+        # Input frames of look-ahead; positions are shifted by this much so
+        # output frame n lines up exactly with input time n * down / up.
+        self.latency = self.taps // 2
+        self._shift = self.latency * self.up
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros((self.taps - 1, self.channels), dtype=np.float32)
+        self._in_offset = -(self.taps - 1)
+        self._next_out = 0
+
+    def process(self, block):
+        buffer = np.concatenate((self._history, block))
+        in_offset = self._in_offset
+        in_end = in_offset + len(buffer)
+        out_end = max(self._next_out, (in_end * self.up - self._shift + self.down - 1) // self.down)
+        n = np.arange(self._next_out, out_end, dtype=np.int64)
+        self._next_out = out_end
+        self._history = buffer[len(buffer) - (self.taps - 1):]
+        self._in_offset = in_end - (self.taps - 1)
+        if len(n) == 0:
+            return np.zeros((0, self.channels), dtype=np.float32)
+        position = n * self.down + self._shift
+        phase = position % self.up
+        index = (position // self.up - in_offset)[:, None] - np.arange(self.taps)
+        return np.einsum("ntc,nt->nc", buffer[index], self.bank[phase]).astype(np.float32, copy=False)
+
+    def flush(self):
+        return self.process(np.zeros((self.latency, self.channels), dtype=np.float32))
+
+def resample(data, source_rate, target_rate, quality=DEFAULT_QUALITY, chunk_frames=RESAMPLE_CHUNK_FRAMES):
+    # Whole-buffer conversion through the streaming path, chunk_frames at a
+    # time: process() gathers taps x channels values per output frame, so
+    # feeding it the whole file at once would need many times its size.
+    if source_rate == target_rate or len(data) == 0:
+        return data
+    channels = data.shape[1]
+    resampler = Resampler(source_rate, target_rate, quality, channels)
+    out = np.zeros((int(round(len(data) * resampler.up / resampler.down)), channels), dtype=np.float32)
+    filled = 0
+    for offset in range(0, len(data) + chunk_frames, chunk_frames):
+        if offset < len(data):
+            part = resampler.process(data[offset:offset + chunk_frames].astype(np.float32, copy=False))
+        else:
+            part = resampler.flush()
+        take = min(len(part), len(out) - filled)
+        out[filled:filled + take] = part[:take]
+        filled += take
+    return out
+
+# -----------------------------------------------------------------------------
+# Throughput benchmark – Realtime factor (seconds of audio per second of CPU)
+# for each preset, used to pick a preset per device class.
+# -----------------------------------------------------------------------------
+def benchmark(source_rate=48000, target_rate=44100, seconds=5.0, block_frames=1024, qualities=None):
+    rng = np.random.default_rng(0)
+    signal = rng.standard_normal((int(source_rate * seconds), 2)).astype(np.float32) * 0.1
+    results = {}
+    for quality in qualities or QUALITY_PRESETS:
+        resampler = Resampler(source_rate, target_rate, quality)
+        start = time.perf_counter()
+        for offset in range(0, len(signal), block_frames):
+            resampler.process(signal[offset:offset + block_frames])
+        elapsed = time.perf_counter() - start
+        results[quality] = seconds / elapsed if elapsed > 0 else float("inf")
+    return results
+
+def choose_quality(min_realtime=50.0, results=None):
+    # Highest preset that still renders min_realtime x faster than playback.
+    results = results or benchmark(seconds=1.0)
+    for quality in ("high", "balanced", "fast"):
+        if results.get(quality, 0.0) >= min_realtime:
+            return quality
+    return "fast"
+
+if __name__ == "__main__":
+    for quality, factor in benchmark().items():
+        print(f"{quality:>9}: {factor:8.1f}x realtime")
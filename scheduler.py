@@ -0,0 +1,108 @@
+import heapq, itertools, time
+
+def boot_time():
+    # Keeps counting through device suspend where the platform allows it, so
+    # deadlines stay on wall-clock schedule across pause/resume.
+    try:
+        return time.clock_gettime(time.CLOCK_BOOTTIME)
+    except (AttributeError, OSError):
+        return time.monotonic()
+
+# -----------------------------------------------------------------------------
+# DeadlineQueue – Priority queue of (deadline, item). Cancelled entries are
+# dropped lazily when they reach the top, so cancel() is O(1).
+# -----------------------------------------------------------------------------
+class ScheduledEvent:
+    __slots__ = ("deadline", "item", "cancelled")
+
+    def __init__(self, deadline, item):
+        self.deadline = deadline
+        self.item = item
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+class DeadlineQueue:
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, deadline, item):
+        event = ScheduledEvent(deadline, item)
+        heapq.heappush(self._heap, (deadline, next(self._seq), event))
+        return event
+
+    def next_deadline(self):
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            event = heapq.heappop(self._heap)[2]
+            if not event.cancelled:
+                due.append(event.item)
+        return due
+
+    def clear(self):
+        self._heap.clear()
+
+# -----------------------------------------------------------------------------
+# DeadlineScheduler – Runs callbacks on the Kivy main thread from one
+# DeadlineQueue. Only a single Clock event is ever armed, for the earliest
+# deadline, however many callbacks are pending.
+# -----------------------------------------------------------------------------
+class DeadlineScheduler:
+    def __init__(self):
+        self.queue = DeadlineQueue()
+        self._clock_event = None
+        self._armed_for = None
+
+    def now(self):
+        return boot_time()
+
+    def schedule(self, delay, callback, *args):
+        return self.schedule_at(self.now() + delay, callback, *args)
+
+    def schedule_at(self, deadline, callback, *args):
+        event = self.queue.push(deadline, (callback, args))
+        if self._armed_for is None or deadline < self._armed_for:
+            self._arm()
+        return event
+
+    def _arm(self):
+        from kivy.clock import Clock
+        if self._clock_event is not None:
+            self._clock_event.cancel()
+            self._clock_event = None
+        deadline = self.queue.next_deadline()
+        self._armed_for = deadline
+        if deadline is not None:
+            self._clock_event = Clock.schedule_once(self._fire, max(0.0, deadline - self.now()))
+
+    def _fire(self, dt=0):
+        self._clock_event = None
+        for callback, args in self.queue.pop_due(self.now()):
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error in scheduled callback {callback}: {e}")
+        self._arm()
+
+    def resync(self):
+        # Call on resume: fire whatever came due while the Clock was frozen,
+        # in deadline order, and re-arm for the rest.
+        self._fire()
+
+_scheduler = None
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = DeadlineScheduler()
+    return _scheduler
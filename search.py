@@ -0,0 +1,131 @@
+import re
+from bisect import bisect_left, insort
+
+RESULT_LIMIT = 200
+
+def words(text):
+    return re.findall(r"\w+", text.lower())
+
+def grams(word, prefix=True):
+    # Trigrams of a word. Padded at the front so that one and two letter
+    # queries still find word starts ("r" -> "  r", "ra" -> " ra").
+    if prefix:
+        word = "  " + word
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+# -----------------------------------------------------------------------------
+# SearchIndex – In-memory trigram index over names and tags (mixes, sounds).
+# Entries are added and removed one at a time as the library changes, and two
+# sorted lists (by name, and by length then name) are kept up to date with
+# bisect. A query intersects the posting sets of its trigrams, smallest first;
+# typing one more letter only re-filters the previous candidates. Results are
+# then read off the sorted lists, names starting with the query first, and
+# only as many candidates are checked for the real substrings as get shown.
+# -----------------------------------------------------------------------------
+class SearchIndex:
+    def __init__(self):
+        self.entries = {}         # key -> (name, " " + lowered name and tags, by_size item)
+        self.postings = {}        # trigram -> set of keys
+        self.by_name = []         # (lowered name, key)
+        self.by_size = []         # (name length, lowered name, key)
+        self._last = None         # (query words, candidate keys)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    @staticmethod
+    def _grams(text):
+        result = set()
+        for word in words(text):
+            result |= grams(word)
+        return result
+
+    def add(self, key, name, tags=()):
+        # key identifies the entry, e.g. ("mix", "Rainy night") or ("sound", 3).
+        self.remove(key)
+        text = " " + " ".join((name,) + tuple(tags)).lower()
+        lowered = name.lower()
+        self.entries[key] = (name, text, (len(lowered), lowered, key))
+        for gram in self._grams(text):
+            self.postings.setdefault(gram, set()).add(key)
+        insort(self.by_name, (lowered, key))
+        insort(self.by_size, self.entries[key][2])
+        self._last = None
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for gram in self._grams(entry[1]):
+            keys = self.postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[gram]
+        del self.by_name[bisect_left(self.by_name, (entry[2][1], key))]
+        del self.by_size[bisect_left(self.by_size, entry[2])]
+        self._last = None
+
+    def _candidates(self, query):
+        # A superset of the matches, plus the words the candidates still have
+        # to be checked for. Up to three letters the trigrams alone decide;
+        # a longer word can have all its trigrams without containing the word.
+        last = self._last
+        if last is not None and len(query) == len(last[0]) and all(
+                len(old) >= 3 and word.startswith(old) for word, old in zip(query, last[0])):
+            # Only the last word grew; its matches are among the last ones.
+            return last[1], [word for word, old in zip(query, last[0]) if len(word) > 3 or word != old]
+        needed = set()
+        for word in query:
+            needed |= grams(word, prefix=len(word) < 3)
+        sets = sorted((self.postings.get(gram, ()) for gram in needed), key=len)
+        if not sets or not sets[0]:
+            return frozenset(), []
+        return set(sets[0]).intersection(*sets[1:]), [word for word in query if len(word) > 3]
+
+    def search(self, text, kind=None, limit=RESULT_LIMIT):
+        # Keys matching every word of text (short words at a word start,
+        # longer ones anywhere): names starting with the first word in name
+        # order, then the rest shortest name first.
+        query = words(text)
+        if not query:
+            return [key for _, key in self.by_name if kind is None or key[0] == kind][:limit]
+        candidates, checks = self._candidates(query)
+        self._last = (query, candidates)
+        if not candidates:
+            return []
+        entries = self.entries
+
+        def wanted(key):
+            if key not in candidates or (kind is not None and key[0] != kind):
+                return False
+            text = entries[key][1]
+            for word in checks:
+                if word not in text:
+                    return False
+            return True
+
+        results, seen = [], set()
+        first = query[0]
+        for lowered, key in self.by_name[bisect_left(self.by_name, (first,)):]:
+            if not lowered.startswith(first) or len(results) == limit:
+                break
+            if wanted(key):
+                results.append(key)
+                seen.add(key)
+        if len(results) < limit:
+            # Walking by_size finds a candidate every len(entries)/len(candidates)
+            # items; with few candidates sorting them is cheaper.
+            if len(candidates) ** 2 < limit * len(entries):
+                rest = sorted(entries[key][2] for key in candidates)
+            else:
+                rest = self.by_size
+            for _, _, key in rest:
+                if key not in seen and wanted(key):
+                    results.append(key)
+                    if len(results) == limit:
+                        break
+        return results
@@ -0,0 +1,47 @@
+import os, sys
+from kivy.utils import platform
+
+from audio_output import NullSink, open_sink
+from engine import AudioEngine
+from ipc import EngineServer, DEFAULT_PORT, token_path, write_token
+
+# -----------------------------------------------------------------------------
+# Audio service entry point.
+#
+# On Android this runs in the foreground service process declared in
+# buildozer.spec, so playback survives the activity being frozen or killed.
+# On desktop the same file is the stand-in process:
+#     python service.py [--port N] [--token-file PATH] [--null-sink]
+# Every launch writes a new token to the app-private token file; only clients
+# that present it may control the engine.
+# -----------------------------------------------------------------------------
+def main():
+    port = DEFAULT_PORT
+    sink_factory = open_sink
+    if platform == "android":
+        from android.storage import app_storage_path
+        token_file = token_path(os.path.join(app_storage_path(), "app", "data"))
+        argument = os.environ.get("PYTHON_SERVICE_ARGUMENT", "")
+        if argument:
+            port = int(argument)
+    else:
+        token_file = token_path(os.path.join(os.getcwd(), "data"))
+        args = sys.argv[1:]
+        if "--port" in args:
+            port = int(args[args.index("--port") + 1])
+        if "--token-file" in args:
+            token_file = args[args.index("--token-file") + 1]
+        if "--null-sink" in args:
+            sink_factory = NullSink
+    os.makedirs(os.path.dirname(token_file), exist_ok=True)
+    token = write_token(token_file)
+
+    engine = AudioEngine(sink_factory=sink_factory)
+    engine.start()
+    try:
+        EngineServer(engine, token, port).serve_forever()
+    finally:
+        engine.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import re
+import numpy as np
+from engine import OP_LOAD_MIX, OP_FILTER, OP_PAN, OP_MOD, OP_VARY, OP_EVENTS
+from events import DEFAULT_JITTER_DB
+from modulation import MOD_TARGETS
+from pitch import quantize
+from scheduler import get_scheduler
+
+DEFAULT_TRANSITION = 10.0
+DEFAULT_FADE = 60.0
+PRELOAD_SECONDS = 30.0    # a step's sounds are loaded this long before it starts
+
+STEP_SEPARATORS = re.compile(r"\s*(?:→|->|,)\s*")
+STEP_PATTERN = re.compile(r"^(?P<name>.+?)\s+(?P<minutes>\d+(?:\.\d+)?)\s*(?:m|min|mins|minutes)?$", re.IGNORECASE)
+FADE_PATTERN = re.compile(r"^fade(?:\s*out)?(?:\s+(?P<minutes>\d+(?:\.\d+)?)\s*(?:m|min|mins|minutes)?)?$", re.IGNORECASE)
+
+# -----------------------------------------------------------------------------
+# Timeline text – "Rain 30 → Waves 60 → fade out". Each step is a saved mix
+# and a duration in minutes; an optional last "fade [minutes]" fades the mix
+# out at the end instead of stopping it.
+# -----------------------------------------------------------------------------
+def parse_timeline(text, mix_names=None, transition=DEFAULT_TRANSITION):
+    known = {name.lower(): name for name in mix_names} if mix_names is not None else None
+    steps = []
+    fade = 0.0
+    parts = [part for part in STEP_SEPARATORS.split(text.strip()) if part]
+    for index, part in enumerate(parts):
+        fade_match = FADE_PATTERN.match(part)
+        if fade_match:
+            if index != len(parts) - 1:
+                raise ValueError("fade can only be the last step")
+            minutes = fade_match.group("minutes")
+            fade = float(minutes) * 60 if minutes else DEFAULT_FADE
+            continue
+        match = STEP_PATTERN.match(part)
+        if not match:
+            raise ValueError(f"Expected '<mix> <minutes>', got '{part}'")
+        name = match.group("name").strip()
+        if known is not None:
+            if name.lower() not in known:
+                raise ValueError(f"No saved mix named '{name}'")
+            name = known[name.lower()]
+        steps.append({"mix": name, "duration": float(match.group("minutes")) * 60, "transition": transition})
+    if not steps:
+        raise ValueError("A timeline needs at least one mix")
+    return {"steps": steps, "fade": fade}
+
+def format_timeline(timeline):
+    parts = [f"{step['mix']} {step['duration'] / 60:g}" for step in timeline["steps"]]
+    if timeline.get("fade"):
+        parts.append(f"fade {timeline['fade'] / 60:g}")
+    return " → ".join(parts)
+
+def step_offsets(timeline):
+    # Start of every step relative to the timeline start, plus the end.
+    offsets = [0.0]
+    for step in timeline["steps"]:
+        offsets.append(offsets[-1] + step["duration"])
+    return offsets
+
+def step_commands(mixer, snapshot, at):
+    # The per-sound settings of one step's playing sounds as timed commands,
+    # so filter, placement, variation, density and modulation change with
+    # the step even while the UI is not running.
+    commands = []
+    for sid in np.flatnonzero(snapshot["playing"][:len(mixer)]).tolist():
+        commands.append((at, OP_FILTER, sid, tuple(snapshot["filter"][sid].tolist())))
+        commands.append((at, OP_PAN, sid, tuple(snapshot["placement"][sid].tolist())))
+        commands.append((at, OP_VARY, sid, quantize(snapshot["speed"][sid], snapshot["pitch"][sid])))
+        if snapshot["density"][sid] > 0:
+            commands.append((at, OP_EVENTS, sid, (float(snapshot["density"][sid]), DEFAULT_JITTER_DB)))
+        for t in range(len(MOD_TARGETS)):
+            rate, depth = snapshot["mod_params"][sid, t].tolist()
+            commands.append((at, OP_MOD, sid, (t, int(snapshot["mod_shape"][sid, t]), rate, depth)))
+    return commands
+
+# -----------------------------------------------------------------------------
+# TimelinePlayer – Plays a timeline against the app. With an engine every step
+# is handed over up front as timed LOAD_MIXes, each with its sounds' settings,
+# in a single batched command, so transitions land on the render thread's
+# clock whatever the UI is doing and a long timeline does not fill the
+# command queue; the UI only follows along. A step's sounds are loaded
+# PRELOAD_SECONDS ahead of it, or all at once when the app is paused and can
+# no longer do it on time.
+# Without one, the steps themselves run from the shared DeadlineScheduler.
+# All deadlines are absolute (start + offset), so nothing drifts.
+# -----------------------------------------------------------------------------
+class TimelinePlayer:
+    def __init__(self, app, name, timeline):
+        self.app = app
+        self.name = name
+        self.timeline = timeline
+        self.offsets = step_offsets(timeline)
+        self.start_time = None
+        self.current = -1
+        self.loaded = 0           # steps whose sounds have been loaded
+        self._events = []
+
+    @property
+    def running(self):
+        return self.start_time is not None
+
+    def start(self):
+        # False (and nothing running) if the engine could not take the steps.
+        scheduler = get_scheduler()
+        self.start_time = scheduler.now()
+        engine = self.app.engine
+        steps = self.timeline["steps"]
+        fade = self.timeline.get("fade", 0.0)
+        end = self.offsets[-1]
+        if engine:
+            timed = []
+            for index, step in enumerate(steps):
+                snapshot = self.app.mixer.from_saved(self.app.saved_sounds(step["mix"]))
+                entries = self.app.mixer.entries(snapshot)
+                if index == 0:
+                    first = (entries, step["transition"])
+                    self.load_steps(1)
+                else:
+                    timed.append((self.offsets[index], OP_LOAD_MIX, 0, (entries, step["transition"])))
+                    timed += step_commands(self.app.mixer, snapshot, self.offsets[index])
+            if not fade:
+                timed.append((end, OP_LOAD_MIX, 0, ((), steps[-1]["transition"])))
+            if not (engine.clear_scheduled() and engine.load_mix(*first) and engine.schedule_all(timed)):
+                print(f"Error starting timeline {self.name}: the audio engine did not take its steps")
+                self.stop()
+                return False
+        if fade:
+            self.app.arm_sleep(end, fade)
+        self._events = [scheduler.schedule_at(self.start_time + offset, self._enter_step, index)
+                        for index, offset in enumerate(self.offsets[:-1])]
+        if engine:
+            self._events += [scheduler.schedule_at(self.start_time + max(0.0, offset - PRELOAD_SECONDS),
+                                                   self.load_steps, index + 1)
+                             for index, offset in enumerate(self.offsets[1:-1], 1)]
+        if not fade:
+            self._events.append(scheduler.schedule_at(self.start_time + end, self._finish))
+        return True
+
+    def load_steps(self, count):
+        # Loads the sounds of the first count steps that are not loaded yet.
+        for step in self.timeline["steps"][self.loaded:count]:
+            self.app.mix_entries(self.app.saved_sounds(step["mix"]), show=False)
+        self.loaded = max(self.loaded, count)
+
+    def load_all(self):
+        if self.running and self.app.engine:
+            self.load_steps(len(self.timeline["steps"]))
+
+    def _enter_step(self, index):
+        # After a long pause several steps come due at once; only the newest
+        # one still matters.
+        if index + 1 < len(self.offsets) - 1 and get_scheduler().now() >= self.start_time + self.offsets[index + 1]:
+            return
+        self.current = index
+        step = self.timeline["steps"][index]
+        saved_sounds = self.app.saved_sounds(step["mix"])
+        if self.app.engine:
+            self.app.mix_entries(saved_sounds)
+            self.app.record_change(f"Load {step['mix']}")
+        else:
+            self.app.load_mix(step["mix"])
+        self.app.top_bar.title = f"{self.name}: {step['mix']}"
+
+    def _finish(self):
+        self.start_time = None
+        self.app.stop_all_sounds()
+        self.app.top_bar.title = self.name
+
+    def stop(self):
+        for event in self._events:
+            event.cancel()
+        self._events = []
+        if self.running and self.app.engine:
+            self.app.engine.clear_scheduled()
+        self.start_time = None
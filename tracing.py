@@ -0,0 +1,92 @@
+import json, time
+from collections import deque
+import numpy as np
+
+# Stages of a tap-to-sound trace, in the order they happen. "loaded" only
+# appears when the tap had to create the player; "first_buffer" only with
+# the engine, which reports when the sound first went out in a block.
+STAGES = ("tap", "loaded", "play", "start", "first_buffer")
+PERCENTILES = (50, 95, 99)
+TRACE_HISTORY = 512
+TRACE_TIMEOUT = 5.0
+
+def percentiles(values, points=PERCENTILES):
+    if not len(values):
+        return {}
+    return dict(zip(points, np.percentile(np.asarray(values), points).tolist()))
+
+# -----------------------------------------------------------------------------
+# LatencyTracer – One open trace per sound, from the tap to audible output.
+# Stage times are offsets from the tap on time.perf_counter(), which is the
+# system monotonic clock, so an engine in the service process can report its
+# first-block times on the same scale. Finished traces go into a ring buffer
+# that the debug screen summarizes and export() writes out as JSON lines.
+# -----------------------------------------------------------------------------
+class LatencyTracer:
+    def __init__(self, history=TRACE_HISTORY, timeout=TRACE_TIMEOUT):
+        self.timeout = timeout
+        self.traces = deque(maxlen=history)
+        self.open = {}
+
+    def begin(self, key, label=""):
+        now = time.perf_counter()
+        self.open[key] = {"key": key, "label": label, "time": time.time(), "begin": now, "marks": {"tap": 0.0}}
+
+    def mark(self, key, stage, when=None):
+        trace = self.open.get(key)
+        if trace is not None and stage not in trace["marks"]:
+            trace["marks"][stage] = (when if when is not None else time.perf_counter()) - trace["begin"]
+
+    def end(self, key, stage=None, when=None):
+        if stage is not None:
+            self.mark(key, stage, when)
+        trace = self.open.pop(key, None)
+        if trace is not None:
+            self.traces.append(trace)
+
+    def cancel(self, key):
+        self.open.pop(key, None)
+
+    def waiting(self):
+        return bool(self.open)
+
+    def poll(self, first_blocks, now=None):
+        # first_blocks: {key: perf_counter time of the first rendered block}.
+        now = now if now is not None else time.perf_counter()
+        for key, trace in list(self.open.items()):
+            first = first_blocks.get(key, 0.0)
+            if first >= trace["begin"]:
+                self.end(key, "first_buffer", first)
+            elif now - trace["begin"] > self.timeout:
+                trace["timed_out"] = True
+                self.end(key)
+
+    def stats(self):
+        # {stage: (count, {percentile: seconds})}, plus "total" to the last
+        # stage each trace reached.
+        samples = {stage: [] for stage in STAGES[1:]}
+        samples["total"] = []
+        for trace in self.traces:
+            marks = trace["marks"]
+            for stage, value in marks.items():
+                if stage in samples:
+                    samples[stage].append(value)
+            if not trace.get("timed_out"):
+                samples["total"].append(max(marks.values()))
+        return {stage: (len(values), percentiles(values)) for stage, values in samples.items() if values}
+
+    def export(self, path):
+        with open(path, "w") as f:
+            for trace in self.traces:
+                f.write(json.dumps(trace) + "\n")
+        return len(self.traces)
+
+    def clear(self):
+        self.traces.clear()
+
+def format_stats(stats):
+    lines = []
+    for stage, (count, points) in stats.items():
+        values = "  ".join(f"p{p} {v * 1000:.1f}" for p, v in points.items())
+        lines.append(f"{stage}: {values} ms  (n={count})")
+    return "\n".join(lines) if lines else "No taps traced yet."
@@ -0,0 +1,222 @@
+import os, threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, BrokenExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from kivy.storage.jsonstore import JsonStore
+from kivy.utils import platform
+
+from audio_stream import open_decoder, to_stereo, decoder_available
+from resampler import resample
+from events import write_event_index, MIN_EVENTS
+
+CACHE_RATE = 44100
+DECODE_CHUNK_FRAMES = 65536
+
+def cache_key(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def source_signature(path):
+    st = os.stat(path)
+    return [st.st_size, int(st.st_mtime)]
+
+# -----------------------------------------------------------------------------
+# Worker-side steps. These run inside the pool, so they only take and return
+# plain data (paths, dicts) and never touch the UI or the manifest.
+# -----------------------------------------------------------------------------
+def _lower_process_priority(niceness):
+    try:
+        os.nice(niceness)
+    except Exception as e:
+        print(f"Error lowering warm-up priority: {e}")
+
+def _lower_thread_priority():
+    try:
+        from jnius import autoclass
+        Process = autoclass("android.os.Process")
+        Process.setThreadPriority(Process.THREAD_PRIORITY_BACKGROUND)
+    except Exception as e:
+        print(f"Error lowering warm-up thread priority: {e}")
+
+def decode_file(path):
+    decoder = open_decoder(path)
+    parts = []
+    try:
+        while True:
+            block = decoder.read(DECODE_CHUNK_FRAMES)
+            if len(block) == 0:
+                break
+            parts.append(to_stereo(block))
+        rate = decoder.sample_rate
+    finally:
+        decoder.close()
+    data = np.concatenate(parts) if parts else np.zeros((0, 2), dtype=np.float32)
+    return data, rate
+
+def analyze(data, rate):
+    if len(data) == 0:
+        return {"frames": 0, "sample_rate": rate, "duration": 0.0, "peak": 0.0, "rms": 0.0}
+    return {
+        "frames": len(data),
+        "sample_rate": rate,
+        "duration": len(data) / rate,
+        "peak": float(np.abs(data).max()),
+        "rms": float(np.sqrt(np.mean(np.square(data, dtype=np.float64)))),
+    }
+
+def warm_file(path, cache_dir, target_rate=CACHE_RATE):
+    data, rate = decode_file(path)
+    data = resample(data, rate, target_rate, "high")
+    pcm_name = cache_key(path) + ".npy"
+    pcm_path = os.path.join(cache_dir, pcm_name)
+    tmp_path = pcm_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, (np.clip(data, -1.0, 1.0) * 32767.0).astype(np.int16))
+    os.replace(tmp_path, pcm_path)
+    entry = analyze(data, target_rate)
+    entry["source_rate"] = rate
+    entry["signature"] = source_signature(path)
+    entry["pcm"] = pcm_name
+    entry.update(write_event_index(data, target_rate, cache_dir, cache_key(path)))
+    return entry
+
+# -----------------------------------------------------------------------------
+# WarmupJob – Decodes, resamples and analyzes a sound library across a pool.
+#
+# Progress is persisted per file in a manifest, so a cancelled or killed job
+# picks up where it left off. Failures are recorded there too, with the
+# file's signature, and files without a decoder are never submitted, so
+# neither is retried on every launch until the file changes. Workers run at
+# background priority and at most max_workers files are in flight, leaving
+# cores free for the audio path.
+# -----------------------------------------------------------------------------
+class WarmupJob:
+    def __init__(self, sound_paths, cache_dir, max_workers=None, niceness=10,
+                 target_rate=CACHE_RATE, on_progress=None, on_complete=None):
+        self.sound_paths = list(sound_paths)
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 2)
+        self.niceness = niceness
+        self.target_rate = target_rate
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+        self.done = 0
+        self.failed = 0
+        self.running = False
+        self._cancel = threading.Event()
+        self._thread = None
+
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self.manifest = JsonStore(os.path.join(cache_dir, "manifest.json"))
+
+    def is_cached(self, path):
+        key = cache_key(path)
+        if not self.manifest.exists(key):
+            return False
+        entry = self.manifest.get(key)
+        return (entry.get("signature") == source_signature(path)
+                and entry.get("sample_rate") == self.target_rate
+                and "events" in entry
+                and os.path.exists(os.path.join(self.cache_dir, entry.get("pcm", ""))))
+
+    def has_failed(self, path):
+        key = cache_key(path)
+        if not self.manifest.exists(key):
+            return False
+        entry = self.manifest.get(key)
+        return "error" in entry and entry.get("signature") == source_signature(path)
+
+    def skipped(self):
+        # Files warm-up leaves alone: no decoder here, or failed unchanged.
+        return [path for path in self.sound_paths
+                if not decoder_available(path) or (not self.is_cached(path) and self.has_failed(path))]
+
+    def events_path(self, path):
+        # Sliced event pool for generative playback, if the sound has enough
+        # distinct events to be worth it.
+        if not self.is_cached(path):
+            return None
+        entry = self.manifest.get(cache_key(path))
+        if entry.get("events", 0) < MIN_EVENTS:
+            return None
+        return os.path.join(self.cache_dir, entry["events_pcm"])
+
+    def pcm_path(self, path):
+        # Decoded PCM at CACHE_RATE, shared by every layer of the sound.
+        if not self.is_cached(path):
+            return None
+        return os.path.join(self.cache_dir, self.manifest.get(cache_key(path))["pcm"])
+
+    def duration(self, path):
+        return self.manifest.get(cache_key(path)).get("duration", 0.0) if self.is_cached(path) else 0.0
+
+    def pending(self):
+        return [path for path in self.sound_paths
+                if decoder_available(path) and not self.is_cached(path) and not self.has_failed(path)]
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._cancel.clear()
+        self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _make_executor(self):
+        if platform == "android":
+            # Forking the activity process is not safe on Android; MediaCodec
+            # decodes natively and numpy releases the GIL, so threads scale.
+            return ThreadPoolExecutor(max_workers=self.max_workers, initializer=_lower_thread_priority)
+        return ProcessPoolExecutor(max_workers=self.max_workers, initializer=_lower_process_priority,
+                                   initargs=(self.niceness,))
+
+    def _report(self, total):
+        if self.on_progress:
+            from kivy.clock import Clock
+            done = self.done
+            Clock.schedule_once(lambda dt: self.on_progress(done, total), 0)
+
+    def _record_failure(self, path, error):
+        try:
+            self.manifest.put(cache_key(path), signature=source_signature(path), error=str(error))
+        except Exception as e:
+            print(f"Error recording warm-up failure for {path}: {e}")
+
+    def _run(self):
+        todo = self.pending()
+        total = len(self.sound_paths)
+        self.done = total - len(todo)
+        self.failed = 0
+        self._report(total)
+        executor = self._make_executor()
+        in_flight = {}
+        try:
+            while (todo or in_flight) and not self._cancel.is_set():
+                while todo and len(in_flight) < self.max_workers:
+                    path = todo.pop(0)
+                    future = executor.submit(warm_file, path, self.cache_dir, self.target_rate)
+                    in_flight[future] = path
+                finished, _ = wait(in_flight, timeout=0.25, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path = in_flight.pop(future)
+                    try:
+                        self.manifest.put(cache_key(path), **future.result())
+                    except BrokenExecutor as e:
+                        # The pool died, not the file: try it again next time.
+                        print(f"Error warming {path}: {e}")
+                        self.failed += 1
+                    except Exception as e:
+                        print(f"Error warming {path}: {e}")
+                        self.failed += 1
+                        self._record_failure(path, e)
+                    self.done += 1
+                    self._report(total)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.running = False
+        if self.on_complete:
+            from kivy.clock import Clock
+            cancelled = self._cancel.is_set()
+            Clock.schedule_once(lambda dt: self.on_complete(cancelled), 0)